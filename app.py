@@ -7,6 +7,7 @@ from datetime import datetime, date
 import traceback
 import os
 import time
+from backend.services.analytics_service import calcular_notas as calcular_notas_vetorizado
 
 # ==============================================================================
 # CONFIGURAÇÃO DA PÁGINA E ESTILO
@@ -313,46 +314,22 @@ def calcular_notas(df_assessments):
     """
     Calcula a situação atual de cada aluno por habilidade.
     Regra: Considera apenas o registro mais recente.
+    O cálculo usa o motor vetorizado compartilhado com a API
+    (backend/services/analytics_service.py); aqui só garantimos as colunas do app.
     """
     if df_assessments.empty:
         return pd.DataFrame()
 
-    # Converter data para datetime para ordenação correta
-    # Assumindo formato YYYY-MM-DD ou DD/MM/YYYY, o pandas costuma inferir bem
-    df_assessments['date'] = pd.to_datetime(df_assessments['date'], errors='coerce')
-    
-    # Ordenar por data decrescente (mais recente primeiro)
-    df_sorted = df_assessments.sort_values(by='date', ascending=False)
-    
-    # 1. Manter apenas a última nota de CADA OBJETIVO (rubric_id)
-    # Usuário pode ter avaliado o mesmo objetivo várias vezes, vale a última.
-    df_unique_obj = df_sorted.drop_duplicates(subset=['student_id', 'rubric_id'], keep='first')
-    
-    # 2. Agrupar por HABILIDADE (bncc_code) e calcular média
-    # level_assigned deve ser numérico
-    df_unique_obj['level_assigned'] = pd.to_numeric(df_unique_obj['level_assigned'], errors='coerce')
-    
-    # Groupby devolve DataFrame com índice composto, reset_index traz de volta
     # Incluir Nome e Turma no agrupamento para não perder
     group_cols = ['class_name', 'student_id', 'student_name', 'bncc_code']
     # Garantir que colunas existem
     for col in group_cols:
-        if col not in df_unique_obj.columns:
-            df_unique_obj[col] = 'N/A'
-            
-    df_final = df_unique_obj.groupby(group_cols)['level_assigned'].mean().reset_index()
-    
-    # Renomear para manter compatibilidade, mas indicando que é média
-    df_final.rename(columns={'level_assigned': 'level_numeric'}, inplace=True)
-    
-    # Se precisar de metadados da última avaliação (ex: data), podemos fazer merge ou pegar max
-    # Mas para o heatmap o importante é o level_numeric.
-    
-    # (Opcional) Traz de volta a data mais recente para referência
-    df_dates = df_unique_obj.groupby(['student_id', 'bncc_code'])['date'].max().reset_index()
-    df_final = df_final.merge(df_dates, on=['student_id', 'bncc_code'], how='left')
+        if col not in df_assessments.columns:
+            df_assessments[col] = 'N/A'
 
-    return df_final
+    df_final = calcular_notas_vetorizado(df_assessments)
+    # Mesma ordem de colunas/linhas do groupby original (turma primeiro)
+    return df_final[group_cols + ['level_numeric', 'date']].sort_values(group_cols, ignore_index=True)
 
 def converter_nivel_nota(nivel):
     """Converte nível (1-4) para nota (0-10)."""
@@ -0,0 +1,51 @@
+"""
+Benchmark: calcular_notas (NumPy) × calcular_notas_pandas (referência).
+Uso: python -m backend.bench_calcular_notas [linhas ...]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from .services.analytics_service import calcular_notas, calcular_notas_pandas
+
+
+def gerar_avaliacoes(n: int, seed: int = 42) -> pd.DataFrame:
+    """Turmas de ~35 alunos, 40 objetivos, várias reavaliações por aluno+objetivo."""
+    rng = np.random.default_rng(seed)
+    students = rng.integers(0, max(n // 20, 2), n)
+    rubrics = rng.integers(0, 40, n)
+    return pd.DataFrame({
+        "student_id": pd.Series(students).map("S{:06d}".format),
+        "rubric_id": pd.Series(rubrics).map("R{:03d}".format),
+        "bncc_code": pd.Series(rubrics // 4).map("EF06MA{:02d}".format),
+        "level_assigned": rng.integers(1, 5, n),
+        "date": pd.Timestamp("2026-02-01") + pd.to_timedelta(rng.permutation(n), unit="s"),
+        "class_name": pd.Series(students % 30).map("Turma {}".format),
+        "student_name": pd.Series(students).map("Aluno {}".format),
+    })
+
+
+def medir(fn, df: pd.DataFrame, repeticoes: int = 3) -> float:
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        entrada = df.copy()
+        t0 = time.perf_counter()
+        fn(entrada)
+        melhor = min(melhor, time.perf_counter() - t0)
+    return melhor
+
+
+def main(tamanhos):
+    print(f"{'linhas':>10} {'pandas (s)':>12} {'numpy (s)':>12} {'speedup':>9}")
+    for n in tamanhos:
+        df = gerar_avaliacoes(n)
+        pd.testing.assert_frame_equal(calcular_notas(df.copy()), calcular_notas_pandas(df.copy()))
+        t_pd = medir(calcular_notas_pandas, df)
+        t_np = medir(calcular_notas, df)
+        print(f"{n:>10,} {t_pd:>12.4f} {t_np:>12.4f} {t_pd / t_np:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
@@ -0,0 +1,48 @@
+"""
+Benchmark: importação do CSV da BNCC (import_service.import_bncc).
+Roda contra o banco de DATABASE_URL dentro de uma transação desfeita ao final
+(nada é gravado). Cada tamanho roda duas vezes: inserção e atualização.
+Uso: DATABASE_URL=... python -m backend.bench_import_bncc [linhas ...]
+"""
+import sys
+import time
+
+from .database import SessionLocal
+from .services import import_service
+
+DISCIPLINAS = ["Matemática", "Língua Portuguesa", "Ciências", "Geografia", "História", "Arte"]
+
+
+def gerar_bncc(n: int, revisao: int = 0) -> list:
+    return [{
+        "codigo": f"BENCH{i:06d}",
+        "descricao": f"Habilidade de teste {i} (rev. {revisao})",
+        "disciplina": DISCIPLINAS[i % len(DISCIPLINAS)],
+        "ano": f"{6 + i % 4}º",
+        "bimestre": str(1 + i % 4),
+        "objeto_conhecimento": "Objeto de conhecimento",
+    } for i in range(n)]
+
+
+def main(tamanhos):
+    print(f"{'linhas':>10} {'inserção (s)':>14} {'linhas/s':>10} {'atualização (s)':>17} {'linhas/s':>10}")
+    for n in tamanhos:
+        db = SessionLocal()
+        try:
+            t0 = time.perf_counter()
+            import_service.import_bncc(db, gerar_bncc(n))
+            db.flush()
+            t_ins = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            import_service.import_bncc(db, gerar_bncc(n, revisao=1))
+            db.flush()
+            t_upd = time.perf_counter() - t0
+        finally:
+            db.rollback()
+            db.close()
+        print(f"{n:>10,} {t_ins:>14.3f} {n / t_ins:>10,.0f} {t_upd:>17.3f} {n / t_upd:>10,.0f}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [1_000, 5_000, 20_000])
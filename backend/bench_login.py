@@ -0,0 +1,59 @@
+"""
+Benchmark: vazão de logins no custo de bcrypt configurado (services/passwords).
+Simula N logins simultâneos passando pelo pool de hashing (sem banco) e mede,
+ao mesmo tempo, o atraso do event loop — o que as demais rotas sentiriam.
+Logins recusados por fila cheia (HashingBusy -> 503) são contados à parte.
+Uso: BCRYPT_ROUNDS=12 HASH_WORKERS=4 python -m backend.bench_login [logins ...]
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+from .services import passwords
+
+
+async def _login(stored: str, latencias: list) -> bool:
+    t0 = time.perf_counter()
+    try:
+        ok, _ = await passwords.verify_and_update("senha-do-professor", stored)
+    except passwords.HashingBusy:
+        return False
+    latencias.append(time.perf_counter() - t0)
+    return ok
+
+
+async def _atraso_do_loop(parar: asyncio.Event, atrasos: list) -> None:
+    while not parar.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(0.01)
+        atrasos.append(time.perf_counter() - t0 - 0.01)
+
+
+async def rodada(n: int, stored: str) -> tuple:
+    latencias, atrasos, parar = [], [], asyncio.Event()
+    monitor = asyncio.create_task(_atraso_do_loop(parar, atrasos))
+    t0 = time.perf_counter()
+    resultados = await asyncio.gather(*(_login(stored, latencias) for _ in range(n)))
+    total = time.perf_counter() - t0
+    parar.set()
+    await monitor
+    return total, sum(resultados), latencias, atrasos
+
+
+def main(tamanhos):
+    stored = passwords.hash_password("senha-do-professor")
+    print(f"bcrypt rounds={passwords.BCRYPT_ROUNDS} workers={passwords.HASH_WORKERS} "
+          f"fila máx={passwords.HASH_MAX_PENDING}")
+    print(f"{'logins':>8} {'aceitos':>8} {'tempo (s)':>10} {'logins/s':>9} "
+          f"{'p50 (ms)':>9} {'p95 (ms)':>9} {'atraso loop máx (ms)':>21}")
+    for n in tamanhos:
+        total, aceitos, lat, atrasos = asyncio.run(rodada(n, stored))
+        p50 = statistics.median(lat) * 1000 if lat else 0
+        p95 = statistics.quantiles(lat, n=20)[-1] * 1000 if len(lat) > 1 else p50
+        print(f"{n:>8,} {aceitos:>8,} {total:>10.2f} {aceitos / total:>9.1f} "
+              f"{p50:>9.0f} {p95:>9.0f} {max(atrasos, default=0) * 1000:>21.1f}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [16, 64, 256])
@@ -16,6 +16,11 @@ def clean_database():
     try:
         print("Cleaning data...")
         # 1. Delete dependent tables first
+        db.query(models.ImportJob).delete(synchronize_session=False)
+        db.query(models.AssessmentBatchRequest).delete(synchronize_session=False)
+        db.query(models.AssessmentEvent).delete(synchronize_session=False)
+        db.query(models.AssessmentRollup).delete(synchronize_session=False)
+        db.query(models.StudentRisk).delete(synchronize_session=False)
         db.query(models.Assessment).delete(synchronize_session=False)
         db.query(models.ObjectiveApproval).delete(synchronize_session=False)
         db.query(models.RubricApproval).delete(synchronize_session=False)
@@ -0,0 +1,47 @@
+"""
+Fixtures compartilhadas pelos testes do backend.
+Os testes rodam contra um SQLite em memória criado a partir dos modelos, sem Supabase.
+"""
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Permite `from backend import ...` ao rodar o pytest de qualquer diretório
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")   # custo mínimo: os testes não medem o bcrypt
+
+from backend.database import Base  # noqa: E402
+from backend import models  # noqa: E402,F401  (registra as tabelas no metadata)
+
+
+@pytest.fixture
+def engine():
+    eng = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(eng)
+    yield eng
+    eng.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(bind=engine, autocommit=False, autoflush=False)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def query_counter(engine):
+    """Lista com os SQL executados no engine — use len() para checar o número de consultas."""
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _record)
+    yield statements
+    event.remove(engine, "before_cursor_execute", _record)
@@ -0,0 +1,121 @@
+"""
+Exporta o histórico de avaliações para Parquet (uso offline pelo time de dados).
+
+As avaliações saem já unidas a alunos, turmas e disciplinas, lidas do cursor do
+banco em blocos e gravadas em partições Hive `school_year=AAAA/bimester=N/`.
+
+Uso:
+    python -m backend.export_parquet --out ./export_avaliacoes [--school-year 2026]
+
+Requer `pyarrow` (não faz parte da imagem da API): pip install pyarrow
+"""
+import argparse
+import os
+import sys
+
+# Add base directory to sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import Integer, String, func, select
+
+from backend.database import SessionLocal
+from backend import models
+
+BATCH_ROWS = 50_000
+
+
+def _export_query(school_year=None):
+    a, s = models.Assessment, models.Student
+    c, d = models.SetupClass, models.SetupDiscipline
+    school_year_col = func.extract("year", a.date).cast(Integer)
+    stmt = (
+        select(
+            a.id.cast(String).label("id"),
+            a.student_id,
+            s.student_name,
+            a.class_name,
+            c.year_level,
+            c.shift,
+            a.discipline_id,
+            d.discipline_name,
+            a.bncc_code,
+            a.objective_id.cast(String).label("objective_id"),
+            a.rubric_id,
+            a.teacher_id.cast(String).label("teacher_id"),
+            a.level_assigned,
+            a.date,
+            school_year_col.label("school_year"),
+            a.bimester,
+        )
+        .outerjoin(s, s.student_id == a.student_id)
+        .outerjoin(c, c.class_name == a.class_name)
+        .outerjoin(d, d.id == a.discipline_id)
+    )
+    if school_year:
+        stmt = stmt.where(school_year_col == school_year)
+    return stmt.execution_options(yield_per=BATCH_ROWS)
+
+
+def export_parquet(out_dir: str, school_year=None) -> int:
+    """Grava o dataset particionado em `out_dir` e retorna o número de linhas exportadas."""
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+    except ImportError:
+        raise SystemExit("pyarrow não instalado. Rode: pip install pyarrow")
+
+    schema = pa.schema([
+        ("id", pa.string()),
+        ("student_id", pa.string()),
+        ("student_name", pa.string()),
+        ("class_name", pa.string()),
+        ("year_level", pa.int16()),
+        ("shift", pa.string()),
+        ("discipline_id", pa.int32()),
+        ("discipline_name", pa.string()),
+        ("bncc_code", pa.string()),
+        ("objective_id", pa.string()),
+        ("rubric_id", pa.string()),
+        ("teacher_id", pa.string()),
+        ("level_assigned", pa.int8()),
+        ("date", pa.timestamp("us", tz="UTC")),
+        ("school_year", pa.int16()),
+        ("bimester", pa.int8()),
+    ])
+    exported = 0
+    db = SessionLocal()
+
+    def batches():
+        nonlocal exported
+        for chunk in db.execute(_export_query(school_year)).partitions():
+            columns = list(zip(*chunk))
+            exported += len(chunk)
+            yield pa.RecordBatch.from_arrays(
+                [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                schema=schema,
+            )
+
+    try:
+        ds.write_dataset(
+            batches(),
+            out_dir,
+            schema=schema,
+            format="parquet",
+            partitioning=ds.partitioning(
+                pa.schema([("school_year", pa.int16()), ("bimester", pa.int8())]), flavor="hive"
+            ),
+            existing_data_behavior="delete_matching",
+        )
+    finally:
+        db.close()
+    return exported
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta avaliações para Parquet particionado.")
+    parser.add_argument("--out", required=True, help="Diretório de saída")
+    parser.add_argument("--school-year", type=int, help="Exportar só um ano letivo")
+    args = parser.parse_args()
+
+    total = export_parquet(args.out, args.school_year)
+    print(f"{total} avaliações exportadas para {args.out}")
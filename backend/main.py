@@ -1,17 +1,22 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 import os
+import io
+import csv
 import json
 import base64
 import hmac
 import hashlib
 import time
+import uuid
 import pandas as pd
-from typing import List
-from .database import engine, Base, get_db
+from typing import List, Optional
+from .database import engine, Base, SessionLocal, get_db
 from . import models, schemas
-from .services import ai_service, analytics_service
+from .services import ai_service, analytics_service, assessment_service
 from .routers import admin, planning, analytics, auth
 
 
@@ -35,6 +40,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # ─────────────────────────────────────────
@@ -59,16 +65,50 @@ def read_root(db: Session = Depends(get_db)):
     return {"message": "SGA-H API v2 is running!", "database": db_status, "version": "2.0.0"}
 
 
+# ─────────────────────────────────────────
+# PAGINAÇÃO POR CURSOR (keyset)
+# O corpo continua sendo a lista; o cursor da próxima página vai no
+# cabeçalho X-Next-Cursor (ausente na última página).
+# ─────────────────────────────────────────
+
+def _encode_cursor(key: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> str:
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise HTTPException(status_code=400, detail="cursor inválido.")
+
+
+def _keyset_page(query, key_column, cursor: str, limit: int, response: Response, parse=str) -> list:
+    """Página ordenada pela chave primária, começando depois do cursor (sem OFFSET)."""
+    if cursor:
+        try:
+            last_key = parse(_decode_cursor(cursor))
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="cursor inválido.")
+        query = query.filter(key_column > last_key)
+    rows = query.order_by(key_column).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(str(getattr(rows[-1], key_column.key)))
+    return rows
+
+
 @app.get("/api/students")
 def get_students(
+    response: Response,
     db: Session = Depends(get_db),
-    limit: int = 100,
-    class_name: str = None
+    limit: int = Query(100, ge=1, le=500),
+    class_name: str = None,
+    cursor: str = None
 ):
     query = db.query(models.Student)
     if class_name:
         query = query.filter(models.Student.class_name == class_name)
-    students = query.limit(limit).all()
+    students = _keyset_page(query, models.Student.student_id, cursor, limit, response)
     return [
         {
             "id": s.student_id, "name": s.student_name,
@@ -106,11 +146,13 @@ def get_disciplines(db: Session = Depends(get_db)):
 
 @app.get("/api/bncc-skills")
 def get_bncc_skills(
+    response: Response,
     db: Session = Depends(get_db),
     discipline_id: int = None,
     year_grade: int = None,
     bimester: int = None,
-    limit: int = 50
+    limit: int = Query(50, ge=1, le=500),
+    cursor: str = None
 ):
     query = db.query(models.BnccLibrary)
     if discipline_id:
@@ -119,7 +161,7 @@ def get_bncc_skills(
         query = query.filter(models.BnccLibrary.year_grade == year_grade)
     if bimester:
         query = query.filter(models.BnccLibrary.bimester == str(bimester))
-    skills = query.limit(limit).all()
+    skills = _keyset_page(query, models.BnccLibrary.bncc_code, cursor, limit, response)
     return [
         {
             "bncc_code": s.bncc_code,
@@ -133,13 +175,29 @@ def get_bncc_skills(
     ]
 
 
+def _assessment_to_dict(a) -> dict:
+    """Serialização de uma avaliação (objeto ORM ou linha com as mesmas colunas)."""
+    return {
+        "id": str(a.id),
+        "student_id": a.student_id,
+        "rubric_id": str(a.rubric_id) if a.rubric_id else None,
+        "objective_id": str(a.objective_id) if a.objective_id else None,
+        "bncc_code": a.bncc_code,
+        "level_assigned": a.level_assigned,
+        "bimester": a.bimester,
+        "date": str(a.date) if a.date else None,
+    }
+
+
 @app.get("/api/assessments")
 def get_assessments(
+    response: Response,
     db: Session = Depends(get_db),
     class_name: str = None,
     bimester: int = None,
     discipline_id: int = None,
-    limit: int = 500
+    limit: int = Query(500, ge=1, le=1000),
+    cursor: str = None
 ):
     query = db.query(models.Assessment).join(
         models.Student, models.Assessment.student_id == models.Student.student_id
@@ -150,75 +208,110 @@ def get_assessments(
         query = query.filter(models.Assessment.bimester == bimester)
     if discipline_id:
         query = query.filter(models.Assessment.discipline_id == discipline_id)
-    assessments = query.limit(limit).all()
-    return [
-        {
-            "id": str(a.id),
-            "student_id": a.student_id,
-            "rubric_id": str(a.rubric_id) if a.rubric_id else None,
-            "objective_id": str(a.objective_id) if a.objective_id else None,
-            "bncc_code": a.bncc_code,
-            "level_assigned": a.level_assigned,
-            "bimester": a.bimester,
-            "date": str(a.date) if a.date else None,
-        }
-        for a in assessments
-    ]
+    assessments = _keyset_page(query, models.Assessment.id, cursor, limit, response, parse=uuid.UUID)
+    return [_assessment_to_dict(a) for a in assessments]
+
+
+@app.get("/api/assessments/history")
+def get_assessment_history(
+    student_id: str,
+    objective_id: uuid.UUID = None,
+    bimester: int = None,
+    db: Session = Depends(get_db)
+):
+    """Histórico completo (auditoria) das notas de um aluno, lido do log append-only."""
+    e = models.AssessmentEvent
+    query = db.query(e).filter(e.student_id == student_id)
+    if objective_id:
+        query = query.filter(e.objective_id == objective_id)
+    if bimester:
+        query = query.filter(e.bimester == bimester)
+    return [{
+        "id": ev.id,
+        "objective_id": str(ev.objective_id) if ev.objective_id else None,
+        "bncc_code": ev.bncc_code,
+        "bimester": ev.bimester,
+        "level_assigned": ev.level_assigned,
+        "teacher_id": str(ev.teacher_id) if ev.teacher_id else None,
+        "date": str(ev.date) if ev.date else None,
+        "recorded_at": str(ev.recorded_at) if ev.recorded_at else None,
+    } for ev in query.order_by(e.id).all()]
+
+
+EXPORT_CHUNK_ROWS = 1000
+EXPORT_FIELDS = ["id", "student_id", "rubric_id", "objective_id", "bncc_code", "level_assigned", "bimester", "date"]
+
+
+@app.get("/api/assessments/export")
+def export_assessments(
+    format: str = "csv",
+    class_name: str = None,
+    bimester: int = None,
+    discipline_id: int = None
+):
+    """
+    Exporta TODAS as avaliações filtradas, sem limite, como CSV ou NDJSON.
+    As linhas vêm de um cursor no servidor (yield_per) e são enviadas em blocos,
+    então a memória fica constante e o download começa imediatamente.
+    """
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format deve ser 'csv' ou 'ndjson'.")
+
+    a = models.Assessment
+    stmt = select(
+        a.id, a.student_id, a.rubric_id, a.objective_id, a.bncc_code,
+        a.level_assigned, a.bimester, a.date
+    ).join(models.Student, a.student_id == models.Student.student_id)
+    if class_name:
+        stmt = stmt.where(models.Student.class_name == class_name)
+    if bimester:
+        stmt = stmt.where(a.bimester == bimester)
+    if discipline_id:
+        stmt = stmt.where(a.discipline_id == discipline_id)
+    stmt = stmt.execution_options(yield_per=EXPORT_CHUNK_ROWS)
+
+    def generate():
+        # Sessão própria: a do Depends(get_db) pode ser fechada antes do fim do streaming
+        db = SessionLocal()
+        try:
+            if format == "csv":
+                buf = io.StringIO()
+                buf.write("\ufeff")   # BOM: Excel abre os acentos corretamente
+                csv.writer(buf).writerow(EXPORT_FIELDS)
+                yield buf.getvalue().encode("utf-8")
+            for chunk in db.execute(stmt).partitions():
+                buf = io.StringIO()
+                rows = [_assessment_to_dict(r) for r in chunk]
+                if format == "ndjson":
+                    buf.writelines(json.dumps(r, ensure_ascii=False) + "\n" for r in rows)
+                else:
+                    csv.writer(buf).writerows([r[f] for f in EXPORT_FIELDS] for r in rows)
+                yield buf.getvalue().encode("utf-8")
+        finally:
+            db.close()
+
+    media_type = "text/csv; charset=utf-8" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        generate(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="avaliacoes.{format}"'}
+    )
 
 
 @app.post("/api/assessments/batch")
-def save_assessments_batch(items: List[schemas.AssessmentBatchItem], db: Session = Depends(get_db)):
-    for item in items:
-        existing = db.query(models.Assessment).filter_by(
-            student_id=item.student_id,
-            objective_id=item.objective_id,
-            bimester=item.bimester
-        ).first()
-
-        if existing:
-            existing.level_assigned = int(item.level_assigned)
-            existing.date = item.date
-            existing.teacher_id = item.teacher_id
-            existing.class_name = item.class_name
-        else:
-            # WORKAROUND: O banco de dados Supabase (v1) exige rubric_id (NOT NULL + FK). 
-            # Para não quebrar durante a migração v2, enviamos um rubric_id dummy ou o próprio bncc_code temporariamente,
-            # ASSUMINDO que o banco permite se flexibilizarmos ou se houver um registro padrão.
-            # Se for FK restrita, precisaremos capturar a exceção e avisar o sysadmin, ou buscar a rubrica v1 correspondente.
-            # Vamos buscar a rubrica v1 se existir, senão salvamos com rubric_id = "v2_migrated_" + item.bncc_code
-            
-            # Buscar uma teacher_rubric legada para satisfazer a Constraint FK
-            legacy_rubric = db.query(models.TeacherRubric).filter(models.TeacherRubric.bncc_code == item.bncc_code).first()
-            if not legacy_rubric:
-                # Criar uma rubrica v1 dummy on-the-fly para satisfazer a ForeignKey do banco de dados
-                fallback_rubric_id = f"v2_migrated_{item.bncc_code}"
-                new_dummy_rubric = models.TeacherRubric(
-                    rubric_id=fallback_rubric_id,
-                    bncc_code=item.bncc_code,
-                    objective=f"Objetivo v2 - {item.bncc_code}",
-                    discipline_id=item.discipline_id,
-                    status="approved"
-                )
-                db.add(new_dummy_rubric)
-                db.flush() # Força o commit parcial para garantir que o ID exista para o proximo Insert
-            else:
-                fallback_rubric_id = legacy_rubric.rubric_id
-
-            new_assessment = models.Assessment(
-                student_id=item.student_id,
-                rubric_id=fallback_rubric_id,
-                bncc_code=item.bncc_code,
-                level_assigned=int(item.level_assigned),
-                bimester=item.bimester,
-                class_name=item.class_name,
-                discipline_id=item.discipline_id,
-                teacher_id=item.teacher_id,
-                date=item.date,
-                objective_id=item.objective_id
-            )
-            db.add(new_assessment)
-    db.commit()
-    return {"ok": True, "count": len(items)}
+def save_assessments_batch(
+    items: List[schemas.AssessmentBatchItem],
+    idempotency_key: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    try:
+        return assessment_service.ingest_batch(db, items, idempotency_key)
+    except assessment_service.BatchInProgress:
+        raise HTTPException(
+            status_code=409,
+            detail="Este lote ainda está sendo gravado. Aguarde e salve novamente.",
+            headers={"Retry-After": "2"},
+        )
 
 
 
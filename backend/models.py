@@ -1,6 +1,6 @@
 from sqlalchemy import (
-    Column, Integer, String, Text, DateTime, Date,
-    ForeignKey, Boolean, UniqueConstraint
+    Column, Integer, String, Text, DateTime, Date, Float,
+    ForeignKey, Boolean, UniqueConstraint, Index, JSON
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -24,6 +24,7 @@ class User(Base):
     is_active            = Column(Boolean, default=True)
     avatar_url           = Column(String)
     must_change_password = Column(Boolean, default=False)
+    auth_version         = Column(Integer, nullable=False, default=0, server_default="0")  # +1 revoga tokens emitidos
     created_at           = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationships
@@ -31,6 +32,19 @@ class User(Base):
     created_objectives   = relationship("LearningObjective", back_populates="creator")
 
 
+class RefreshToken(Base):
+    """Refresh token opaco (só o sha256 fica no banco), trocado a cada uso em /api/auth/refresh."""
+    __tablename__ = "refresh_tokens"
+    token_hash   = Column(String(64), primary_key=True)
+    user_id      = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    family_id    = Column(UUID(as_uuid=True), nullable=False, index=True)   # rotações de um mesmo login
+    auth_version = Column(Integer, nullable=False)
+    expires_at   = Column(DateTime(timezone=True), nullable=False)
+    used_at      = Column(DateTime(timezone=True))                          # rotacionado (trocado por outro)
+    revoked_at   = Column(DateTime(timezone=True))                          # logout ou reuso suspeito
+    created_at   = Column(DateTime(timezone=True), server_default=func.now())
+
+
 class SetupClass(Base):
     __tablename__ = "setup_classes"
     id          = Column(Integer, primary_key=True, index=True)
@@ -114,6 +128,10 @@ class TeacherRubric(Base):
 
 class Assessment(Base):
     __tablename__ = "assessments"
+    __table_args__ = (
+        # Uma nota por aluno/objetivo/bimestre: alvo do upsert em lote (services/assessment_service.py)
+        UniqueConstraint("student_id", "objective_id", "bimester", name="uq_assessment_student_objective_bimester"),
+    )
     id             = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     student_id     = Column(String, ForeignKey("students.student_id"))
     rubric_id      = Column(String, ForeignKey("teacher_rubrics.rubric_id"))
@@ -260,3 +278,96 @@ class PlanningBimester(Base):
     bncc_skill    = relationship("BnccLibrary", back_populates="planning")
     teacher       = relationship("User")
     discipline    = relationship("SetupDiscipline")
+
+
+class AssessmentRollup(Base):
+    """Contagens pré-agregadas de avaliações por ano letivo, turma, disciplina,
+    bimestre, habilidade e nível. Mantida incrementalmente a cada escrita em
+    `assessments` (ver services/rollup_service.py) e lida pelo dashboard."""
+    __tablename__ = "assessment_rollup"
+    __table_args__ = (
+        UniqueConstraint("school_year", "class_name", "discipline_id", "bimester", "bncc_code", "level",
+                         name="uq_assessment_rollup_key", postgresql_nulls_not_distinct=True),
+    )
+    id            = Column(Integer, primary_key=True)
+    school_year   = Column(Integer)              # ano de `assessments.date`
+    class_name    = Column(String)
+    discipline_id = Column(Integer, ForeignKey("setup_disciplines.id"))
+    bimester      = Column(Integer)
+    bncc_code     = Column(String, nullable=False)
+    level         = Column(Integer, nullable=False)
+    count         = Column(Integer, nullable=False, default=0)
+
+
+class StudentRisk(Base):
+    """Situação de risco por aluno, disciplina e bimestre (média < 2.0 = em risco).
+    Recalculada só para os alunos tocados em cada lote de avaliações (ver services/risk_service.py)."""
+    __tablename__ = "student_risk"
+    __table_args__ = (
+        UniqueConstraint("student_id", "discipline_id", "bimester",
+                         name="uq_student_risk_key", postgresql_nulls_not_distinct=True),
+        Index("idx_student_risk_ranking", "is_at_risk", "average_level"),
+    )
+    id                = Column(Integer, primary_key=True)
+    student_id        = Column(String, ForeignKey("students.student_id"), nullable=False)
+    discipline_id     = Column(Integer, ForeignKey("setup_disciplines.id"))
+    bimester          = Column(Integer)
+    total_assessments = Column(Integer, nullable=False, default=0)
+    low_level_count   = Column(Integer, nullable=False, default=0)   # N1 + N2
+    average_level     = Column(Float)
+    is_at_risk        = Column(Boolean, nullable=False, default=False)
+    updated_at        = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    student           = relationship("Student")
+
+
+class AssessmentBatchRequest(Base):
+    """Lotes de notas pela chave do header Idempotency-Key. A chave é reservada (in_progress)
+    antes de gravar; reenvios devolvem a resposta guardada ou 409 enquanto o primeiro
+    envio ainda roda (ver services/assessment_service.py)."""
+    __tablename__ = "assessment_batch_requests"
+    idempotency_key = Column(String, primary_key=True)
+    status          = Column(String, nullable=False, default="done", server_default="done")  # in_progress | done
+    response        = Column(JSON)                                                           # preenchida em 'done'
+    created_at      = Column(DateTime(timezone=True), server_default=func.now())             # reserva (ou retomada)
+
+
+class AssessmentEvent(Base):
+    """Histórico append-only de notas: uma linha por lançamento, nunca atualizada.
+    O estado atual por (aluno, objetivo, bimestre) é a própria tabela `assessments`,
+    mantida por upsert na mesma transação (ver services/assessment_service.py)."""
+    __tablename__ = "assessment_events"
+    __table_args__ = (
+        Index("idx_assessment_events_key", "student_id", "objective_id", "bimester", "id"),
+    )
+    id             = Column(Integer, primary_key=True)
+    student_id     = Column(String, ForeignKey("students.student_id"), nullable=False)
+    objective_id   = Column(UUID(as_uuid=True), ForeignKey("learning_objectives.id"))
+    bimester       = Column(Integer)
+    bncc_code      = Column(String, nullable=False)
+    discipline_id  = Column(Integer, ForeignKey("setup_disciplines.id"))
+    class_name     = Column(String)
+    level_assigned = Column(Integer)
+    teacher_id     = Column(UUID(as_uuid=True), ForeignKey("users.id"))
+    date           = Column(DateTime(timezone=True))
+    recorded_at    = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ImportJob(Base):
+    """Importação CSV do admin processada em segundo plano (ver services/import_jobs.py).
+    O upload só grava o arquivo em disco e cria o job; o front consulta o progresso.
+    Job 'queued'/'running' sem heartbeat (updated_at) recente é dado como 'failed'."""
+    __tablename__ = "import_jobs"
+    id             = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    kind           = Column(String, nullable=False)        # students | bncc
+    filename       = Column(String)
+    status         = Column(String, default="queued")      # queued | running | done | failed
+    total_rows     = Column(Integer)                       # estimativa (linhas do arquivo - cabeçalho)
+    rows_processed = Column(Integer, default=0)
+    inserted       = Column(Integer, default=0)
+    updated        = Column(Integer, default=0)
+    errors         = Column(JSON, default=list)
+    created_at     = Column(DateTime(timezone=True), server_default=func.now())
+    started_at     = Column(DateTime(timezone=True))
+    finished_at    = Column(DateTime(timezone=True))
+    updated_at     = Column(DateTime(timezone=True), server_default=func.now())  # heartbeat: a cada bloco commitado
@@ -0,0 +1,29 @@
+"""
+Manutenção: recalcula as tabelas derivadas de `assessments` do zero.
+Para depois de cargas ou correções feitas direto no banco, que não passam pela
+manutenção incremental (o backfill inicial está em supabase_schema_v3.sql).
+Uso: DATABASE_URL=... python -m backend.rebuild_aggregates
+"""
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .services import risk_service, rollup_service
+
+
+def rebuild_all(db: Session) -> None:
+    rollup_service.rebuild(db)
+    risk_service.rebuild(db)
+
+
+def main():
+    db = SessionLocal()
+    try:
+        rebuild_all(db)
+        db.commit()
+        print("-> assessment_rollup e student_risk recalculados.")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from backend.database import engine, SessionLocal, Base
 from backend import models
-from passlib.context import CryptContext
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from backend.services.passwords import hash_password
 
 def reset_database():
     print("Atencao: Este script ira apagar TODAS as tabelas e dados do banco.")
@@ -23,9 +21,8 @@ def reset_database():
     db = SessionLocal()
     try:
         print("\nCriando usuario administrador padrao (admin / admin123)...")
-        # Passlib bcrypt has an issue with some python 3.12 versions and bcrypt.
-        import hashlib
-        hashed_password = hashlib.sha256("admin123".encode()).hexdigest()
+        # passlib 1.7 exige bcrypt<5 (ver requirements.txt)
+        hashed_password = hash_password("admin123")
         admin_user = models.User(
             username="admin",
             password=hashed_password,
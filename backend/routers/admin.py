@@ -2,15 +2,15 @@
 Rotas de Administração — Gerenciar turmas, disciplinas, usuários,
 competências específicas, vínculos professor-turma e upload CSV de alunos.
 """
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Response, UploadFile, File, status, Query
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import Optional, List
-import csv, io
 
 from ..database import get_db
 from .. import models
-from .auth import get_current_user
+from ..services import import_jobs, import_validation, passwords, teacher_scope
+from .auth import Principal, get_current_user, revoke_sessions
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
@@ -66,17 +66,14 @@ class TeacherClassCreate(BaseModel):
 def list_classes(
     all: bool = Query(False),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     q = db.query(models.SetupClass).order_by(models.SetupClass.class_name)
     if current_user and current_user.role == "teacher" and not all:
-        q = q.join(models.TeacherClassDiscipline, models.TeacherClassDiscipline.class_id == models.SetupClass.id)
-        q = q.filter(models.TeacherClassDiscipline.teacher_id == current_user.id)
-        
-    rows = q.all()
-    if current_user and current_user.role == "teacher" and not all:
-        rows = list({r.id: r for r in rows}.values())
+        scope = teacher_scope.get_scope(db, current_user.id)
+        q = q.filter(models.SetupClass.id.in_(scope.class_ids))
 
+    rows = q.all()
     return [
         {
             "id": r.id, "class_name": r.class_name,
@@ -90,14 +87,13 @@ def list_classes(
 def list_classes_years(
     all: bool = Query(False),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Retorna os anos (year_level) distintos cadastrados, ordenados"""
-    q = db.query(models.SetupClass.year_level).filter(models.SetupClass.year_level.isnot(None))
     if current_user and current_user.role == "teacher" and not all:
-        q = q.join(models.TeacherClassDiscipline, models.TeacherClassDiscipline.class_id == models.SetupClass.id)
-        q = q.filter(models.TeacherClassDiscipline.teacher_id == current_user.id)
-        
+        return sorted(teacher_scope.get_scope(db, current_user.id).year_levels)
+
+    q = db.query(models.SetupClass.year_level).filter(models.SetupClass.year_level.isnot(None))
     years = q.distinct().order_by(models.SetupClass.year_level).all()
     return [y[0] for y in years if y[0] is not None]
 
@@ -117,7 +113,9 @@ def update_class(class_id: int, body: ClassCreate, db: Session = Depends(get_db)
         raise HTTPException(status_code=404, detail="Turma não encontrada.")
     for k, v in body.dict(exclude_none=True).items():
         setattr(obj, k, v)
-    db.commit(); return {"ok": True}
+    db.commit()
+    teacher_scope.invalidate()   # year_level faz parte do escopo dos professores
+    return {"ok": True}
 
 @router.delete("/classes/{class_id}")
 def delete_class(class_id: int, db: Session = Depends(get_db)):
@@ -125,6 +123,7 @@ def delete_class(class_id: int, db: Session = Depends(get_db)):
     if not obj:
         raise HTTPException(status_code=404, detail="Turma não encontrada.")
     db.delete(obj); db.commit()
+    teacher_scope.invalidate()
     return {"ok": True}
 
 
@@ -136,17 +135,14 @@ def delete_class(class_id: int, db: Session = Depends(get_db)):
 def list_disciplines(
     all: bool = Query(False),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     q = db.query(models.SetupDiscipline).order_by(models.SetupDiscipline.discipline_name)
     if current_user and current_user.role == "teacher" and not all:
-        q = q.join(models.TeacherClassDiscipline, models.TeacherClassDiscipline.discipline_id == models.SetupDiscipline.id)
-        q = q.filter(models.TeacherClassDiscipline.teacher_id == current_user.id)
-        
-    rows = q.all()
-    if current_user and current_user.role == "teacher" and not all:
-        rows = list({r.id: r for r in rows}.values())
+        scope = teacher_scope.get_scope(db, current_user.id)
+        q = q.filter(models.SetupDiscipline.id.in_(scope.discipline_ids))
 
+    rows = q.all()
     return [
         {
             "id": r.id, "name": r.discipline_name,
@@ -176,7 +172,9 @@ def delete_discipline(disc_id: int, db: Session = Depends(get_db)):
     obj = db.query(models.SetupDiscipline).get(disc_id)
     if not obj:
         raise HTTPException(status_code=404, detail="Disciplina não encontrada.")
-    db.delete(obj); db.commit(); return {"ok": True}
+    db.delete(obj); db.commit()
+    teacher_scope.invalidate()
+    return {"ok": True}
 
 
 # ─────────────────────────────────────────
@@ -246,13 +244,22 @@ def list_users(db: Session = Depends(get_db)):
         for r in rows
     ]
 
+def _hash_password(password: str) -> str:
+    """Hash no pool do bcrypt; fila cheia vira 503, como no login."""
+    try:
+        return passwords.hash_password(password)
+    except passwords.HashingBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado. Tente novamente em instantes.",
+            headers={"Retry-After": "2"},
+        )
+
 @router.post("/users", status_code=201)
 def create_user(body: UserCreate, db: Session = Depends(get_db)):
-    import hashlib
-    hashed = hashlib.sha256(body.password.encode()).hexdigest()
     obj = models.User(
         username=body.username,
-        password=hashed,
+        password=_hash_password(body.password),
         full_name=body.full_name,
         email=body.email,
         role=body.role or "teacher",
@@ -264,7 +271,6 @@ def create_user(body: UserCreate, db: Session = Depends(get_db)):
 @router.put("/users/{user_id}")
 def update_user(user_id: str, body: UserUpdate, db: Session = Depends(get_db)):
     import uuid as _uuid
-    import hashlib
     obj = db.query(models.User).get(_uuid.UUID(user_id))
     if not obj:
         raise HTTPException(status_code=404, detail="Usuário não encontrado.")
@@ -275,11 +281,13 @@ def update_user(user_id: str, body: UserUpdate, db: Session = Depends(get_db)):
         obj.full_name = body.full_name
     if body.email is not None:
         obj.email = body.email
-    if body.role is not None:
+    if body.role is not None and body.role != obj.role:
         obj.role = body.role
+        revoke_sessions(obj)   # o papel viaja no token / cache do usuário
     if body.password:
-        obj.password = hashlib.sha256(body.password.encode()).hexdigest()
-        
+        obj.password = _hash_password(body.password)
+        revoke_sessions(obj)
+
     db.commit()
     return {"ok": True, "id": str(obj.id)}
 
@@ -290,6 +298,7 @@ def toggle_user_active(user_id: str, db: Session = Depends(get_db)):
     if not obj:
         raise HTTPException(status_code=404, detail="Usuário não encontrado.")
     obj.is_active = not obj.is_active
+    revoke_sessions(obj)
     db.commit()
     return {"is_active": obj.is_active}
 
@@ -328,6 +337,7 @@ def create_teacher_class(body: TeacherClassCreate, db: Session = Depends(get_db)
     except Exception:
         db.rollback()
         raise HTTPException(status_code=409, detail="Vínculo já existe.")
+    teacher_scope.invalidate(obj.teacher_id)
     return {"id": obj.id}
 
 @router.delete("/teacher-class/{link_id}")
@@ -335,229 +345,81 @@ def delete_teacher_class(link_id: int, db: Session = Depends(get_db)):
     obj = db.query(models.TeacherClassDiscipline).get(link_id)
     if not obj:
         raise HTTPException(status_code=404, detail="Vínculo não encontrado.")
-    db.delete(obj); db.commit(); return {"ok": True}
+    teacher_id = obj.teacher_id
+    db.delete(obj); db.commit()
+    teacher_scope.invalidate(teacher_id)
+    return {"ok": True}
 
 
 # ─────────────────────────────────────────
 # UPLOAD CSV DE ALUNOS
 # ─────────────────────────────────────────
 
-@router.post("/students/upload-csv")
-async def upload_students_csv(file: UploadFile = File(...), db: Session = Depends(get_db)):
+@router.post("/students/upload-csv", status_code=status.HTTP_202_ACCEPTED)
+def upload_students_csv(
+    background_tasks: BackgroundTasks,
+    response: Response,
+    file: UploadFile = File(...),
+    dry_run: bool = Query(False),
+    db: Session = Depends(get_db)
+):
     """
     CSV obrigatório: nome, id_aluno, turma, ano, turno
     Colunas opcionais: data_nascimento (YYYY-MM-DD), nr_matricula
+    Processado em segundo plano: retorna o job_id para GET /import-jobs/{job_id}.
+    Com dry_run=true só valida a planilha e devolve o relatório, sem gravar nada.
     """
-    if not file.filename.endswith(".csv"):
-        raise HTTPException(status_code=400, detail="Envie um arquivo .csv")
-
-    content = await file.read()
-    try:
-        decoded = content.decode("utf-8-sig")
-    except UnicodeDecodeError:
-        try:
-            decoded = content.decode("latin-1")
-        except UnicodeDecodeError:
-            decoded = content.decode("utf-8", errors="replace")
-
-    # Detectar o delimitador (Excel Pt-Br usa ponto-e-vírgula por padrão)
-    header_line = decoded.split("\n", 1)[0] if "\n" in decoded else decoded
-    delimiter = ";" if header_line.count(";") > header_line.count(",") else ","
-    
-    reader  = csv.DictReader(io.StringIO(decoded), delimiter=delimiter)
-
-    inserted = 0
-    updated  = 0
-    errors   = []
-
-    for i, row in enumerate(reader, start=2):   # linha 2 = primeira linha de dados
-        nome    = (row.get("nome") or row.get("student_name") or "").strip()
-        id_al   = (row.get("id_aluno") or row.get("student_id") or "").strip()
-        turma   = (row.get("turma")  or row.get("class_name") or "").strip()
-        ano_str = (row.get("ano") or row.get("year_level") or "").strip()
-        turno_br= (row.get("turno") or "").strip().lower()
-
-        if not nome or not id_al or not turma or not ano_str or not turno_br:
-            errors.append(f"Linha {i}: campos obrigatórios incompletos (nome, id_aluno, turma, ano, turno).")
-            continue
-
-        try:
-            import re
-            digits = re.sub(r'\D', '', ano_str)
-            if not digits:
-                raise ValueError
-            ano = int(digits)
-        except ValueError:
-            errors.append(f"Linha {i}: ano '{ano_str}' inválido. Não contém um número inteiro identificável.")
-            continue
-            
-        # Mapeamento do turno para o banco
-        shift_map = {"manhã": "morning", "manha": "morning", "tarde": "afternoon", "noite": "evening"}
-        shift_val = shift_map.get(turno_br, "morning")  # default para morning se não reconhecer
-
-        # Verificar se a turma existe e criar se não existir
-        cls = db.query(models.SetupClass).filter_by(class_name=turma).first()
-        if not cls:
-            cls = models.SetupClass(class_name=turma, year_level=ano, shift=shift_val)
-            db.add(cls)
-            db.flush()
-        else:
-            if not cls.year_level:
-                cls.year_level = ano
-            if not cls.shift or cls.shift != shift_val:
-                cls.shift = shift_val
-            db.flush()
-
-        existing = db.query(models.Student).get(id_al)
-        if existing:
-            existing.student_name = nome
-            existing.class_name   = turma
-            if row.get("data_nascimento"):
-                try:
-                    from datetime import date
-                    existing.birth_date = date.fromisoformat(row["data_nascimento"].strip())
-                except Exception:
-                    pass
-            if row.get("nr_matricula"):
-                existing.enrollment_number = row["nr_matricula"].strip()
-            updated += 1
-        else:
-            student = models.Student(
-                student_id    = id_al,
-                student_name  = nome,
-                class_name    = turma,
-            )
-            if row.get("data_nascimento"):
-                try:
-                    from datetime import date
-                    student.birth_date = date.fromisoformat(row["data_nascimento"].strip())
-                except Exception:
-                    pass
-            if row.get("nr_matricula"):
-                student.enrollment_number = row["nr_matricula"].strip()
-            db.add(student)
-            inserted += 1
-
-    db.commit()
-    return {
-        "inserted": inserted,
-        "updated":  updated,
-        "errors":   errors,
-        "total_processed": inserted + updated
-    }
+    return _enqueue_import("students", file, dry_run, background_tasks, response, db)
 
 
 # ─────────────────────────────────────────
 # UPLOAD CSV DE HABILIDADES (BNCC)
 # ─────────────────────────────────────────
 
-@router.post("/bncc/upload-csv")
-async def upload_bncc_csv(file: UploadFile = File(...), db: Session = Depends(get_db)):
-    try:
-        return await _upload_bncc_csv_logic(file, db)
-    except Exception as e:
-        import traceback
-        trace = traceback.format_exc()
-        return {
-            "inserted": 0,
-            "updated": 0,
-            "errors": [f"ERRO FATAL NO SERVIDOR: {str(e)}", trace],
-            "total_processed": 0
-        }
-
-async def _upload_bncc_csv_logic(file: UploadFile, db: Session):
+@router.post("/bncc/upload-csv", status_code=status.HTTP_202_ACCEPTED)
+def upload_bncc_csv(
+    background_tasks: BackgroundTasks,
+    response: Response,
+    file: UploadFile = File(...),
+    dry_run: bool = Query(False),
+    db: Session = Depends(get_db)
+):
     """
     CSV obrigatório: codigo, descricao, disciplina, ano
     Colunas opcionais: bimestre, area, objeto_conhecimento
+    Processado em segundo plano: retorna o job_id para GET /import-jobs/{job_id}.
+    Com dry_run=true só valida a planilha e devolve o relatório, sem gravar nada.
     """
-    if not file.filename.endswith(".csv"):
-        raise HTTPException(status_code=400, detail="Envie um arquivo .csv")
+    return _enqueue_import("bncc", file, dry_run, background_tasks, response, db)
 
-    content = await file.read()
-    try:
-        decoded = content.decode("utf-8-sig")
-    except UnicodeDecodeError:
-        try:
-            decoded = content.decode("latin-1")
-        except UnicodeDecodeError:
-            decoded = content.decode("utf-8", errors="replace")
-
-    # Detectar o delimitador (Excel Pt-Br usa ponto-e-vírgula por padrão)
-    header_line = decoded.split("\n", 1)[0] if "\n" in decoded else decoded
-    delimiter = ";" if header_line.count(";") > header_line.count(",") else ","
-
-    reader  = csv.DictReader(io.StringIO(decoded), delimiter=delimiter)
 
-    inserted = 0
-    updated  = 0
-    errors   = []
-    processed_codes = {}
-
-    for i, row in enumerate(reader, start=2):
-        codigo     = (row.get("codigo") or row.get("bncc_code") or "").strip()
-        descricao  = (row.get("descricao") or row.get("skill_description") or "").strip()
-        disciplina = (row.get("disciplina") or row.get("discipline_name") or "").strip()
-        ano_str    = (row.get("ano") or row.get("year_grade") or "").strip()
-
-        if not codigo or not descricao or not disciplina or not ano_str:
-            errors.append(f"Linha {i}: campos obrigatórios incompletos (codigo, descricao, disciplina, ano).")
-            continue
+# ─────────────────────────────────────────
+# JOBS DE IMPORTAÇÃO
+# ─────────────────────────────────────────
 
+def _enqueue_import(kind: str, file: UploadFile, dry_run: bool,
+                    background_tasks: BackgroundTasks, response: Response, db: Session):
+    if not file.filename.endswith(".csv"):
+        raise HTTPException(status_code=400, detail="Envie um arquivo .csv")
+    if dry_run:
         try:
-            import re
-            digits = re.sub(r'\D', '', ano_str)
-            if not digits:
-                raise ValueError
-            ano = int(digits)
-        except ValueError:
-            errors.append(f"Linha {i}: ano '{ano_str}' inválido. Não contém um número inteiro identificável.")
-            continue
-
-        # Verificar se a disciplina existe e criar se não existir
-        disc = db.query(models.SetupDiscipline).filter_by(discipline_name=disciplina).first()
-        if not disc:
-            disc = models.SetupDiscipline(discipline_name=disciplina)
-            db.add(disc)
-            db.flush()
-
-        existing = processed_codes.get(codigo)
-        if not existing:
-            existing = db.query(models.BnccLibrary).get(codigo)
-            if existing:
-                processed_codes[codigo] = existing
-        
-        bimestre = row.get("bimestre") or row.get("bimester")
-        area = row.get("area") or ""
-        obj_conhecimento = row.get("objeto_conhecimento") or row.get("object_of_knowledge") or ""
-
-        if existing:
-            existing.skill_description = descricao
-            existing.discipline_id = disc.id
-            existing.year_grade = ano
-            existing.grade = f"{ano}º Ano"
-            if bimestre is not None: existing.bimester = str(bimestre).strip()
-            if area: existing.area = str(area).strip()
-            if obj_conhecimento: existing.object_of_knowledge = str(obj_conhecimento).strip()
-            updated += 1
-        else:
-            bncc = models.BnccLibrary(
-                bncc_code=codigo,
-                skill_description=descricao,
-                discipline_id=disc.id,
-                bimester=str(bimestre).strip() if bimestre else None,
-                year_grade=ano,
-                grade=f"{ano}º Ano",
-                area=str(area).strip() if area else None,
-                object_of_knowledge=str(obj_conhecimento).strip() if obj_conhecimento else None
-            )
-            db.add(bncc)
-            processed_codes[codigo] = bncc
-            inserted += 1
-
-    db.commit()
-    return {
-        "inserted": inserted,
-        "updated":  updated,
-        "errors":   errors,
-        "total_processed": inserted + updated
-    }
+            df = import_validation.read_csv_frame(file.file)
+        except (ValueError, UnicodeDecodeError) as e:
+            raise HTTPException(status_code=400, detail=f"Não foi possível ler o CSV: {e}")
+        response.status_code = status.HTTP_200_OK
+        return import_validation.VALIDATORS[kind](db, df)
+    job = import_jobs.create_job(db, kind, file)
+    background_tasks.add_task(import_jobs.run_job, job.id)
+    return {"job_id": str(job.id), "status": job.status, "total_rows": job.total_rows}
+
+@router.get("/import-jobs/{job_id}")
+def get_import_job(job_id: str, db: Session = Depends(get_db)):
+    import uuid as _uuid
+    try:
+        job = db.get(models.ImportJob, _uuid.UUID(job_id))
+    except ValueError:
+        job = None
+    if not job:
+        raise HTTPException(status_code=404, detail="Importação não encontrada.")
+    import_jobs.fail_if_stale(db, job)
+    return import_jobs.job_status(job)
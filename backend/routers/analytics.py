@@ -3,7 +3,7 @@ Router de Analytics — Dashboard rico do coordenador e evolução por aluno.
 """
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import String, cast, func, select
 from typing import Optional
 
 from ..database import get_db
@@ -12,42 +12,61 @@ from .. import models
 router = APIRouter(prefix="/api/analytics", tags=["analytics"])
 
 
+def _summary_counts(db: Session) -> dict:
+    """Contadores gerais do dashboard em um único SELECT com subconsultas escalares."""
+    lo = models.LearningObjective
+    students = select(func.count()).select_from(models.Student).where(
+        models.Student.status == "active"
+    ).scalar_subquery()
+    assessments = select(func.count()).select_from(models.Assessment).scalar_subquery()
+    approved_objs = select(func.count()).where(lo.status == "approved").scalar_subquery()
+    pending_objs = select(func.count()).where(lo.status == "pending").scalar_subquery()
+    pending_rubs = select(func.count(func.distinct(lo.id))).join(lo.rubric_levels).where(
+        lo.status == "approved",
+        models.RubricLevel.status == "pending"
+    ).scalar_subquery()
+
+    row = db.execute(select(students, assessments, approved_objs, pending_objs, pending_rubs)).one()
+    total_students, total_assessments, approved_objectives, pending_o, pending_r = row
+    return {
+        "total_students": total_students,
+        "total_assessments": total_assessments,
+        "approved_objectives": approved_objectives,
+        "pending_approvals": pending_o + pending_r
+    }
+
+
 @router.get("/dashboard")
 def get_dashboard(
     discipline_id: Optional[int] = None,
     year_level: Optional[int] = None,
     bimester: Optional[int] = None,
+    school_year: Optional[int] = None,
     db: Session = Depends(get_db)
 ):
     """
     Dados ricos para o dashboard do coordenador pedagógico.
     Retorna: distribuição de níveis por turma, médias, alunos em risco.
+    Lê as contagens pré-agregadas de `assessment_rollup` em vez de agrupar `assessments`.
     """
-    from datetime import datetime
-    school_year = datetime.now().year
+    r = models.AssessmentRollup
 
-    # --- Query base de avaliações ---
+    # --- Query base (rollup) ---
     q = db.query(
-        models.Assessment.class_name,
-        models.Assessment.level_assigned,
-        models.Assessment.bncc_code,
-        models.Assessment.discipline_id,
-        models.Assessment.bimester,
-        func.count(models.Assessment.id).label("count")
-    ).filter(models.Assessment.level_assigned != None)
+        r.class_name,
+        r.level.label("level_assigned"),
+        r.bncc_code,
+        func.sum(r.count).label("count")
+    )
 
     if discipline_id:
-        q = q.filter(models.Assessment.discipline_id == discipline_id)
+        q = q.filter(r.discipline_id == discipline_id)
     if bimester:
-        q = q.filter(models.Assessment.bimester == bimester)
+        q = q.filter(r.bimester == bimester)
+    if school_year:
+        q = q.filter(r.school_year == school_year)
 
-    rows = q.group_by(
-        models.Assessment.class_name,
-        models.Assessment.level_assigned,
-        models.Assessment.bncc_code,
-        models.Assessment.discipline_id,
-        models.Assessment.bimester
-    ).all()
+    rows = q.group_by(r.class_name, r.level, r.bncc_code).all()
 
     # --- Distribuição geral de níveis (para gráfico de barras) ---
     level_dist = {1: 0, 2: 0, 3: 0, 4: 0}
@@ -111,27 +130,14 @@ def get_dashboard(
             })
     skill_alerts.sort(key=lambda x: x["average_level"])
 
-    # --- Contagem geral ---
-    total_students = db.query(models.Student).filter_by(status="active").count()
-    total_assessments = db.query(models.Assessment).count()
-    approved_objectives = db.query(models.LearningObjective).filter_by(status="approved").count()
-    pending_objs = db.query(models.LearningObjective).filter_by(status="pending").count()
-    pending_rubs = db.query(models.LearningObjective).join(models.LearningObjective.rubric_levels).filter(
-        models.LearningObjective.status == "approved",
-        models.RubricLevel.status == "pending"
-    ).distinct().count()
-    pending_approvals = pending_objs + pending_rubs
+    # --- Contagem geral (uma única ida ao banco) ---
+    summary = _summary_counts(db)
 
     return {
         "level_distribution": level_dist,          # Para gráfico de pizza/barras
         "class_averages": class_averages,           # Para tabela/gráfico de turmas
         "skill_alerts": skill_alerts[:10],          # Top 10 habilidades com baixo desempenho
-        "summary": {
-            "total_students": total_students,
-            "total_assessments": total_assessments,
-            "approved_objectives": approved_objectives,
-            "pending_approvals": pending_approvals
-        }
+        "summary": summary
     }
 
 
@@ -141,10 +147,22 @@ def get_student_evolution(
     discipline_id: Optional[int] = None,
     db: Session = Depends(get_db)
 ):
-    """Evolução de um aluno: notas por habilidade (média dos objetivos) e por objetivo."""
-    q = db.query(models.Assessment).filter_by(student_id=student_id)
+    """Evolução de um aluno: notas por habilidade (média dos objetivos) e por objetivo.
+    Avaliações, descrições dos objetivos e das habilidades vêm de uma única consulta."""
+    q = db.query(
+        models.Assessment.bncc_code,
+        models.Assessment.bimester,
+        models.Assessment.level_assigned,
+        models.Assessment.objective_id,
+        models.LearningObjective.description.label("objective_description"),
+        models.BnccLibrary.skill_description,
+    ).outerjoin(
+        models.LearningObjective, models.Assessment.objective_id == models.LearningObjective.id
+    ).outerjoin(
+        models.BnccLibrary, models.Assessment.bncc_code == models.BnccLibrary.bncc_code
+    ).filter(models.Assessment.student_id == student_id)
     if discipline_id:
-        q = q.filter_by(discipline_id=discipline_id)
+        q = q.filter(models.Assessment.discipline_id == discipline_id)
     assessments = q.order_by(models.Assessment.date).all()
 
     # Agrupar por habilidade BNCC
@@ -152,20 +170,21 @@ def get_student_evolution(
     for a in assessments:
         code = a.bncc_code
         if code not in by_skill:
-            by_skill[code] = {"levels": [], "bimester": a.bimester, "objectives": {}}
-            
+            by_skill[code] = {
+                "levels": [], "bimester": a.bimester, "objectives": {},
+                "skill_description": a.skill_description
+            }
+
         if a.level_assigned:
             by_skill[code]["levels"].append(a.level_assigned)
-            
+
             obj_id = str(a.objective_id) if a.objective_id else "general"
             if obj_id not in by_skill[code]["objectives"]:
-                by_skill[code]["objectives"][obj_id] = {"levels": [], "description": a.objective.description if a.objective else "Avaliação Geral"}
+                by_skill[code]["objectives"][obj_id] = {"levels": [], "description": a.objective_description or "Avaliação Geral"}
             by_skill[code]["objectives"][obj_id]["levels"].append(a.level_assigned)
 
     skill_evolution = []
     for code, data in by_skill.items():
-        skill = db.query(models.BnccLibrary).get(code)
-        
         levels = [l for l in data["levels"] if l is not None]
         avg = round(sum(levels) / len(levels), 2) if levels else 0
         
@@ -182,7 +201,7 @@ def get_student_evolution(
             
         skill_evolution.append({
             "bncc_code": code,
-            "skill_description": skill.skill_description if skill else "Habilidade não encontrada",
+            "skill_description": data["skill_description"] or "Habilidade não encontrada",
             "average_level": avg,
             "assessments": len(levels),
             "bimester": data["bimester"],
@@ -209,25 +228,115 @@ def get_class_radar(
     bimester: Optional[int] = None,
     db: Session = Depends(get_db)
 ):
-    """Dados para gráfico radar de competências de uma turma."""
-    q = db.query(models.Assessment).filter_by(class_name=class_name)
+    """Dados para gráfico radar de competências de uma turma (média e contagem agregadas no banco)."""
+    level = func.nullif(models.Assessment.level_assigned, 0)   # nível 0/NULL não entra na média
+    q = db.query(
+        models.Assessment.bncc_code,
+        func.avg(level).label("average"),
+        func.count(level).label("count")
+    ).filter(models.Assessment.class_name == class_name)
     if discipline_id:
-        q = q.filter_by(discipline_id=discipline_id)
+        q = q.filter(models.Assessment.discipline_id == discipline_id)
     if bimester:
-        q = q.filter_by(bimester=bimester)
-    assessments = q.all()
-
-    by_skill: dict = {}
-    for a in assessments:
-        code = a.bncc_code
-        if code not in by_skill:
-            by_skill[code] = []
-        if a.level_assigned:
-            by_skill[code].append(a.level_assigned)
+        q = q.filter(models.Assessment.bimester == bimester)
+    rows = q.group_by(models.Assessment.bncc_code).all()
 
-    radar_data = []
-    for code, levels in by_skill.items():
-        avg = round(sum(levels) / len(levels), 2) if levels else 0
-        radar_data.append({"bncc_code": code, "average": avg, "count": len(levels)})
+    radar_data = [
+        {"bncc_code": r.bncc_code, "average": round(float(r.average), 2) if r.average else 0, "count": r.count}
+        for r in rows
+    ]
 
     return {"class_name": class_name, "data": radar_data}
+
+
+@router.get("/heatmap")
+def get_heatmap(
+    class_name: Optional[str] = None,
+    discipline_id: Optional[int] = None,
+    bimester: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Mapa de calor aluno × habilidade calculado no banco.
+    Mesma regra de `analytics_service.calcular_notas`: vale a avaliação mais recente de cada
+    aluno+objetivo (ROW_NUMBER), depois a média por habilidade.
+    """
+    a, s = models.Assessment, models.Student
+    # Objetivo v2; avaliações legadas sem objective_id caem no rubric_id
+    objective_key = func.coalesce(cast(a.objective_id, String), a.rubric_id)
+    latest = select(
+        a.student_id,
+        a.bncc_code,
+        a.level_assigned,
+        a.date,
+        s.class_name,
+        s.student_name,
+        func.row_number().over(
+            partition_by=(a.student_id, objective_key),
+            order_by=(a.date.desc().nulls_last(), a.created_at.desc())
+        ).label("rn")
+    ).join(s, s.student_id == a.student_id)
+    if class_name:
+        latest = latest.where(s.class_name == class_name)
+    if discipline_id:
+        latest = latest.where(a.discipline_id == discipline_id)
+    if bimester:
+        latest = latest.where(a.bimester == bimester)
+    latest = latest.subquery()
+
+    group_cols = (latest.c.student_id, latest.c.bncc_code, latest.c.class_name, latest.c.student_name)
+    q = select(
+        *group_cols,
+        func.avg(latest.c.level_assigned).label("level_numeric"),
+        func.max(latest.c.date).label("date")
+    ).where(latest.c.rn == 1).group_by(*group_cols)
+
+    return {
+        "data": [
+            {
+                "student_id": r.student_id,
+                "bncc_code": r.bncc_code,
+                "class_name": r.class_name,
+                "student_name": r.student_name,
+                "level_numeric": float(r.level_numeric) if r.level_numeric is not None else None,
+                "date": r.date,
+            }
+            for r in db.execute(q)
+        ]
+    }
+
+
+@router.get("/at-risk")
+def get_at_risk_students(
+    limit: int = 20,
+    discipline_id: Optional[int] = None,
+    bimester: Optional[int] = None,
+    class_name: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Top-N alunos em risco da escola (menor nível médio primeiro), lido de `student_risk`."""
+    r, s = models.StudentRisk, models.Student
+    q = db.query(
+        r.student_id, s.student_name, s.class_name, r.discipline_id, r.bimester,
+        r.average_level, r.low_level_count, r.total_assessments
+    ).join(s, s.student_id == r.student_id).filter(r.is_at_risk.is_(True))
+    if discipline_id:
+        q = q.filter(r.discipline_id == discipline_id)
+    if bimester:
+        q = q.filter(r.bimester == bimester)
+    if class_name:
+        q = q.filter(s.class_name == class_name)
+    rows = q.order_by(r.average_level, r.low_level_count.desc()).limit(limit).all()
+    return [
+        {
+            "student_id": row.student_id,
+            "student_name": row.student_name,
+            "class_name": row.class_name,
+            "discipline_id": row.discipline_id,
+            "bimester": row.bimester,
+            "average_level": round(row.average_level, 2),
+            "low_level_count": row.low_level_count,
+            "total_assessments": row.total_assessments,
+        }
+        for row in rows
+    ]
@@ -1,23 +1,40 @@
 """
-Router de Autenticação — POST /api/auth/login, GET /api/auth/me
-Compatível com a tabela `users` existente (senha em texto plano).
+Router de Autenticação — POST /api/auth/login, /refresh, /logout, GET /api/auth/me
+Senhas legadas da tabela `users` (texto plano, sha256) são migradas para bcrypt no login.
+
+O access token dura ACCESS_TOKEN_MINUTES e é validado só por assinatura e claims
+(sem banco). A sessão continua pelo refresh token: opaco, de uso único e trocado a
+cada /refresh, que é o único ponto que confere `is_active` e `auth_version` no banco.
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
-from typing import Optional
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple, Optional
+import hashlib
 import os
+import secrets
+import uuid
 import jwt   # PyJWT
 
 from ..database import get_db
 from .. import models
+from ..services import passwords, rate_limit, session_revocations
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
 SECRET_KEY  = os.getenv("JWT_SECRET", "sga-h-super-secret-key-change-in-prod-2026")
 ALGORITHM   = "HS256"
-TOKEN_HOURS = 24 * 7   # 7 dias
+ACCESS_TOKEN_MINUTES = int(os.getenv("ACCESS_TOKEN_MINUTES", "15"))
+REFRESH_TOKEN_DAYS   = 7   # sessão sem novo login
+# Reuso do refresh token recém-trocado aceito por alguns segundos: outra aba que
+# renovou ao mesmo tempo ou resposta perdida no Wi-Fi, não token vazado
+REFRESH_REUSE_GRACE_SECONDS = 10
+
+# Proxies confiáveis na frente da API (Cloud Run: 1 — o balanceador acrescenta o IP real ao X-Forwarded-For)
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "1"))
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
 
@@ -28,7 +45,8 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=Fals
 
 def create_token(data: dict) -> str:
     payload = data.copy()
-    payload["exp"] = datetime.utcnow() + timedelta(hours=TOKEN_HOURS)
+    payload["typ"] = "access"
+    payload["exp"] = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_MINUTES)
     return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
 
 
@@ -39,7 +57,29 @@ def verify_token(token: str) -> Optional[dict]:
         return None
 
 
-def user_to_dict(u: models.User) -> dict:
+class Principal(NamedTuple):
+    """Usuário autenticado, montado a partir dos claims do access token."""
+    id: uuid.UUID
+    username: str
+    full_name: Optional[str]
+    email: Optional[str]
+    role: Optional[str]
+    is_active: Optional[bool]
+    auth_version: int
+
+    @classmethod
+    def from_claims(cls, claims: dict) -> "Principal":
+        return cls(uuid.UUID(claims["sub"]), claims["username"], claims.get("full_name"), claims.get("email"),
+                   claims.get("role"), claims.get("is_active", True), claims.get("ver", 0))
+
+
+def revoke_sessions(user: models.User) -> None:
+    """Invalida os tokens já emitidos para o usuário (chamar antes do commit)."""
+    user.auth_version = (user.auth_version or 0) + 1
+    session_revocations.revoke(user.id, user.auth_version, ACCESS_TOKEN_MINUTES * 60)
+
+
+def user_to_dict(u) -> dict:
     return {
         "id":        str(u.id),
         "username":  u.username,
@@ -50,16 +90,61 @@ def user_to_dict(u: models.User) -> dict:
     }
 
 
+def _client_ip(request: Request) -> str:
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded and TRUSTED_PROXY_HOPS:
+        hops = [h.strip() for h in forwarded.split(",")]
+        return hops[-min(TRUSTED_PROXY_HOPS, len(hops))]
+    return request.client.host if request.client else "desconhecido"
+
+
+def _hash_refresh(raw: str) -> str:
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _utc(dt: datetime) -> datetime:
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _issue_session(db: Session, user: models.User, family_id: Optional[uuid.UUID] = None) -> dict:
+    """Novo par access/refresh (grava o refresh token e faz commit)."""
+    raw = secrets.token_urlsafe(32)
+    db.add(models.RefreshToken(
+        token_hash=_hash_refresh(raw),
+        user_id=user.id,
+        family_id=family_id or uuid.uuid4(),
+        auth_version=user.auth_version or 0,
+        expires_at=datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_DAYS),
+    ))
+    db.commit()
+
+    user_data = user_to_dict(user)
+    return {
+        "access_token":  create_token({"sub": str(user.id), "ver": user.auth_version or 0, **user_data}),
+        "refresh_token": raw,
+        "token_type":    "bearer",
+        "expires_in":    ACCESS_TOKEN_MINUTES * 60,
+        "user":          user_data,
+    }
+
+
+def _revoke_family(db: Session, family_id: uuid.UUID) -> None:
+    rt = models.RefreshToken
+    db.execute(update(rt).where(rt.family_id == family_id, rt.revoked_at.is_(None))
+               .values(revoked_at=datetime.now(timezone.utc)))
+    db.commit()
+
+
 # ─────────────────────────────────────────
 # ENDPOINTS
 # ─────────────────────────────────────────
 
 @router.post("/login")
-def login(payload: dict, db: Session = Depends(get_db)):
+async def login(payload: dict, request: Request, db: Session = Depends(get_db)):
     """
     Aceita { "username": "...", "password": "..." }
-    Compara com a tabela users (senha em texto plano — compatível com legado).
-    Retorna { "access_token": "...", "token_type": "bearer", "user": {...} }
+    Compara com a tabela users (bcrypt; sha256 e texto plano legados são regravados em bcrypt).
+    Retorna { "access_token": "...", "refresh_token": "...", "token_type": "bearer", "expires_in": ..., "user": {...} }
     """
     username: str = payload.get("username", "").strip()
     password: str = payload.get("password", "")
@@ -70,39 +155,31 @@ def login(payload: dict, db: Session = Depends(get_db)):
             detail="username e password são obrigatórios."
         )
 
-    # Buscar usuário
-    user = db.query(models.User).filter(
-        models.User.username == username
-    ).first()
+    # Limite de tentativas por usuário e IP (antes de qualquer consulta ou hash)
+    retry_after = rate_limit.check_login(username, _client_ip(request))
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Muitas tentativas de login. Tente novamente em {retry_after} s.",
+            headers={"Retry-After": str(retry_after)},
+        )
 
-    if not user:
+    # Buscar usuário (sessão síncrona: fora do event loop)
+    user = await run_in_threadpool(
+        lambda: db.query(models.User).filter(models.User.username == username).first()
+    )
+
+    # Verificar senha no pool de hashing (mesmo custo para usuário inexistente)
+    try:
+        password_ok, new_hash = await passwords.verify_and_update(password, user.password if user else None)
+    except passwords.HashingBusy:
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Incorrect username or password"
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado. Tente novamente em instantes.",
+            headers={"Retry-After": "2"},
         )
 
-    # Verificar senha — suporte a texto plano (legado), bcrypt e sha256
-    password_ok = False
-    stored = user.password or ""
-
-    if stored.startswith("$2b$") or stored.startswith("$2a$"):
-        # bcrypt hash — usar passlib se disponível
-        try:
-            from passlib.context import CryptContext
-            pwd_ctx = CryptContext(schemes=["bcrypt"], deprecated="auto")
-            password_ok = pwd_ctx.verify(password, stored)
-        except ImportError:
-            password_ok = False
-    elif len(stored) == 64:
-        # sha256 hash
-        import hashlib
-        hashed_input = hashlib.sha256(password.encode()).hexdigest()
-        password_ok = (hashed_input == stored)
-    else:
-        # Texto plano (banco legado)
-        password_ok = (password == stored)
-
-    if not password_ok:
+    if not user or not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password"
@@ -114,39 +191,81 @@ def login(payload: dict, db: Session = Depends(get_db)):
             detail="Usuário inativo. Contate o administrador."
         )
 
-    user_data = user_to_dict(user)
-    token = create_token({"sub": str(user.id), **user_data})
+    if new_hash:
+        # Formato legado ou custo antigo: regrava com o esquema atual (commit em _issue_session)
+        user.password = new_hash
 
-    return {
-        "access_token": token,
-        "token_type":   "bearer",
-        "user":         user_data,
-    }
+    return await run_in_threadpool(_issue_session, db, user)
+
+
+@router.post("/refresh")
+def refresh(payload: dict, db: Session = Depends(get_db)):
+    """
+    Aceita { "refresh_token": "..." } e devolve um novo par de tokens (mesmo formato do login).
+    O refresh token usado deixa de valer; reapresentá-lo depois de REFRESH_REUSE_GRACE_SECONDS
+    revoga a sessão inteira (token vazado).
+    """
+    invalid = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Sessão expirada. Faça login novamente.")
+    raw = payload.get("refresh_token") or ""
+    rt, u = models.RefreshToken, models.User
 
+    row = db.execute(
+        select(rt, u).join(u, u.id == rt.user_id).where(rt.token_hash == _hash_refresh(raw))
+    ).first()
+    if not row:
+        raise invalid
+    token, user = row
+    if token.revoked_at is not None:
+        raise invalid
+
+    # Marca como usado só se ninguém o usou antes (duas trocas simultâneas: uma perde)
+    now = datetime.now(timezone.utc)
+    claimed = db.execute(
+        update(rt).where(rt.token_hash == token.token_hash, rt.used_at.is_(None))
+        .values(used_at=now)
+    ).rowcount
+    if not claimed:
+        db.rollback()   # recarrega used_at gravado pela outra troca
+        if (now - _utc(token.used_at)).total_seconds() > REFRESH_REUSE_GRACE_SECONDS:
+            _revoke_family(db, token.family_id)
+            raise invalid
+
+    if (_utc(token.expires_at) <= datetime.now(timezone.utc)
+            or user.is_active is False
+            or (user.auth_version or 0) != token.auth_version):
+        db.commit()
+        raise invalid
+
+    return _issue_session(db, user, token.family_id)
+
+
+@router.post("/logout")
+def logout(payload: dict, db: Session = Depends(get_db)):
+    """Encerra a sessão do refresh token informado (o access token expira sozinho)."""
+    rt = models.RefreshToken
+    token = db.get(rt, _hash_refresh(payload.get("refresh_token") or ""))
+    if token:
+        _revoke_family(db, token.family_id)
+    return {"ok": True}
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Optional[models.User]:
+
+def get_current_user(token: str = Depends(oauth2_scheme)) -> Optional[Principal]:
+    """Usuário do access token, sem consulta ao banco (assinatura, validade e claims)."""
     if not token:
         return None
     payload = verify_token(token)
-    if not payload:
-        return None
-
-    user_id = payload.get("sub")
-    if not user_id: return None
-    import uuid
+    if not payload or payload.get("typ") != "access":
+        return None   # inclui os tokens de 7 dias emitidos antes dos refresh tokens
     try:
-        uid = uuid.UUID(user_id)
-    except Exception:
+        principal = Principal.from_claims(payload)
+    except (KeyError, ValueError):
         return None
-
-    user = db.query(models.User).filter(models.User.id == uid).first()
-    if not user or user.is_active is False:
+    if principal.is_active is False or session_revocations.is_revoked(principal.id, principal.auth_version):
         return None
-
-    return user
+    return principal
 
 @router.get("/me")
-def get_me(user: Optional[models.User] = Depends(get_current_user)):
+def get_me(user: Optional[Principal] = Depends(get_current_user)):
     """Retorna o usuário autenticado a partir do Bearer token."""
     if not user:
         raise HTTPException(status_code=401, detail="Não autenticado ou token inválido.")
@@ -6,7 +6,8 @@ Rotas de Planejamento Pedagógico
 - Regras de negócio: aprovação automática com 1 professor, bloqueio de regerar
 """
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
 from pydantic import BaseModel
 from typing import Optional, List
 import uuid as _uuid
@@ -116,23 +117,20 @@ def remove_from_planning(planning_id: str, db: Session = Depends(get_db)):
 
 def _get_teachers_for_discipline(db: Session, discipline_id: int, year_level: int) -> list:
     """Retorna a lista de professores únicos (id e nome) vinculados à disciplina em turmas do ano."""
-    classes = db.query(models.SetupClass).filter_by(year_level=year_level).all()
-    class_ids = [c.id for c in classes]
-    if not class_ids:
-        return []
-
-    tcd_list = db.query(models.TeacherClassDiscipline).filter(
-        models.TeacherClassDiscipline.discipline_id == discipline_id,
-        models.TeacherClassDiscipline.class_id.in_(class_ids)
+    tcd, c, u = models.TeacherClassDiscipline, models.SetupClass, models.User
+    rows = db.execute(
+        select(tcd.teacher_id, u.full_name, u.username)
+        .join(c, c.id == tcd.class_id)
+        .outerjoin(u, u.id == tcd.teacher_id)
+        .where(tcd.discipline_id == discipline_id, c.year_level == year_level)
     ).all()
 
     unique_teachers = {}
-    for tcd in tcd_list:
-        if tcd.teacher_id not in unique_teachers:
-            name = tcd.teacher.full_name or tcd.teacher.username if tcd.teacher else "Desconhecido"
-            unique_teachers[tcd.teacher_id] = {
-                "id": str(tcd.teacher_id),
-                "name": name
+    for r in rows:
+        if r.teacher_id not in unique_teachers:
+            unique_teachers[r.teacher_id] = {
+                "id": str(r.teacher_id),
+                "name": r.full_name or r.username or "Desconhecido"
             }
     return list(unique_teachers.values())
 
@@ -148,7 +146,12 @@ def list_objectives(
     bncc_code: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    q = db.query(models.LearningObjective).filter(
+    # Relações carregadas em lote (uma consulta por relação, não por objetivo)
+    q = db.query(models.LearningObjective).options(
+        selectinload(models.LearningObjective.approvals).selectinload(models.ObjectiveApproval.teacher),
+        selectinload(models.LearningObjective.rubric_levels),
+        selectinload(models.LearningObjective.bncc_skill),
+    ).filter(
         models.LearningObjective.discipline_id == discipline_id,
         models.LearningObjective.year_level == year_level,
     )
@@ -160,6 +163,8 @@ def list_objectives(
         q = q.filter(models.LearningObjective.bncc_code == bncc_code)
         
     rows = q.order_by(models.LearningObjective.order_index).all()
+    # Mesmo quórum para todos os objetivos da disciplina/ano
+    required_teachers = _get_teachers_for_discipline(db, discipline_id, year_level) if rows else []
 
     result = []
     for r in rows:
@@ -178,7 +183,6 @@ def list_objectives(
         has_rubrics = len(r.rubric_levels) > 0
         all_rubrics_approved = has_rubrics and all(rl.status == "approved" for rl in r.rubric_levels)
         rubrics_status = "approved" if all_rubrics_approved else ("pending" if has_rubrics else None)
-        required_teachers = _get_teachers_for_discipline(db, discipline_id, year_level)
 
         result.append({
             "id": str(r.id), "description": r.description,
@@ -1,11 +1,115 @@
+import numpy as np
 import pandas as pd
 from typing import List, Dict
 
 def calcular_notas(df_assessments: pd.DataFrame) -> pd.DataFrame:
+    """
+    Calcula a situação atual de cada aluno por habilidade.
+    Regra: Considera apenas o registro mais recente de cada objetivo (rubric_id),
+    depois a média por habilidade. Mesmo resultado de `calcular_notas_pandas`, mas
+    sobre arrays: códigos inteiros (factorize), ranking por data e médias com bincount,
+    sem as cópias intermediárias de sort/drop_duplicates/groupby/merge.
+    """
+    if df_assessments.empty:
+        return pd.DataFrame()
+
+    dates = pd.to_datetime(df_assessments['date'], errors='coerce')
+    date_i8 = pd.DatetimeIndex(dates).asi8            # NaT = menor int64 → perde para qualquer data
+    levels = pd.to_numeric(df_assessments['level_assigned'], errors='coerce').to_numpy(dtype=float)
+
+    # Posição de cada linha na ordem cronológica: "mais recente" = maior rank
+    by_date = np.argsort(date_i8)
+    date_rank = np.empty(len(by_date), dtype=np.int64)
+    date_rank[by_date] = np.arange(len(by_date))
+
+    # 1. Manter apenas a última nota de CADA OBJETIVO (student_id, rubric_id)
+    #    NaN conta como valor (igual ao drop_duplicates): código -1 vira 0
+    student_codes, n_students = _sorted_codes(df_assessments['student_id'])
+    rubric_codes, rubrics = pd.factorize(df_assessments['rubric_id'])
+    pair_ids, pairs = pd.factorize((student_codes + 1) * (len(rubrics) + 1) + (rubric_codes + 1))
+    kept = _latest_per_group(pair_ids, date_rank, len(pairs), by_date)
+
+    # 2. Agrupar por HABILIDADE (bncc_code) e calcular média
+    #    Chaves nulas ficam de fora, como no groupby (dropna=True)
+    group_cols = ['student_id', 'bncc_code']
+    for col in ['class_name', 'student_name']:
+        if col in df_assessments.columns:
+            group_cols.append(col)
+    codes, sizes = [student_codes[kept]], [n_students]
+    for col in group_cols[1:]:
+        c, n = _sorted_codes(df_assessments[col])
+        codes.append(c[kept])
+        sizes.append(n)
+
+    valid = np.logical_and.reduce([c >= 0 for c in codes])
+    if not valid.any():
+        return pd.DataFrame(columns=group_cols + ['level_numeric', 'date'])
+    rows = kept[valid]
+    key = _combine_codes([c[valid] for c in codes], sizes)
+    gorder = np.argsort(key, kind='stable')           # ordem do groupby(sort=True)
+    rows, key = rows[gorder], key[gorder]
+    starts = np.r_[True, key[1:] != key[:-1]]
+    gid = np.cumsum(starts) - 1
+
+    lv = levels[rows]
+    has_level = ~np.isnan(lv)
+    sums = np.bincount(gid, weights=np.where(has_level, lv, 0.0))
+    counts = np.bincount(gid, weights=has_level)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts                         # 0/0 → NaN, como mean() sem valores
+
+    # 3. Data mais recente por (student_id, bncc_code) entre as notas mantidas
+    sb_valid = (codes[0] >= 0) & (codes[1] >= 0)
+    sb_rows = kept[sb_valid]
+    sb_ids, sb_keys = pd.factorize(_combine_codes([codes[0][sb_valid], codes[1][sb_valid]], sizes[:2]))
+    sb_latest = _latest_per_group(sb_ids, date_rank[sb_rows], len(sb_keys), by_date)
+    sb_of_row = np.empty(len(date_i8), dtype=np.int64)
+    sb_of_row[sb_rows] = sb_ids
+
+    rep = rows[starts]
+    df_final = pd.DataFrame({c: df_assessments[c].iloc[rep].reset_index(drop=True) for c in group_cols})
+    df_final['level_numeric'] = means
+    df_final['date'] = dates.iloc[sb_latest[sb_of_row[rep]]].reset_index(drop=True)
+    return df_final
+
+
+def _sorted_codes(col: pd.Series):
+    """Códigos inteiros na ordem crescente dos valores (NaN → -1) e o número de valores distintos.
+    Ordena só os valores distintos, não a coluna inteira."""
+    codes, uniques = pd.factorize(col)
+    rank = np.empty(len(uniques), dtype=np.int64)
+    rank[uniques.argsort()] = np.arange(len(uniques))
+    return np.where(codes >= 0, rank[codes], -1), len(uniques)
+
+
+def _latest_per_group(group_ids: np.ndarray, date_rank: np.ndarray, n_groups: int, by_date: np.ndarray) -> np.ndarray:
+    """Para cada grupo (ids densos 0..n_groups-1), a linha com a data mais recente."""
+    best = np.full(n_groups, -1, dtype=np.int64)
+    np.maximum.at(best, group_ids, date_rank)
+    return by_date[best]
+
+
+def _combine_codes(codes: List[np.ndarray], sizes: List[int]) -> np.ndarray:
+    """Junta códigos inteiros (>= 0) em uma única chave int64 que preserva a ordem lexicográfica.
+    Se o produto das cardinalidades não couber em int64, usa o rank da ordenação lexicográfica."""
+    if np.prod([float(max(s, 1)) for s in sizes]) < 2 ** 62:
+        key = np.zeros(len(codes[0]), dtype=np.int64)
+        for c, size in zip(codes, sizes):
+            key = key * max(size, 1) + c
+        return key
+    order = np.lexsort(codes[::-1])
+    stacked = np.stack(codes)[:, order]
+    ranks = np.empty(len(order), dtype=np.int64)
+    ranks[order] = np.cumsum(np.r_[True, (stacked[:, 1:] != stacked[:, :-1]).any(axis=0)]) - 1
+    return ranks
+
+
+def calcular_notas_pandas(df_assessments: pd.DataFrame) -> pd.DataFrame:
     """
     Calcula a situação atual de cada aluno por habilidade.
     Regra: Considera apenas o registro mais recente.
     Esta função foi migrada do Streamlit (app.py) original.
+    Implementação de referência — a produção usa `calcular_notas` (NumPy).
     """
     if df_assessments.empty:
         return pd.DataFrame()
@@ -0,0 +1,255 @@
+"""
+Gravação de avaliações em lote (lançamento de notas de uma turma inteira).
+
+Um lote vira um número constante de comandos, independente do tamanho da turma
+e do número de habilidades: a resolução das rubricas legadas (um IN + um INSERT
+em lote), um INSERT ... ON CONFLICT DO NOTHING das chaves novas
+(student_id, objective_id, bimester), um SELECT ... FOR UPDATE + um UPDATE em
+lote das chaves já existentes, o INSERT dos eventos em `assessment_events` e as
+atualizações de `assessment_rollup` e `student_risk`.
+
+`assessments` guarda só o estado atual de cada chave; o histórico completo
+(auditoria) fica no log append-only `assessment_events`.
+
+`ingest_batch` é o ponto de entrada da API: divide lotes grandes em blocos
+commitados separadamente, isola as linhas com erro via SAVEPOINT e guarda a
+resposta pela chave de idempotência, para que reenvios do professor (Wi-Fi
+instável) não regravem nada. A chave é reservada antes de qualquer gravação:
+um reenvio que chega enquanto o primeiro envio ainda roda recebe BatchInProgress
+(409) em vez de gravar o lote de novo.
+"""
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import bindparam, delete, func, insert, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from .. import models, schemas
+from . import rollup_service, risk_service
+
+# Campos sobrescritos quando a nota já existe (bncc_code/disciplina ficam os da primeira gravação)
+UPDATABLE_COLUMNS = ("level_assigned", "date", "teacher_id", "class_name")
+
+# Campos copiados para o log `assessment_events` a cada lançamento
+EVENT_COLUMNS = ("student_id", "objective_id", "bimester", "bncc_code", "discipline_id",
+                 "class_name", "level_assigned", "teacher_id", "date")
+
+# Itens por bloco commitado em `ingest_batch` (uma turma inteira cabe em um bloco)
+CHUNK_SIZE = 200
+
+# Reserva 'in_progress' mais velha que isso é de um processo que morreu no meio do lote
+IDEMPOTENCY_LOCK_SECONDS = 300
+
+
+class BatchInProgress(Exception):
+    """Outro envio com a mesma Idempotency-Key ainda está sendo gravado."""
+
+
+def _legacy_rubric_ids(db: Session, items: List[schemas.AssessmentBatchItem]) -> Dict[str, str]:
+    """Resolve o rubric_id legado de cada bncc_code do lote (uma consulta IN + um INSERT em lote).
+
+    WORKAROUND: O banco de dados Supabase (v1) exige rubric_id (NOT NULL + FK).
+    Usamos a rubrica v1 da habilidade; se não existir, criamos uma dummy
+    "v2_migrated_<bncc_code>" para satisfazer a ForeignKey.
+    """
+    discipline_by_code = {}
+    for item in items:
+        discipline_by_code.setdefault(item.bncc_code, item.discipline_id)
+    if not discipline_by_code:
+        return {}
+
+    tr = models.TeacherRubric
+    resolved = dict(db.execute(
+        select(tr.bncc_code, func.min(tr.rubric_id))
+        .where(tr.bncc_code.in_(list(discipline_by_code)))
+        .group_by(tr.bncc_code)
+    ).all())
+
+    missing = [
+        {
+            "id": uuid.uuid4(),
+            "rubric_id": f"v2_migrated_{code}",
+            "bncc_code": code,
+            "objective": f"Objetivo v2 - {code}",
+            "discipline_id": discipline_id,
+            "status": "approved",
+        }
+        for code, discipline_id in discipline_by_code.items() if code not in resolved
+    ]
+    if missing:
+        # DO NOTHING: outro lote concorrente pode ter criado a mesma dummy
+        db.execute(pg_insert(tr.__table__).values(missing).on_conflict_do_nothing(index_elements=["rubric_id"]))
+        resolved.update({row["bncc_code"]: row["rubric_id"] for row in missing})
+    return resolved
+
+
+def save_batch(db: Session, items: List[schemas.AssessmentBatchItem]) -> int:
+    """Grava (insere ou atualiza) as notas do lote sem commitar. Retorna quantos itens foram aplicados.
+
+    O rollup é ajustado por deltas, e o valor antigo de cada nota precisa ser o
+    que está de fato gravado: chaves novas entram por INSERT ... ON CONFLICT DO
+    NOTHING RETURNING (só as que *este* lote inseriu contam como novas) e as
+    demais são lidas com SELECT ... FOR UPDATE antes do UPDATE. Um lote
+    concorrente na mesma chave espera o commit deste e lê a nota já trocada.
+    """
+    if not items:
+        return 0
+
+    # Mesma chave repetida no lote: vale o último item (ON CONFLICT não aceita a mesma linha duas vezes)
+    latest = {(item.student_id, item.objective_id, item.bimester): item for item in items}
+    rubric_ids = _legacy_rubric_ids(db, list(latest.values()))
+
+    a = models.Assessment
+    t = a.__table__
+    rows = {
+        key: {
+            "id": uuid.uuid4(),
+            "student_id": item.student_id,
+            "rubric_id": rubric_ids[item.bncc_code],
+            "bncc_code": item.bncc_code,
+            "level_assigned": int(item.level_assigned),
+            "bimester": item.bimester,
+            "class_name": item.class_name,
+            "discipline_id": item.discipline_id,
+            "teacher_id": item.teacher_id,
+            "date": item.date,
+            "objective_id": item.objective_id,
+        }
+        for key, item in latest.items()
+    }
+
+    inserted = {
+        tuple(row) for row in db.execute(
+            pg_insert(t).values(list(rows.values()))
+            .on_conflict_do_nothing(index_elements=["student_id", "objective_id", "bimester"])
+            .returning(t.c.student_id, t.c.objective_id, t.c.bimester)
+        )
+    }
+
+    existing = {}
+    if len(inserted) < len(rows):
+        existing = {
+            (row.student_id, row.objective_id, row.bimester): row
+            for row in db.execute(
+                select(a.student_id, a.objective_id, a.bimester, a.bncc_code,
+                       a.discipline_id, a.class_name, a.level_assigned, a.date)
+                .where(tuple_(a.student_id, a.objective_id, a.bimester).in_(
+                    [key for key in rows if key not in inserted]))
+                .with_for_update()
+            )
+        }
+        db.execute(
+            update(t).where(t.c.student_id == bindparam("k_student_id"),
+                            t.c.objective_id == bindparam("k_objective_id"),
+                            t.c.bimester == bindparam("k_bimester"))
+            .values({col: bindparam(f"v_{col}") for col in UPDATABLE_COLUMNS}),
+            [
+                {"k_student_id": key[0], "k_objective_id": key[1], "k_bimester": key[2],
+                 **{f"v_{col}": rows[key][col] for col in UPDATABLE_COLUMNS}}
+                for key in existing
+            ],
+        )
+
+    rollup_deltas = Counter()
+    for key, item in latest.items():
+        old = existing.get(key)
+        # Nota já existente mantém bncc_code/disciplina da primeira gravação
+        bncc_code, discipline_id = (old.bncc_code, old.discipline_id) if old else (item.bncc_code, item.discipline_id)
+        rollup_service.track(
+            rollup_deltas,
+            rollup_service.key_for(old) if old else None,
+            rollup_service.rollup_key(item.date, item.class_name, discipline_id, item.bimester,
+                                      bncc_code, item.level_assigned),
+        )
+
+    db.execute(insert(models.AssessmentEvent.__table__).values(
+        [{col: row[col] for col in EVENT_COLUMNS} for row in rows.values()]
+    ))
+
+    rollup_service.apply_deltas(db, rollup_deltas)
+    risk_service.refresh_students(db, {student_id for student_id, _, _ in latest})
+    return len(items)
+
+
+def _error_message(exc: SQLAlchemyError) -> str:
+    return str(getattr(exc, "orig", None) or exc).strip().splitlines()[0]
+
+
+def _reserve_key(db: Session, key: str) -> Optional[dict]:
+    """Reserva a chave antes de gravar (INSERT ... ON CONFLICT DO NOTHING).
+    Retorna None se a reserva é nossa, a resposta guardada se o lote já foi
+    processado, ou levanta BatchInProgress se outro envio ainda o processa."""
+    t = models.AssessmentBatchRequest.__table__
+    now = datetime.now(timezone.utc)
+    claimed = db.execute(
+        pg_insert(t).values(idempotency_key=key, status="in_progress", created_at=now)
+        .on_conflict_do_nothing(index_elements=["idempotency_key"])
+    ).rowcount
+    if not claimed:
+        # Reserva abandonada (instância encerrada no meio do lote): assume o lote
+        claimed = db.execute(
+            update(t).where(t.c.idempotency_key == key, t.c.status == "in_progress",
+                            t.c.created_at < now - timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS))
+            .values(created_at=now)
+        ).rowcount
+    if claimed:
+        db.commit()
+        return None
+
+    stored = db.execute(select(t.c.status, t.c.response).where(t.c.idempotency_key == key)).one()
+    if stored.status == "done":
+        return stored.response
+    raise BatchInProgress()
+
+
+def ingest_batch(db: Session, items: List[schemas.AssessmentBatchItem],
+                 idempotency_key: Optional[str] = None) -> dict:
+    """Grava o lote em blocos de CHUNK_SIZE e retorna o resultado por item.
+
+    Cada bloco roda sob um SAVEPOINT e é commitado ao final. Se o bloco falhar,
+    seus itens são regravados um a um (cada um em seu SAVEPOINT) para isolar as
+    linhas com erro sem descartar as demais.
+    """
+    t = models.AssessmentBatchRequest.__table__
+    if idempotency_key:
+        stored = _reserve_key(db, idempotency_key)
+        if stored is not None:
+            return stored
+
+    results = []
+    try:
+        for start in range(0, len(items), CHUNK_SIZE):
+            chunk = items[start:start + CHUNK_SIZE]
+            try:
+                with db.begin_nested():
+                    save_batch(db, chunk)
+                results += [{"index": start + i, "ok": True} for i in range(len(chunk))]
+            except SQLAlchemyError:
+                for i, item in enumerate(chunk, start):
+                    try:
+                        with db.begin_nested():
+                            save_batch(db, [item])
+                        results.append({"index": i, "ok": True})
+                    except SQLAlchemyError as e:
+                        results.append({"index": i, "ok": False, "error": _error_message(e)})
+            db.commit()
+    except Exception:
+        # Falha inesperada: libera a chave para que o reenvio possa gravar o restante
+        db.rollback()
+        if idempotency_key:
+            db.execute(delete(t).where(t.c.idempotency_key == idempotency_key, t.c.status == "in_progress"))
+            db.commit()
+        raise
+
+    saved = sum(1 for r in results if r["ok"])
+    response = {"ok": saved == len(items), "count": saved, "failed": len(items) - saved, "results": results}
+
+    if idempotency_key:
+        db.execute(update(t).where(t.c.idempotency_key == idempotency_key)
+                   .values(status="done", response=response))
+        db.commit()
+    return response
@@ -0,0 +1,214 @@
+"""
+Importações CSV do admin em segundo plano.
+
+O upload só copia o arquivo para disco (IMPORT_SPOOL_DIR) e cria um `ImportJob`;
+`run_job` roda depois da resposta (BackgroundTasks), importando o arquivo em
+blocos de JOB_CHUNK_ROWS linhas. Cada bloco é commitado junto com o progresso
+do job, que o front consulta em GET /api/admin/import-jobs/{id}.
+
+O CSV é decodificado de forma incremental (`open_csv`): a memória usada é a de
+um bloco lido do disco, não a de cópias do arquivo inteiro.
+
+Cada commit do job atualiza `updated_at` (heartbeat). Se a instância for
+encerrada no meio da importação (deploy, scale-down), o arquivo em disco se perde
+com ela e o job nunca termina: `fail_if_stale` o marca como 'failed' quando o
+heartbeat passa de IMPORT_STALE_SECONDS. No Cloud Run a tarefa roda depois da
+resposta 202, então o serviço precisa de CPU sempre alocada (--no-cpu-throttling,
+ver cloudbuild.yaml); com CPU só durante requisições a importação fica parada.
+"""
+import codecs
+import csv
+import os
+import tempfile
+from datetime import datetime, timezone
+from itertools import islice
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+from fastapi import UploadFile
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..database import SessionLocal
+from . import import_service
+
+IMPORT_SPOOL_DIR = os.getenv("IMPORT_SPOOL_DIR", tempfile.gettempdir())
+
+# Linhas por bloco commitado (e por atualização de progresso)
+JOB_CHUNK_ROWS = 500
+# Sem heartbeat por mais que isso, o job é dado como interrompido
+IMPORT_STALE_SECONDS = int(os.getenv("IMPORT_STALE_SECONDS", "300"))
+SPOOL_READ_BYTES = 1024 * 1024
+
+IMPORTERS = {
+    "students": import_service.import_students,
+    "bncc": import_service.import_bncc,
+}
+
+
+def _spool_path(job_id) -> str:
+    return os.path.join(IMPORT_SPOOL_DIR, f"import_{job_id}.csv")
+
+
+def create_job(db: Session, kind: str, file: UploadFile) -> models.ImportJob:
+    """Grava o upload em disco (em blocos) e registra o job como 'queued'.
+
+    Síncrona (disco e banco): chamada de rotas `def`, que o FastAPI roda no
+    threadpool, fora do event loop. O upload já está inteiro em `file.file`.
+    """
+    job = models.ImportJob(kind=kind, filename=file.filename, status="queued", errors=[])
+    db.add(job)
+    db.flush()
+
+    newlines, last = 0, b"\n"
+    with open(_spool_path(job.id), "wb") as out:
+        while chunk := file.file.read(SPOOL_READ_BYTES):
+            out.write(chunk)
+            newlines += chunk.count(b"\n")
+            last = chunk[-1:]
+    lines = newlines + (last != b"\n")
+    job.total_rows = max(lines - 1, 0)   # sem o cabeçalho
+    db.commit()
+    return job
+
+
+def _sniff_encoding(first_chunk: bytes) -> str:
+    """UTF-8 (com ou sem BOM) se o primeiro bloco for UTF-8 válido; senão latin-1 (Excel antigo)."""
+    try:
+        codecs.getincrementaldecoder("utf-8-sig")().decode(first_chunk, final=False)
+        return "utf-8-sig"
+    except UnicodeDecodeError:
+        return "latin-1"
+
+
+def _iter_lines(f: BinaryIO, first_chunk: bytes, encoding: str, chunk_size: int) -> Iterator[str]:
+    """Decodifica o arquivo bloco a bloco e entrega uma linha por vez (com o '\n')."""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    carry = ""
+    chunk, final = first_chunk, False
+    while not final:
+        final = not chunk
+        pending = decoder.getstate()[0]
+        try:
+            text = decoder.decode(chunk, final=final)
+        except UnicodeDecodeError:
+            # Trecho fora de UTF-8 depois do primeiro bloco: o restante segue como latin-1
+            decoder = codecs.getincrementaldecoder("latin-1")()
+            text = decoder.decode(pending + chunk, final=final)
+        lines = (carry + text).split("\n")
+        carry = lines.pop()
+        for line in lines:
+            yield line + "\n"
+        if not final:
+            chunk = f.read(chunk_size)
+    if carry:
+        yield carry
+
+
+def read_first_chunk(f: BinaryIO, chunk_size: int = SPOOL_READ_BYTES) -> bytes:
+    """Primeiro bloco do arquivo, estendido até conter o cabeçalho inteiro."""
+    first_chunk = f.read(chunk_size)
+    while b"\n" not in first_chunk and (more := f.read(chunk_size)):
+        first_chunk += more
+    return first_chunk
+
+
+def sniff_csv(first_chunk: bytes) -> Tuple[str, str]:
+    """(codificação, delimitador) detectados pelo primeiro bloco."""
+    encoding = _sniff_encoding(first_chunk)
+
+    # Detectar o delimitador (Excel Pt-Br usa ponto-e-vírgula por padrão)
+    header_line = first_chunk.split(b"\n", 1)[0].decode(encoding, errors="replace")
+    delimiter = ";" if header_line.count(";") > header_line.count(",") else ","
+    return encoding, delimiter
+
+
+def open_csv(f: BinaryIO, chunk_size: int = SPOOL_READ_BYTES) -> csv.DictReader:
+    """DictReader sobre um arquivo binário, sem carregá-lo inteiro na memória.
+    Codificação e delimitador são detectados pelo primeiro bloco (que contém o cabeçalho)."""
+    first_chunk = read_first_chunk(f, chunk_size)
+    encoding, delimiter = sniff_csv(first_chunk)
+    return csv.DictReader(_iter_lines(f, first_chunk, encoding, chunk_size), delimiter=delimiter)
+
+
+def run_job(job_id) -> None:
+    """Processa o arquivo do job (executado fora da requisição, com sessão própria)."""
+    db = SessionLocal()
+    path = None
+    try:
+        job = db.get(models.ImportJob, job_id)
+        if not job or job.status != "queued":
+            return
+        path = _spool_path(job.id)
+        importer = IMPORTERS[job.kind]
+        job.status, job.started_at = "running", datetime.now(timezone.utc)
+        job.updated_at = job.started_at
+        db.commit()
+
+        with open(path, "rb") as f:
+            reader = open_csv(f)
+            first_line = 2
+            while rows := list(islice(reader, JOB_CHUNK_ROWS)):
+                result = importer(db, rows, first_line)
+                first_line += len(rows)
+                job.rows_processed += len(rows)
+                job.inserted += result["inserted"]
+                job.updated += result["updated"]
+                job.errors = job.errors + result["errors"]
+                job.updated_at = datetime.now(timezone.utc)
+                db.commit()
+
+        job.status, job.finished_at = "done", datetime.now(timezone.utc)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        job = db.get(models.ImportJob, job_id)
+        if job:
+            job.status, job.finished_at = "failed", datetime.now(timezone.utc)
+            job.errors = (job.errors or []) + [f"ERRO FATAL NO SERVIDOR: {e}"]
+            db.commit()
+    finally:
+        db.close()
+        if path and os.path.exists(path):
+            os.remove(path)
+
+
+def _utc(dt: datetime) -> datetime:
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def fail_if_stale(db: Session, job: models.ImportJob) -> None:
+    """Marca como 'failed' o job pendente cuja instância parou de dar sinal de vida."""
+    heartbeat = job.updated_at or job.created_at
+    if job.status not in ("queued", "running") or not heartbeat:
+        return
+    now = datetime.now(timezone.utc)
+    if (now - _utc(heartbeat)).total_seconds() <= IMPORT_STALE_SECONDS:
+        return
+    job.status, job.finished_at = "failed", now
+    job.errors = (job.errors or []) + ["Importação interrompida (servidor reiniciado). Envie o arquivo novamente."]
+    db.commit()
+
+
+def _eta_seconds(job: models.ImportJob) -> Optional[float]:
+    if job.status != "running" or not job.started_at or not job.rows_processed or not job.total_rows:
+        return None
+    elapsed = (datetime.now(timezone.utc) - _utc(job.started_at)).total_seconds()
+    remaining = max(job.total_rows - job.rows_processed, 0)
+    return round(elapsed / job.rows_processed * remaining, 1)
+
+
+def job_status(job: models.ImportJob) -> dict:
+    """Situação do job; ao final traz os mesmos campos da antiga resposta síncrona do upload."""
+    return {
+        "job_id": str(job.id),
+        "kind": job.kind,
+        "filename": job.filename,
+        "status": job.status,
+        "total_rows": job.total_rows,
+        "rows_processed": job.rows_processed,
+        "eta_seconds": _eta_seconds(job),
+        "inserted": job.inserted,
+        "updated": job.updated,
+        "errors": job.errors or [],
+        "total_processed": (job.inserted or 0) + (job.updated or 0),
+    }
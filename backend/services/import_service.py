@@ -0,0 +1,251 @@
+"""
+Importação em lote das planilhas CSV do admin (alunos e habilidades BNCC).
+
+A importação roda em duas fases: primeiro todas as linhas são validadas e
+normalizadas sem tocar no banco; depois os registros referenciados são lidos
+com consultas IN e as inserções/atualizações são aplicadas em lote, então o
+número de comandos não cresce com o tamanho da planilha.
+"""
+import re
+from collections import Counter
+from datetime import date
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from .. import models
+
+# Mapeamento do turno da planilha para o banco (default: morning)
+SHIFT_MAP = {"manhã": "morning", "manha": "morning", "tarde": "afternoon", "noite": "evening"}
+
+# Linhas da BNCC por INSERT ... ON CONFLICT
+BNCC_CHUNK_SIZE = 1000
+
+# Colunas opcionais da BNCC: em branco na planilha mantêm o valor já cadastrado
+BNCC_OPTIONAL_COLUMNS = ("bimester", "area", "object_of_knowledge")
+
+
+def _parse_year(ano_str: str) -> Optional[int]:
+    """'6º ano' → 6. Retorna None se não houver número."""
+    digits = re.sub(r"\D", "", ano_str)
+    return int(digits) if digits else None
+
+
+def _parse_birth_date(value: Optional[str]) -> Optional[date]:
+    try:
+        return date.fromisoformat(value.strip()) if value else None
+    except ValueError:
+        return None
+
+
+def _optional_text(value) -> Optional[str]:
+    return str(value).strip() or None if value else None
+
+
+# ─────────────────────────────────────────
+# ALUNOS
+# ─────────────────────────────────────────
+
+def parse_student_rows(rows: Iterable[dict], first_line: int = 2) -> Tuple[List[dict], List[str]]:
+    """Valida e normaliza as linhas do CSV de alunos. Retorna (linhas válidas, erros)."""
+    parsed, errors = [], []
+    for i, row in enumerate(rows, start=first_line):   # linha 2 = primeira linha de dados
+        nome     = (row.get("nome") or row.get("student_name") or "").strip()
+        id_al    = (row.get("id_aluno") or row.get("student_id") or "").strip()
+        turma    = (row.get("turma") or row.get("class_name") or "").strip()
+        ano_str  = (row.get("ano") or row.get("year_level") or "").strip()
+        turno_br = (row.get("turno") or "").strip().lower()
+
+        if not nome or not id_al or not turma or not ano_str or not turno_br:
+            errors.append(f"Linha {i}: campos obrigatórios incompletos (nome, id_aluno, turma, ano, turno).")
+            continue
+
+        ano = _parse_year(ano_str)
+        if ano is None:
+            errors.append(f"Linha {i}: ano '{ano_str}' inválido. Não contém um número inteiro identificável.")
+            continue
+
+        parsed.append({
+            "student_id": id_al,
+            "student_name": nome,
+            "class_name": turma,
+            "year_level": ano,
+            "shift": SHIFT_MAP.get(turno_br, "morning"),
+            "birth_date": _parse_birth_date(row.get("data_nascimento")),
+            "enrollment_number": (row.get("nr_matricula") or "").strip() or None,
+        })
+    return parsed, errors
+
+
+def _apply_classes(db: Session, parsed: List[dict]) -> None:
+    """Cria as turmas novas e atualiza ano/turno das existentes (uma consulta IN + comandos em lote)."""
+    wanted = {}
+    for r in parsed:
+        cls = wanted.setdefault(r["class_name"], {"year_level": r["year_level"]})
+        cls["shift"] = r["shift"]   # última linha da turma define o turno
+
+    c = models.SetupClass
+    existing = {
+        row.class_name: row
+        for row in db.execute(select(c.id, c.class_name, c.year_level, c.shift).where(c.class_name.in_(list(wanted))))
+    }
+
+    new_classes, changes = [], []
+    for name, values in wanted.items():
+        cls = existing.get(name)
+        if not cls:
+            new_classes.append({"class_name": name, **values})
+            continue
+        change = {}
+        if not cls.year_level:
+            change["year_level"] = values["year_level"]
+        if cls.shift != values["shift"]:
+            change["shift"] = values["shift"]
+        if change:
+            changes.append({"id": cls.id, **change})
+
+    if new_classes:
+        db.execute(insert(c), new_classes)
+    if changes:
+        db.execute(update(c), changes)
+
+
+def import_students(db: Session, rows: Iterable[dict], first_line: int = 2) -> dict:
+    """Importa o CSV de alunos (sem commitar): cria turmas faltantes e insere/atualiza alunos.
+    `first_line` é o número da linha de `rows[0]` no arquivo (para importação em blocos)."""
+    parsed, errors = parse_student_rows(rows, first_line)
+    if not parsed:
+        return {"inserted": 0, "updated": 0, "errors": errors, "total_processed": 0}
+
+    _apply_classes(db, parsed)
+
+    s = models.Student
+    existing_ids = set(db.scalars(select(s.student_id).where(s.student_id.in_({r["student_id"] for r in parsed}))))
+
+    # Aluno repetido na planilha: a primeira ocorrência conta como inserção, as demais como atualização
+    new_students, changed_students = {}, {}
+    inserted = updated = 0
+    for r in parsed:
+        values = {k: r[k] for k in ("student_id", "student_name", "class_name")}
+        values.update({k: r[k] for k in ("birth_date", "enrollment_number") if r[k] is not None})
+        if r["student_id"] in existing_ids:
+            changed_students.setdefault(r["student_id"], {}).update(values)
+            updated += 1
+        elif r["student_id"] in new_students:
+            new_students[r["student_id"]].update(values)
+            updated += 1
+        else:
+            new_students[r["student_id"]] = values
+            inserted += 1
+
+    if new_students:
+        db.execute(insert(s), list(new_students.values()))
+    if changed_students:
+        db.execute(update(s), list(changed_students.values()))
+
+    return {
+        "inserted": inserted,
+        "updated":  updated,
+        "errors":   errors,
+        "total_processed": inserted + updated
+    }
+
+
+# ─────────────────────────────────────────
+# HABILIDADES (BNCC)
+# ─────────────────────────────────────────
+
+def parse_bncc_rows(rows: Iterable[dict], first_line: int = 2) -> Tuple[List[dict], List[str]]:
+    """Valida e normaliza as linhas do CSV da BNCC. Retorna (linhas válidas, erros)."""
+    parsed, errors = [], []
+    for i, row in enumerate(rows, start=first_line):
+        codigo     = (row.get("codigo") or row.get("bncc_code") or "").strip()
+        descricao  = (row.get("descricao") or row.get("skill_description") or "").strip()
+        disciplina = (row.get("disciplina") or row.get("discipline_name") or "").strip()
+        ano_str    = (row.get("ano") or row.get("year_grade") or "").strip()
+
+        if not codigo or not descricao or not disciplina or not ano_str:
+            errors.append(f"Linha {i}: campos obrigatórios incompletos (codigo, descricao, disciplina, ano).")
+            continue
+
+        ano = _parse_year(ano_str)
+        if ano is None:
+            errors.append(f"Linha {i}: ano '{ano_str}' inválido. Não contém um número inteiro identificável.")
+            continue
+
+        bimestre = row.get("bimestre") or row.get("bimester")
+        area = row.get("area")
+        obj_conhecimento = row.get("objeto_conhecimento") or row.get("object_of_knowledge")
+        parsed.append({
+            "bncc_code": codigo,
+            "skill_description": descricao,
+            "discipline_name": disciplina,
+            "year_grade": ano,
+            "grade": f"{ano}º Ano",
+            "bimester": _optional_text(bimestre),
+            "area": _optional_text(area),
+            "object_of_knowledge": _optional_text(obj_conhecimento),
+        })
+    return parsed, errors
+
+
+def _resolve_disciplines(db: Session, names) -> dict:
+    """nome → id, criando as disciplinas que faltam (uma consulta IN + um INSERT em lote)."""
+    d = models.SetupDiscipline
+    ids = dict(db.execute(select(d.discipline_name, d.id).where(d.discipline_name.in_(list(names)))).all())
+    missing = [{"discipline_name": n} for n in names if n not in ids]
+    if missing:
+        ids.update(db.execute(insert(d).returning(d.discipline_name, d.id), missing).all())
+    return ids
+
+
+def import_bncc(db: Session, rows: Iterable[dict], first_line: int = 2) -> dict:
+    """Importa o CSV da BNCC (sem commitar) com um INSERT ... ON CONFLICT (bncc_code) por bloco.
+
+    O upsert é executado como executemany de um comando já compilado; o psycopg2
+    (insertmanyvalues) o envia como um único INSERT de várias linhas por bloco.
+    """
+    parsed, errors = parse_bncc_rows(rows, first_line)
+    if not parsed:
+        return {"inserted": 0, "updated": 0, "errors": errors, "total_processed": 0}
+
+    discipline_ids = _resolve_disciplines(db, {r["discipline_name"] for r in parsed})
+
+    # Código repetido na planilha: vale a última linha (opcionais vazios não apagam valores anteriores)
+    skills, occurrences = {}, Counter()
+    for r in parsed:
+        values = {k: v for k, v in r.items() if k != "discipline_name" and not (k in BNCC_OPTIONAL_COLUMNS and v is None)}
+        values["discipline_id"] = discipline_ids[r["discipline_name"]]
+        skills.setdefault(r["bncc_code"], dict.fromkeys(BNCC_OPTIONAL_COLUMNS)).update(values)
+        occurrences[r["bncc_code"]] += 1
+
+    b = models.BnccLibrary
+    table = b.__table__
+    inserted = updated = 0
+    codes = list(skills)
+    for start in range(0, len(codes), BNCC_CHUNK_SIZE):
+        chunk = codes[start:start + BNCC_CHUNK_SIZE]
+        existing = set(db.scalars(select(b.bncc_code).where(b.bncc_code.in_(chunk))))
+        for code in chunk:
+            first_is_insert = code not in existing
+            inserted += first_is_insert
+            updated += occurrences[code] - first_is_insert
+
+        stmt = pg_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["bncc_code"],
+            set_={
+                **{col: stmt.excluded[col] for col in ("skill_description", "discipline_id", "year_grade", "grade")},
+                **{col: func.coalesce(stmt.excluded[col], table.c[col]) for col in BNCC_OPTIONAL_COLUMNS},
+            },
+        )
+        db.execute(stmt, [skills[code] for code in chunk])
+
+    return {
+        "inserted": inserted,
+        "updated":  updated,
+        "errors":   errors,
+        "total_processed": inserted + updated
+    }
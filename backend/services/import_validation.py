@@ -0,0 +1,159 @@
+"""
+Validação prévia (dry_run) das planilhas CSV do admin, sem gravar nada.
+
+A planilha inteira é lida em um DataFrame e validada coluna a coluna (pandas),
+com as mesmas regras e mensagens de `import_service`. O banco só é consultado
+por comandos IN (sem ORM) para saber o que seria inserido ou atualizado e para
+detectar conflitos com registros existentes.
+"""
+from typing import BinaryIO, List, Tuple
+
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .. import models
+from .import_jobs import read_first_chunk, sniff_csv
+from .import_service import SHIFT_MAP, _parse_birth_date
+
+
+def read_csv_frame(f: BinaryIO) -> pd.DataFrame:
+    """Lê o CSV inteiro como texto (sem conversão de tipos nem NaN)."""
+    encoding, delimiter = sniff_csv(read_first_chunk(f))
+    for enc in dict.fromkeys([encoding, "latin-1"]):
+        f.seek(0)
+        try:
+            return pd.read_csv(f, sep=delimiter, dtype=str, keep_default_na=False, encoding=enc)
+        except UnicodeDecodeError:
+            continue
+    raise ValueError("Codificação do arquivo não reconhecida.")
+
+
+def _column(df: pd.DataFrame, *names: str) -> pd.Series:
+    """Primeira coluna preenchida entre os nomes aceitos (como `row.get(a) or row.get(b)`)."""
+    result = pd.Series("", index=df.index, dtype=object)
+    for name in reversed(names):
+        if name in df.columns:
+            values = df[name].astype(str)
+            result = values.where(values != "", result)
+    return result.str.strip()
+
+
+def _lines(mask: pd.Series) -> pd.Index:
+    return mask.index[mask.to_numpy()] + 2   # linha 2 = primeira linha de dados
+
+
+def _check_required_and_year(fields: dict, ano: pd.Series, campos: str) -> Tuple[pd.Series, list]:
+    """Retorna (máscara das linhas válidas, erros [(linha, msg)])."""
+    incomplete = pd.concat([s == "" for s in fields.values()], axis=1).any(axis=1)
+    digits = ano.str.replace(r"\D", "", regex=True)
+    bad_year = ~incomplete & (digits == "")
+
+    errors = [(line, f"Linha {line}: campos obrigatórios incompletos ({campos}).")
+              for line in _lines(incomplete)]
+    errors += [(line, f"Linha {line}: ano '{ano[line - 2]}' inválido. Não contém um número inteiro identificável.")
+               for line in _lines(bad_year)]
+    return ~incomplete & ~bad_year, errors
+
+
+def _duplicate_warnings(keys: pd.Series, label: str) -> List[Tuple[int, str]]:
+    """Chaves repetidas na planilha: vale a última ocorrência (como na importação)."""
+    repeated = keys[keys.duplicated(keep="last")]
+    last_line = keys.drop_duplicates(keep="last")
+    last_line = pd.Series(last_line.index + 2, index=last_line.to_numpy())
+    return [(i + 2, f"Linha {i + 2}: {label} '{k}' repetido; vale a linha {last_line[k]}.")
+            for i, k in repeated.items()]
+
+
+def _report(total: int, valid: pd.Series, would_insert: int, errors: list, warnings: list) -> dict:
+    valid_rows = int(valid.sum())
+    return {
+        "dry_run": True,
+        "total_rows": total,
+        "valid_rows": valid_rows,
+        "would_insert": would_insert,
+        "would_update": valid_rows - would_insert,
+        "errors": [msg for _, msg in sorted(errors)],
+        "warnings": [msg for _, msg in sorted(warnings)],
+    }
+
+
+# ─────────────────────────────────────────
+# ALUNOS
+# ─────────────────────────────────────────
+
+def validate_students(db: Session, df: pd.DataFrame) -> dict:
+    nome  = _column(df, "nome", "student_name")
+    id_al = _column(df, "id_aluno", "student_id")
+    turma = _column(df, "turma", "class_name")
+    ano   = _column(df, "ano", "year_level")
+    turno = _column(df, "turno").str.lower()
+    nascimento = _column(df, "data_nascimento")
+    matricula  = _column(df, "nr_matricula")
+
+    valid, errors = _check_required_and_year(
+        {"nome": nome, "id_aluno": id_al, "turma": turma, "ano": ano, "turno": turno},
+        ano, "nome, id_aluno, turma, ano, turno",
+    )
+
+    warnings = [(line, f"Linha {line}: turno '{turno[line - 2]}' não reconhecido; será usado 'manhã'.")
+                for line in _lines(valid & ~turno.isin(list(SHIFT_MAP)))]
+    # Mesmo parser da importação: o que passa aqui é gravado, o que falha é ignorado lá
+    bad_date = valid & (nascimento != "") & nascimento.map(_parse_birth_date).isna()
+    warnings += [(line, f"Linha {line}: data_nascimento '{nascimento[line - 2]}' inválida (use AAAA-MM-DD); será ignorada.")
+                 for line in _lines(bad_date)]
+    warnings += _duplicate_warnings(id_al[valid], "id_aluno")
+
+    # nr_matricula é UNIQUE: repetida entre alunos diferentes (na planilha ou no banco) faria a importação falhar
+    enrollments = pd.DataFrame({"id": id_al, "nr": matricula})[valid & (matricula != "")].drop_duplicates()
+    owners = enrollments.groupby("nr")["id"].nunique()
+    errors += [(i + 2, f"Linha {i + 2}: nr_matricula '{nr}' usada por mais de um aluno na planilha.")
+               for i, nr in enrollments["nr"][enrollments["nr"].isin(owners.index[owners > 1])].items()]
+
+    s = models.Student
+    existing_ids = set(db.scalars(select(s.student_id).where(s.student_id.in_(id_al[valid].unique().tolist()))))
+    if not enrollments.empty:
+        taken = dict(db.execute(
+            select(s.enrollment_number, s.student_id).where(s.enrollment_number.in_(enrollments["nr"].unique().tolist()))
+        ).all())
+        conflict = enrollments["nr"].map(taken).notna() & (enrollments["nr"].map(taken) != enrollments["id"])
+        errors += [(i + 2, f"Linha {i + 2}: nr_matricula '{nr}' já pertence ao aluno {taken[nr]}.")
+                   for i, nr in enrollments["nr"][conflict].items()]
+
+    new_ids = set(id_al[valid].unique()) - existing_ids
+    return _report(len(df), valid, len(new_ids), errors, warnings)
+
+
+# ─────────────────────────────────────────
+# HABILIDADES (BNCC)
+# ─────────────────────────────────────────
+
+def validate_bncc(db: Session, df: pd.DataFrame) -> dict:
+    codigo     = _column(df, "codigo", "bncc_code")
+    descricao  = _column(df, "descricao", "skill_description")
+    disciplina = _column(df, "disciplina", "discipline_name")
+    ano        = _column(df, "ano", "year_grade")
+
+    valid, errors = _check_required_and_year(
+        {"codigo": codigo, "descricao": descricao, "disciplina": disciplina, "ano": ano},
+        ano, "codigo, descricao, disciplina, ano",
+    )
+    warnings = _duplicate_warnings(codigo[valid], "codigo")
+
+    b, d = models.BnccLibrary, models.SetupDiscipline
+    codes = codigo[valid].unique().tolist()
+    existing_codes = set(db.scalars(select(b.bncc_code).where(b.bncc_code.in_(codes))))
+
+    names = disciplina[valid].unique().tolist()
+    known = set(db.scalars(select(d.discipline_name).where(d.discipline_name.in_(names))))
+    new_disciplines = sorted(set(names) - known)
+    if new_disciplines:
+        warnings.append((0, f"Disciplinas novas serão criadas: {', '.join(new_disciplines)}."))
+
+    return _report(len(df), valid, len(set(codes) - existing_codes), errors, warnings)
+
+
+VALIDATORS = {
+    "students": validate_students,
+    "bncc": validate_bncc,
+}
@@ -0,0 +1,65 @@
+"""
+Hash de senhas: um único CryptContext para o processo e um pool limitado para o bcrypt.
+
+Senhas novas usam só bcrypt (custo em BCRYPT_ROUNDS). Os formatos legados
+(sha256 sem sal e texto plano) continuam aceitos no login e são regravados em
+bcrypt na primeira entrada bem-sucedida; o mesmo vale para hashes bcrypt com
+custo menor que o configurado.
+
+O bcrypt é CPU puro e caro de propósito: roda em HASH_WORKERS threads próprias,
+com no máximo HASH_MAX_PENDING pedidos na fila. Um pico de logins não ocupa o
+threadpool do FastAPI que atende as demais rotas; acima do limite o login
+responde 503 (HashingBusy) em vez de enfileirar sem fim.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", str(HASH_WORKERS * 16)))
+
+# A ordem importa: `plaintext` reconhece qualquer string e precisa ser o último
+pwd_context = CryptContext(
+    schemes=["bcrypt", "hex_sha256", "plaintext"],
+    deprecated=["hex_sha256", "plaintext"],
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+)
+
+_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="pwhash")
+_pending = threading.BoundedSemaphore(HASH_MAX_PENDING)
+
+
+class HashingBusy(Exception):
+    """Fila de hashing cheia."""
+
+
+def _submit(fn, *args):
+    if not _pending.acquire(blocking=False):
+        raise HashingBusy()
+    try:
+        future = _pool.submit(fn, *args)
+    except BaseException:
+        _pending.release()
+        raise
+    future.add_done_callback(lambda _: _pending.release())
+    return future
+
+
+def hash_password(password: str) -> str:
+    """Hash para gravar em users.password (chamado de rotas síncronas do admin)."""
+    return _submit(pwd_context.hash, password).result()
+
+
+async def verify_and_update(password: str, stored: Optional[str]) -> Tuple[bool, Optional[str]]:
+    """(senha confere, novo hash se o armazenado estiver em formato/custo antigo)."""
+    if not stored:
+        # Usuário inexistente: gasta o mesmo tempo de uma verificação real
+        await asyncio.wrap_future(_submit(pwd_context.dummy_verify))
+        return False, None
+    return await asyncio.wrap_future(_submit(pwd_context.verify_and_update, password, stored))
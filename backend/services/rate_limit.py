@@ -0,0 +1,125 @@
+"""
+Limite de tentativas de login por token bucket (um balde por usuário e um por IP).
+
+Cada tentativa consome uma ficha dos dois baldes; as fichas voltam continuamente
+(`capacity` a cada `per_seconds`). Sem ficha, o login responde 429 antes de
+consultar o banco ou usar o pool de hashing.
+
+O estado fica, por padrão, na memória do processo (uma instância no Cloud Run).
+Com RATE_LIMIT_REDIS_URL definido, os baldes ficam no Redis e valem para todas
+as instâncias (pacote `redis` opcional, só importado nesse caso).
+"""
+import math
+import os
+import threading
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+
+
+class Limit(NamedTuple):
+    capacity: int        # rajada máxima
+    per_seconds: float   # tempo para o balde encher de novo
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.per_seconds
+
+
+def _limit_from_env(name: str, default: str) -> Limit:
+    """Formato "<tentativas>/<segundos>", ex.: LOGIN_LIMIT_USER=5/60."""
+    capacity, per_seconds = os.getenv(name, default).split("/")
+    return Limit(int(capacity), float(per_seconds))
+
+
+# Escola inteira pode sair pelo mesmo IP (NAT): o limite por IP é bem mais largo
+LOGIN_LIMIT_USER = _limit_from_env("LOGIN_LIMIT_USER", "5/60")
+LOGIN_LIMIT_IP   = _limit_from_env("LOGIN_LIMIT_IP", "60/60")
+
+
+# ─────────────────────────────────────────
+# BACKENDS
+# ─────────────────────────────────────────
+
+class MemoryBuckets:
+    """Baldes no processo. Baldes cheios há tempo suficiente são descartados (memória limitada)."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self._buckets: Dict[str, Tuple[float, float]] = {}   # chave -> (fichas, instante)
+        self._lock = threading.Lock()
+        self._max_keys = max_keys
+
+    def take(self, key: str, limit: Limit, now: Optional[float] = None) -> float:
+        """Consome uma ficha; retorna 0 se permitido ou os segundos até haver ficha."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, last = self._buckets.get(key, (limit.capacity, now))
+            tokens = min(limit.capacity, tokens + (now - last) * limit.rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                return (1 - tokens) / limit.rate
+            if len(self._buckets) >= self._max_keys and key not in self._buckets:
+                self._prune(now, limit)
+            self._buckets[key] = (tokens - 1, now)
+            return 0.0
+
+    def _prune(self, now: float, limit: Limit) -> None:
+        idle = [k for k, (_, last) in self._buckets.items() if now - last >= limit.per_seconds]
+        for k in idle or list(self._buckets)[: self._max_keys // 10]:
+            del self._buckets[k]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+class RedisBuckets:
+    """Baldes compartilhados no Redis (operação atômica via script Lua)."""
+
+    _SCRIPT = """
+    local capacity, rate, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    local wait = 0
+    if tokens < 1 then wait = (1 - tokens) / rate else tokens = tokens - 1 end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return tostring(wait)
+    """
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_REDIS_URL definido, mas o pacote redis não está instalado. Rode: pip install redis")
+        self._client = redis.Redis.from_url(url)
+        self._take = self._client.register_script(self._SCRIPT)
+
+    def take(self, key: str, limit: Limit, now: Optional[float] = None) -> float:
+        now = time.time() if now is None else now   # relógio comum entre instâncias
+        return float(self._take(keys=[f"sga:ratelimit:{key}"], args=[limit.capacity, limit.rate, now]))
+
+    def clear(self) -> None:
+        for key in self._client.scan_iter("sga:ratelimit:*"):
+            self._client.delete(key)
+
+
+def _default_backend():
+    url = os.getenv("RATE_LIMIT_REDIS_URL")
+    return RedisBuckets(url) if url else MemoryBuckets()
+
+
+backend = _default_backend()
+
+
+# ─────────────────────────────────────────
+# LOGIN
+# ─────────────────────────────────────────
+
+def check_login(username: str, client_ip: str) -> int:
+    """Consome as fichas do IP e do usuário; retorna 0 se permitido ou o Retry-After em segundos."""
+    wait = backend.take(f"login:ip:{client_ip}", LOGIN_LIMIT_IP)
+    if not wait:
+        wait = backend.take(f"login:user:{username.strip().lower()}", LOGIN_LIMIT_USER)
+    return math.ceil(wait)
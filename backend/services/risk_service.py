@@ -0,0 +1,72 @@
+"""
+Manutenção da tabela `student_risk` (alunos em risco por disciplina e bimestre).
+
+Regra: nível médio < 2.0 = em risco; `low_level_count` conta as notas N1 + N2.
+Cada escrita em `assessments` chama `refresh_students` com os alunos afetados,
+antes do commit; o restante da tabela não é tocado.
+"""
+from typing import Iterable, Optional
+
+from sqlalchemy import Float, case, delete, exists, func, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from .. import models
+
+RISK_AVERAGE_THRESHOLD = 2.0
+
+_COLUMNS = ["student_id", "discipline_id", "bimester", "total_assessments",
+            "low_level_count", "average_level", "is_at_risk"]
+
+
+def _aggregate(student_ids: Optional[list] = None):
+    a = models.Assessment
+    average = func.avg(a.level_assigned.cast(Float))
+    q = select(
+        a.student_id,
+        a.discipline_id,
+        a.bimester,
+        func.count(a.level_assigned),
+        func.count(case((a.level_assigned <= 2, 1))),
+        average,
+        average < RISK_AVERAGE_THRESHOLD,
+    ).where(a.level_assigned.isnot(None), a.student_id.isnot(None))
+    if student_ids is not None:
+        q = q.where(a.student_id.in_(student_ids))
+    return q.group_by(a.student_id, a.discipline_id, a.bimester)
+
+
+def refresh_students(db: Session, student_ids: Iterable[str]) -> None:
+    """Recalcula o risco só dos alunos informados. As avaliações precisam estar no flush.
+
+    Upsert (INSERT ... SELECT ... ON CONFLICT DO UPDATE) em vez de apagar e
+    reinserir: dois lotes concorrentes do mesmo aluno não colidem na chave
+    única. Depois saem só as chaves desses alunos que não têm mais avaliações.
+    """
+    ids = sorted(set(student_ids))
+    if not ids:
+        return
+    table = models.StudentRisk.__table__
+    stmt = pg_insert(table).from_select(_COLUMNS, _aggregate(ids))
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["student_id", "discipline_id", "bimester"],
+        set_={col: stmt.excluded[col] for col in _COLUMNS[3:]},
+    ))
+
+    a = models.Assessment
+    db.execute(delete(table).where(
+        table.c.student_id.in_(ids),
+        ~exists().where(
+            a.student_id == table.c.student_id,
+            a.discipline_id.is_not_distinct_from(table.c.discipline_id),
+            a.bimester.is_not_distinct_from(table.c.bimester),
+            a.level_assigned.isnot(None),
+        ),
+    ))
+
+
+def rebuild(db: Session) -> None:
+    """Recalcula a tabela inteira (backfill / correção)."""
+    table = models.StudentRisk.__table__
+    db.execute(delete(table))
+    db.execute(insert(table).from_select(_COLUMNS, _aggregate()))
@@ -0,0 +1,83 @@
+"""
+Manutenção incremental da tabela `assessment_rollup`.
+
+Toda escrita em `assessments` deve registrar aqui a variação de contagem
+(+1 para o novo estado, -1 para o estado anterior) e chamar `apply_deltas`
+dentro da mesma transação, para que o dashboard leia contagens prontas.
+"""
+from collections import Counter
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import Integer, func, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from .. import models
+
+# (school_year, class_name, discipline_id, bimester, bncc_code, level)
+RollupKey = Tuple[Optional[int], Optional[str], Optional[int], Optional[int], str, int]
+
+KEY_COLUMNS = ("school_year", "class_name", "discipline_id", "bimester", "bncc_code", "level")
+
+
+def rollup_key(
+    date: Optional[datetime],
+    class_name: Optional[str],
+    discipline_id: Optional[int],
+    bimester: Optional[int],
+    bncc_code: str,
+    level: Optional[int],
+) -> Optional[RollupKey]:
+    """Chave do rollup para uma avaliação. Avaliações sem nível não entram na contagem."""
+    if level is None:
+        return None
+    school_year = date.year if date else None
+    return (school_year, class_name, discipline_id, bimester, bncc_code, int(level))
+
+
+def key_for(a: models.Assessment) -> Optional[RollupKey]:
+    return rollup_key(a.date, a.class_name, a.discipline_id, a.bimester, a.bncc_code, a.level_assigned)
+
+
+def track(deltas: Counter, old: Optional[RollupKey], new: Optional[RollupKey]) -> None:
+    """Registra a troca de estado de uma avaliação (old → new) no acumulador."""
+    if old == new:
+        return
+    if old is not None:
+        deltas[old] -= 1
+    if new is not None:
+        deltas[new] += 1
+
+
+def apply_deltas(db: Session, deltas: Counter) -> None:
+    """Aplica as variações acumuladas com um único INSERT ... ON CONFLICT DO UPDATE."""
+    rows = [dict(zip(KEY_COLUMNS, key), count=n) for key, n in deltas.items() if n != 0]
+    if not rows:
+        return
+
+    table = models.AssessmentRollup.__table__
+    stmt = pg_insert(table).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_assessment_rollup_key",
+        set_={"count": table.c.count + stmt.excluded.count},
+    )
+    db.execute(stmt)
+
+    if any(r["count"] < 0 for r in rows):
+        db.execute(table.delete().where(table.c.count <= 0))
+
+
+def rebuild(db: Session) -> None:
+    """Recalcula o rollup inteiro a partir de `assessments` (backfill / correção)."""
+    a = models.Assessment
+    table = models.AssessmentRollup.__table__
+    school_year = func.extract("year", a.date).cast(Integer)
+    source = (
+        select(school_year, a.class_name, a.discipline_id, a.bimester, a.bncc_code,
+               a.level_assigned, func.count(a.id))
+        .where(a.level_assigned.isnot(None))
+        .group_by(school_year, a.class_name, a.discipline_id, a.bimester, a.bncc_code, a.level_assigned)
+    )
+    db.execute(table.delete())
+    db.execute(insert(table).from_select(list(KEY_COLUMNS) + ["count"], source))
@@ -0,0 +1,38 @@
+"""
+Revogações de sessão conhecidas por este processo.
+
+O access token é validado só pela assinatura e pelos claims (sem banco) e vale
+ACCESS_TOKEN_MINUTES. Quando este processo desativa um usuário ou troca sua
+senha/papel, guarda a nova `auth_version`: tokens com versão anterior passam a
+ser recusados aqui na hora. Nas demais instâncias a revogação vale no próximo
+/api/auth/refresh (que confere o banco), isto é, em até ACCESS_TOKEN_MINUTES.
+
+Cada entrada só precisa durar o tempo de vida de um access token: depois disso
+todo token com a versão antiga já expirou.
+"""
+import threading
+import time
+from typing import Dict, Tuple
+
+_floors: Dict[object, Tuple[float, int]] = {}
+_lock = threading.Lock()
+
+
+def revoke(user_id, version: int, ttl_seconds: float) -> None:
+    """Recusa tokens do usuário com auth_version menor que `version`."""
+    now = time.monotonic()
+    with _lock:
+        for key in [k for k, (deadline, _) in _floors.items() if deadline <= now]:
+            del _floors[key]
+        _floors[user_id] = (now + ttl_seconds, version)
+
+
+def is_revoked(user_id, version: int) -> bool:
+    with _lock:
+        entry = _floors.get(user_id)
+    return bool(entry) and entry[0] > time.monotonic() and version < entry[1]
+
+
+def clear() -> None:
+    with _lock:
+        _floors.clear()
@@ -0,0 +1,59 @@
+"""
+Escopo do professor (turmas, disciplinas e anos que ele leciona), em cache por processo.
+
+Montado com uma única consulta em `teacher_class_discipline` e reaproveitado
+pelas listagens do admin. O cache é invalidado quando um vínculo é criado ou
+removido neste processo; o TTL cobre alterações feitas por outras instâncias.
+"""
+import threading
+import time
+from typing import Dict, FrozenSet, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .. import models
+
+SCOPE_TTL_SECONDS = 300
+
+
+class TeacherScope(NamedTuple):
+    class_ids: FrozenSet[int]
+    discipline_ids: FrozenSet[int]
+    year_levels: FrozenSet[int]
+
+
+_cache: Dict[object, Tuple[float, TeacherScope]] = {}
+_lock = threading.Lock()
+
+
+def get_scope(db: Session, teacher_id) -> TeacherScope:
+    now = time.monotonic()
+    with _lock:
+        cached = _cache.get(teacher_id)
+    if cached and now - cached[0] < SCOPE_TTL_SECONDS:
+        return cached[1]
+
+    tcd, c = models.TeacherClassDiscipline, models.SetupClass
+    rows = db.execute(
+        select(tcd.class_id, tcd.discipline_id, c.year_level)
+        .join(c, c.id == tcd.class_id)
+        .where(tcd.teacher_id == teacher_id)
+    ).all()
+    scope = TeacherScope(
+        class_ids=frozenset(r.class_id for r in rows),
+        discipline_ids=frozenset(r.discipline_id for r in rows),
+        year_levels=frozenset(r.year_level for r in rows if r.year_level is not None),
+    )
+    with _lock:
+        _cache[teacher_id] = (now, scope)
+    return scope
+
+
+def invalidate(teacher_id: Optional[object] = None) -> None:
+    """Descarta o escopo de um professor (ou de todos, sem argumento)."""
+    with _lock:
+        if teacher_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(teacher_id, None)
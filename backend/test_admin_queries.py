@@ -0,0 +1,61 @@
+"""
+Listagens do admin para professores: escopo em cache e invalidado ao mudar os vínculos.
+"""
+import uuid
+
+import pytest
+
+from backend import models
+from backend.routers import admin
+from backend.services import teacher_scope
+
+
+@pytest.fixture(autouse=True)
+def _clear_scope_cache():
+    teacher_scope.invalidate()
+    yield
+    teacher_scope.invalidate()
+
+
+def _seed(db):
+    teacher = models.User(id=uuid.uuid4(), username="prof", password="x", role="teacher")
+    db.add(teacher)
+    for i, (name, year) in enumerate([("6º Ano A", 6), ("6º Ano B", 6), ("7º Ano A", 7)], start=1):
+        db.add(models.SetupClass(id=i, class_name=name, year_level=year))
+    for i, name in enumerate(["Matemática", "Ciências", "Arte"], start=1):
+        db.add(models.SetupDiscipline(id=i, discipline_name=name))
+    # Mesma disciplina em duas turmas e mesma turma em duas disciplinas
+    for class_id, discipline_id in [(1, 1), (2, 1), (1, 2)]:
+        db.add(models.TeacherClassDiscipline(teacher_id=teacher.id, class_id=class_id,
+                                             discipline_id=discipline_id, school_year=2026))
+    db.commit()
+    return teacher
+
+
+def test_teacher_listings_use_cached_scope(db, query_counter):
+    teacher = _seed(db)
+
+    classes = admin.list_classes(all=False, db=db, current_user=teacher)
+    disciplines = admin.list_disciplines(all=False, db=db, current_user=teacher)
+    years = admin.list_classes_years(all=False, db=db, current_user=teacher)
+
+    assert [c["class_name"] for c in classes] == ["6º Ano A", "6º Ano B"]
+    assert [d["name"] for d in disciplines] == ["Ciências", "Matemática"]
+    assert years == [6]
+
+    query_counter.clear()
+    admin.list_classes(all=False, db=db, current_user=teacher)
+    admin.list_classes_years(all=False, db=db, current_user=teacher)
+    assert not any("teacher_class_discipline" in sql for sql in query_counter)
+    assert len(query_counter) == 1
+
+
+def test_creating_a_link_invalidates_the_scope(db):
+    teacher = _seed(db)
+    assert admin.list_classes_years(all=False, db=db, current_user=teacher) == [6]
+
+    admin.create_teacher_class(admin.TeacherClassCreate(
+        teacher_id=str(teacher.id), class_id=3, discipline_id=3, school_year=2026
+    ), db=db)
+
+    assert admin.list_classes_years(all=False, db=db, current_user=teacher) == [6, 7]
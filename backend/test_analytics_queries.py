@@ -0,0 +1,259 @@
+"""
+Teto de consultas dos endpoints de analytics (regressão de N+1).
+"""
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from sqlalchemy import func
+
+from backend import models, schemas
+from backend.routers import analytics
+from backend.services import assessment_service
+
+
+def _seed_student_history(db, skills=6, objectives_per_skill=3):
+    disc = models.SetupDiscipline(discipline_name="Matemática")
+    db.add(disc)
+    db.add(models.SetupClass(class_name="6º Ano A", year_level=6))
+    db.add(models.Student(student_id="A1", student_name="Aluno 1", class_name="6º Ano A"))
+    db.flush()
+
+    for s in range(skills):
+        code = f"EF06MA{s:02d}"
+        db.add(models.BnccLibrary(bncc_code=code, skill_description=f"Habilidade {s}", discipline_id=disc.id))
+        db.add(models.TeacherRubric(rubric_id=f"v2_migrated_{code}", bncc_code=code, objective="dummy"))
+        for o in range(objectives_per_skill):
+            obj = models.LearningObjective(
+                id=uuid.uuid4(), bncc_code=code, discipline_id=disc.id,
+                year_level=6, bimester=1 + s % 4, description=f"Objetivo {s}.{o}"
+            )
+            db.add(obj)
+            db.add(models.Assessment(
+                student_id="A1", rubric_id=f"v2_migrated_{code}", bncc_code=code,
+                level_assigned=1 + (s + o) % 4, bimester=obj.bimester, class_name="6º Ano A",
+                discipline_id=disc.id, objective_id=obj.id, date=datetime(2026, 3, 1 + o)
+            ))
+    db.commit()
+    db.expire_all()
+    return disc
+
+
+def test_student_evolution_query_ceiling(db, query_counter):
+    _seed_student_history(db)
+    query_counter.clear()
+
+    result = analytics.get_student_evolution("A1", discipline_id=None, db=db)
+
+    assert len(query_counter) <= 2
+    assert result["total_assessments"] == 18
+    assert len(result["skill_evolution"]) == 6
+    first = result["skill_evolution"][0]
+    assert first["skill_description"].startswith("Habilidade")
+    assert all(o["description"].startswith("Objetivo") for o in first["objectives"])
+
+
+def test_student_evolution_query_count_is_independent_of_history(db, query_counter):
+    _seed_student_history(db, skills=20, objectives_per_skill=5)
+    query_counter.clear()
+
+    analytics.get_student_evolution("A1", discipline_id=None, db=db)
+
+    assert len(query_counter) <= 2
+
+
+def test_class_radar_aggregates_in_one_query(db, query_counter):
+    _seed_student_history(db, skills=4, objectives_per_skill=3)
+    query_counter.clear()
+
+    result = analytics.get_class_radar("6º Ano A", discipline_id=None, bimester=None, db=db)
+
+    assert len(query_counter) == 1
+    by_code = {d["bncc_code"]: d for d in result["data"]}
+    assert by_code["EF06MA00"] == {"bncc_code": "EF06MA00", "average": 2.0, "count": 3}
+    assert by_code["EF06MA03"] == {"bncc_code": "EF06MA03", "average": 2.33, "count": 3}
+
+
+def test_summary_counts_in_one_statement(db, query_counter):
+    _seed_student_history(db, skills=2, objectives_per_skill=2)   # 4 objetivos em rascunho, 4 notas
+    db.add(models.Student(student_id="T1", student_name="Transferido", class_name="6º Ano A", status="transferred"))
+    objectives = db.query(models.LearningObjective).order_by(models.LearningObjective.description).all()
+    objectives[0].status = objectives[1].status = "approved"
+    objectives[2].status = "pending"
+    # Objetivo aprovado com dois níveis pendentes conta uma vez só
+    for level, status in ((1, "pending"), (2, "pending"), (3, "approved")):
+        db.add(models.RubricLevel(objective_id=objectives[0].id, level=level, description=f"N{level}", status=status))
+    db.add(models.RubricLevel(objective_id=objectives[1].id, level=1, description="N1", status="approved"))
+    db.commit()
+    query_counter.clear()
+
+    summary = analytics._summary_counts(db)
+
+    assert len(query_counter) == 1
+    assert summary == {"total_students": 1, "total_assessments": 4,
+                       "approved_objectives": 2, "pending_approvals": 2}
+
+
+def _seed_batches(db):
+    """Notas de duas turmas em 2025 e 2026, lançadas por save_batch (que mantém o rollup)."""
+    classes = {"S1": "6º Ano A", "S2": "6º Ano A", "S3": "6º Ano B", "S4": "6º Ano B"}
+    for year in (2025, 2026):
+        for s, code in enumerate(("EF06MA01", "EF06MA02")):
+            objective_id = uuid.uuid4()
+            assessment_service.save_batch(db, [schemas.AssessmentBatchItem(
+                student_id=sid, bncc_code=code, level_assigned=1 + (i + s + year) % 4, bimester=1,
+                class_name=cn, discipline_id=1, date=datetime(year, 3, 10), objective_id=objective_id
+            ) for i, (sid, cn) in enumerate(classes.items())])
+    db.commit()
+
+
+def _group_by_assessments(db, school_year=None):
+    """Resumo por turma e por habilidade como o dashboard calculava antes (GROUP BY em assessments)."""
+    a = models.Assessment
+    q = db.query(a.class_name, a.level_assigned, a.bncc_code, func.count(a.id))
+    if school_year:
+        q = q.filter(func.extract("year", a.date) == school_year)
+    by_class, by_skill = defaultdict(Counter), defaultdict(Counter)
+    for class_name, level, code, count in q.group_by(a.class_name, a.level_assigned, a.bncc_code):
+        by_class[class_name][level] += count
+        by_skill[code][level] += count
+    skills = {code: (sum(c.values()), round(sum(lv * n for lv, n in c.items()) / sum(c.values()), 2))
+              for code, c in by_skill.items()}
+    return {cn: dict(c) for cn, c in by_class.items()}, skills
+
+
+def _dashboard_summaries(result):
+    classes = {c["class_name"]: {int(lv): n for lv, n in c["level_distribution"].items() if n}
+               for c in result["class_averages"]}
+    skills = {s["bncc_code"]: (s["total"], s["average_level"]) for s in result["skill_alerts"]}
+    return classes, skills
+
+
+def test_dashboard_matches_group_by_over_assessments(db, query_counter):
+    _seed_batches(db)
+
+    for school_year in (None, 2025):
+        query_counter.clear()
+        result = analytics.get_dashboard(discipline_id=None, year_level=None, bimester=None,
+                                         school_year=school_year, db=db)
+
+        assert len(query_counter) == 2   # rollup + contadores gerais
+        assert _dashboard_summaries(result) == _group_by_assessments(db, school_year)
+
+    assert result["class_averages"][0]["total_assessments"] == 4   # só 2025: 2 alunos x 2 habilidades
+    assert result["summary"]["total_assessments"] == 16
+
+
+def test_heatmap_matches_calcular_notas(db):
+    import pandas as pd
+    from backend.services import analytics_service
+
+    _seed_student_history(db, skills=3, objectives_per_skill=2)
+    # Reavaliação mais recente de um objetivo (bimestre seguinte): deve substituir a nota anterior
+    old = db.query(models.Assessment).filter_by(bncc_code="EF06MA01").first()
+    db.add(models.Assessment(
+        student_id="A1", rubric_id=old.rubric_id, bncc_code=old.bncc_code, level_assigned=4,
+        bimester=old.bimester + 1, class_name=old.class_name, discipline_id=old.discipline_id,
+        objective_id=old.objective_id, date=datetime(2026, 5, 1)
+    ))
+    db.commit()
+
+    rows = db.query(models.Assessment).all()
+    df = pd.DataFrame([{
+        "student_id": r.student_id, "rubric_id": str(r.objective_id), "bncc_code": r.bncc_code,
+        "level_assigned": r.level_assigned, "date": r.date, "class_name": "6º Ano A", "student_name": "Aluno 1"
+    } for r in rows])
+    expected = analytics_service.calcular_notas(df).set_index("bncc_code")["level_numeric"].to_dict()
+
+    result = analytics.get_heatmap(class_name="6º Ano A", discipline_id=None, bimester=None, db=db)
+
+    assert {d["bncc_code"]: d["level_numeric"] for d in result["data"]} == expected
+
+
+def test_at_risk_ranking_refreshes_only_touched_students(db):
+    from backend.services import risk_service
+
+    _seed_student_history(db, skills=2, objectives_per_skill=2)
+    db.add(models.Student(student_id="A2", student_name="Aluno 2", class_name="6º Ano A"))
+    for level in (1, 2):
+        db.add(models.Assessment(
+            student_id="A2", rubric_id="v2_migrated_EF06MA00", bncc_code="EF06MA00",
+            level_assigned=level, bimester=1, discipline_id=1, date=datetime(2026, 3, 10)
+        ))
+    db.flush()
+    risk_service.refresh_students(db, ["A2"])
+    db.commit()
+
+    result = analytics.get_at_risk_students(limit=10, discipline_id=None, bimester=None, class_name=None, db=db)
+
+    assert [(r["student_id"], r["average_level"], r["low_level_count"]) for r in result] == [("A2", 1.5, 2)]
+    # A1 não foi tocado pelo lote: continua fora da tabela
+    assert db.query(models.StudentRisk).filter_by(student_id="A1").count() == 0
+
+
+def test_risk_refresh_updates_in_place_and_drops_stale_keys(db):
+    from backend.services import risk_service
+
+    db.add(models.Student(student_id="A2", student_name="Aluno 2", class_name="6º Ano A"))
+    for level in (1, 2):
+        db.add(models.Assessment(
+            student_id="A2", rubric_id="R1", bncc_code="EF06MA00", level_assigned=level,
+            bimester=1, discipline_id=1, date=datetime(2026, 3, 10)
+        ))
+    # Chave sem avaliações (nota apagada) e linha de outro aluno, fora do refresh
+    db.add(models.StudentRisk(student_id="A2", discipline_id=1, bimester=3, total_assessments=1,
+                              low_level_count=1, average_level=1.0, is_at_risk=True))
+    db.add(models.StudentRisk(student_id="OUTRO", discipline_id=1, bimester=1, total_assessments=1,
+                              low_level_count=1, average_level=1.0, is_at_risk=True))
+    db.flush()
+    risk_service.refresh_students(db, ["A2"])
+    db.commit()
+    first_id = db.query(models.StudentRisk).filter_by(student_id="A2", bimester=1).one().id
+
+    db.add(models.Assessment(student_id="A2", rubric_id="R1", bncc_code="EF06MA01", level_assigned=4,
+                             bimester=1, discipline_id=1, date=datetime(2026, 3, 11)))
+    db.flush()
+    risk_service.refresh_students(db, ["A2"])
+    db.commit()
+    db.expire_all()
+
+    rows = {(r.student_id, r.bimester): (r.total_assessments, round(r.average_level, 2), r.is_at_risk)
+            for r in db.query(models.StudentRisk)}
+    assert rows == {("A2", 1): (3, 2.33, False), ("OUTRO", 1): (1, 1.0, True)}
+    assert db.query(models.StudentRisk).filter_by(student_id="A2", bimester=1).one().id == first_id
+
+
+def test_rebuild_recomputes_rollup_from_assessments(db):
+    from collections import Counter
+    from backend.rebuild_aggregates import rebuild_all
+
+    disc = _seed_student_history(db, skills=3, objectives_per_skill=4)
+    # Linha velha que não corresponde a nenhuma avaliação: some no rebuild
+    db.add(models.AssessmentRollup(school_year=2020, class_name="X", discipline_id=disc.id, bimester=1,
+                                   bncc_code="EF06MA00", level=4, count=7))
+    db.commit()
+
+    rebuild_all(db)
+    db.commit()
+
+    expected = Counter((2026, "6º Ano A", disc.id, a.bimester, a.bncc_code, a.level_assigned)
+                       for a in db.query(models.Assessment))
+    rows = {(r.school_year, r.class_name, r.discipline_id, r.bimester, r.bncc_code, r.level): r.count
+            for r in db.query(models.AssessmentRollup)}
+    assert rows == dict(expected)
+
+
+def test_rebuild_recomputes_student_risk(db):
+    from backend.rebuild_aggregates import rebuild_all
+
+    _seed_student_history(db, skills=2, objectives_per_skill=2)   # A1: níveis 1, 2 (bim. 1) e 2, 3 (bim. 2)
+    db.add(models.StudentRisk(student_id="FANTASMA", discipline_id=1, bimester=1, total_assessments=1,
+                              low_level_count=1, average_level=1.0, is_at_risk=True))
+    db.commit()
+
+    rebuild_all(db)
+    db.commit()
+
+    rows = {(r.student_id, r.bimester): (r.total_assessments, r.low_level_count, r.average_level, r.is_at_risk)
+            for r in db.query(models.StudentRisk)}
+    assert rows == {("A1", 1): (2, 2, 1.5, True), ("A1", 2): (2, 1, 2.5, False)}
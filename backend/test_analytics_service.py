@@ -0,0 +1,48 @@
+"""
+Equivalência entre o motor NumPy de `calcular_notas` e a implementação pandas de referência.
+"""
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+
+from backend.services import analytics_service
+
+
+def _random_assessments(n, seed=0):
+    rng = np.random.default_rng(seed)
+    students = rng.integers(0, max(n // 20, 2), n)
+    df = pd.DataFrame({
+        "student_id": [f"S{s:05d}" for s in students],
+        "rubric_id": [f"R{r:03d}" for r in rng.integers(0, 40, n)],
+        "level_assigned": rng.integers(1, 5, n).astype(float),
+        # datas únicas: a regra "mais recente" nunca empata
+        "date": pd.Timestamp("2026-02-01") + pd.to_timedelta(rng.permutation(n), unit="s"),
+        "class_name": [f"{6 + s % 4}º Ano" for s in students],
+        "student_name": [f"Aluno {s}" for s in students],
+    })
+    df["bncc_code"] = "EF06MA" + (df["rubric_id"].str[1:].astype(int) // 4).astype(str)
+    return df
+
+
+def test_numpy_engine_matches_pandas():
+    df = _random_assessments(5_000)
+    expected = analytics_service.calcular_notas_pandas(df.copy())
+    result = analytics_service.calcular_notas(df.copy())
+    pdt.assert_frame_equal(result, expected)
+
+
+def test_numpy_engine_handles_missing_values():
+    df = pd.DataFrame({
+        "student_id": ["1", "1", "1", "2", "2", None],
+        "rubric_id": ["R1", "R1", "R2", "R1", "R1", "R1"],
+        "bncc_code": ["X", "X", "X", "X", "Y", "X"],
+        "level_assigned": [1, 4, "?", 2, 3, 4],
+        "date": ["2026-03-01", "2026-03-05", "2026-03-02", None, "2026-03-01", "2026-03-01"],
+    })
+    expected = analytics_service.calcular_notas_pandas(df.copy())
+    result = analytics_service.calcular_notas(df.copy())
+    pdt.assert_frame_equal(result, expected)
+
+
+def test_empty_input():
+    assert analytics_service.calcular_notas(pd.DataFrame()).empty
@@ -0,0 +1,222 @@
+"""
+Gravação de notas em lote: upsert com número fixo de comandos, rollup/risco/eventos,
+isolamento de linhas com erro por SAVEPOINT e idempotência.
+Os testes de isolamento trocam `save_batch` por uma versão que grava alunos, para
+provocar uma falha real (chave duplicada) no meio de um bloco.
+"""
+import threading
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend import models, schemas
+from backend.database import Base
+from backend.services import assessment_service
+
+
+def _grades(student_ids, objective_id, level, bncc_code="EF06MA01"):
+    return [schemas.AssessmentBatchItem(
+        student_id=sid, bncc_code=bncc_code, level_assigned=level, bimester=1, class_name="6º Ano A",
+        discipline_id=1, date=datetime(2026, 3, 10), objective_id=objective_id
+    ) for sid in student_ids]
+
+
+def _rollup(db, bncc_code="EF06MA01"):
+    return {r.level: r.count for r in db.query(models.AssessmentRollup).filter_by(bncc_code=bncc_code)}
+
+
+def _save(db, query_counter, items):
+    query_counter.clear()
+    assessment_service.save_batch(db, items)
+    count = len(query_counter)
+    db.commit()
+    return count
+
+
+def test_save_batch_statement_count_is_constant(db, query_counter):
+    db.add(models.TeacherRubric(rubric_id="R1", bncc_code="EF06MA01", objective="rubrica v1"))
+    db.commit()
+
+    counts = []
+    for n in (1, 35):
+        objective_id = uuid4()
+        students = [f"N{n}-{i}" for i in range(n)]
+        inserted = _save(db, query_counter, _grades(students, objective_id, level=2))
+        assert _rollup(db) == {2: n}
+
+        # Mesmo lote com outra nota + um aluno novo: n atualizações e uma inserção
+        mixed = _save(db, query_counter, _grades(students, objective_id, level=4)
+                      + _grades([f"N{n}-novo"], objective_id, level=1))
+        counts.append((inserted, mixed))
+
+        assert _rollup(db) == {4: n, 1: 1}   # nível 2 saiu (-n), nível 4 entrou (+n)
+        levels = dict(db.query(models.Assessment.student_id, models.Assessment.level_assigned)
+                      .filter_by(objective_id=objective_id))
+        assert levels == {**{sid: 4 for sid in students}, f"N{n}-novo": 1}
+        assert db.query(models.Assessment).filter_by(objective_id=objective_id).count() == n + 1
+
+        db.query(models.AssessmentRollup).delete()   # próxima rodada começa do zero
+        db.commit()
+
+    assert counts[0] == counts[1]
+
+
+def test_save_batch_refreshes_risk_of_touched_students(db):
+    objective_id = uuid4()
+    assessment_service.save_batch(db, _grades(["A1", "A2"], objective_id, level=1))
+    db.commit()
+    assert {r.student_id: r.is_at_risk for r in db.query(models.StudentRisk)} == {"A1": True, "A2": True}
+
+    assessment_service.save_batch(db, _grades(["A1"], objective_id, level=4))
+    db.commit()
+    assert {r.student_id: r.is_at_risk for r in db.query(models.StudentRisk)} == {"A1": False, "A2": True}
+
+
+def _items(student_ids):
+    return [schemas.AssessmentBatchItem(
+        student_id=sid, bncc_code="EF06MA01", level_assigned=3, bimester=1,
+        date=datetime(2026, 3, 10), objective_id=uuid4()
+    ) for sid in student_ids]
+
+
+def _fake_save_batch(db, items):
+    for item in items:
+        db.add(models.Student(student_id=item.student_id, student_name=item.student_id))
+    db.flush()
+    return len(items)
+
+
+def test_failed_rows_are_isolated_per_chunk(db, monkeypatch):
+    monkeypatch.setattr(assessment_service, "save_batch", _fake_save_batch)
+    monkeypatch.setattr(assessment_service, "CHUNK_SIZE", 3)
+    db.add(models.Student(student_id="DUP", student_name="Já existe"))
+    db.commit()
+
+    result = assessment_service.ingest_batch(db, _items(["A1", "A2", "DUP", "A3", "A4"]))
+
+    assert result["ok"] is False
+    assert (result["count"], result["failed"]) == (4, 1)
+    assert [r["ok"] for r in result["results"]] == [True, True, False, True, True]
+    assert {s.student_id for s in db.query(models.Student)} == {"DUP", "A1", "A2", "A3", "A4"}
+
+
+def test_repeated_idempotency_key_returns_stored_result(db, monkeypatch):
+    calls = []
+    monkeypatch.setattr(assessment_service, "save_batch",
+                        lambda db, items: calls.append(len(items)) or _fake_save_batch(db, items))
+
+    first = assessment_service.ingest_batch(db, _items(["A1", "A2"]), idempotency_key="lote-1")
+    again = assessment_service.ingest_batch(db, _items(["A1", "A2"]), idempotency_key="lote-1")
+
+    assert calls == [2]
+    assert again == first == {"ok": True, "count": 2, "failed": 0,
+                              "results": [{"index": 0, "ok": True}, {"index": 1, "ok": True}]}
+
+
+def test_legacy_rubrics_are_resolved_with_one_lookup_and_one_insert(db, query_counter):
+    db.add(models.TeacherRubric(rubric_id="R-MA01", bncc_code="EF06MA01", objective="rubrica v1"))
+    db.commit()
+    items = [item for code in ("EF06MA01", "EF06MA02", "EF06MA03")
+             for item in _grades(["A1", "A2"], uuid4(), level=3, bncc_code=code)]
+
+    query_counter.clear()
+    resolved = assessment_service._legacy_rubric_ids(db, items)
+    assert len(query_counter) == 2   # IN nas rubricas existentes + INSERT das dummies
+    assert resolved == {"EF06MA01": "R-MA01",
+                        "EF06MA02": "v2_migrated_EF06MA02", "EF06MA03": "v2_migrated_EF06MA03"}
+    dummies = {r.rubric_id: (r.bncc_code, r.discipline_id)
+               for r in db.query(models.TeacherRubric).filter(models.TeacherRubric.rubric_id.like("v2_migrated_%"))}
+    assert dummies == {"v2_migrated_EF06MA02": ("EF06MA02", 1), "v2_migrated_EF06MA03": ("EF06MA03", 1)}
+
+    assessment_service.save_batch(db, items)
+    db.commit()
+    assert {(a.bncc_code, a.rubric_id) for a in db.query(models.Assessment)} == set(resolved.items())
+
+
+def test_overlapping_retry_with_same_key_is_rejected(db, monkeypatch):
+    items = _grades(["A1", "A2"], uuid4(), level=3)
+    real_save_batch = assessment_service.save_batch
+    overlapping = []
+
+    def save_batch_with_retry_arriving(db, chunk):
+        # Reenvio (Wi-Fi instável) chega enquanto o primeiro envio ainda grava
+        with pytest.raises(assessment_service.BatchInProgress):
+            assessment_service.ingest_batch(db, items, idempotency_key="lote-1")
+        overlapping.append(True)
+        return real_save_batch(db, chunk)
+
+    monkeypatch.setattr(assessment_service, "save_batch", save_batch_with_retry_arriving)
+    first = assessment_service.ingest_batch(db, items, idempotency_key="lote-1")
+    monkeypatch.setattr(assessment_service, "save_batch", real_save_batch)
+
+    assert overlapping == [True] and first["count"] == 2
+    assert _rollup(db) == {3: 2}                                  # contado uma vez só
+    assert db.query(models.AssessmentEvent).count() == 2
+    assert assessment_service.ingest_batch(db, items, idempotency_key="lote-1") == first
+
+
+def test_abandoned_reservation_is_taken_over(db):
+    stale = datetime.now(timezone.utc) - timedelta(seconds=assessment_service.IDEMPOTENCY_LOCK_SECONDS + 1)
+    db.add(models.AssessmentBatchRequest(idempotency_key="lote-1", status="in_progress", created_at=stale))
+    db.commit()
+
+    result = assessment_service.ingest_batch(db, _grades(["A1"], uuid4(), level=2), idempotency_key="lote-1")
+
+    assert result["count"] == 1
+    assert db.get(models.AssessmentBatchRequest, "lote-1").status == "done"
+
+
+def test_regrading_keeps_one_current_row_and_appends_events(db):
+    from backend.main import get_assessment_history
+
+    objective_id = uuid4()
+    for level in (2, 4):
+        assessment_service.save_batch(db, _grades(["A1"], objective_id, level=level))
+        db.commit()
+
+    current = db.query(models.Assessment).filter_by(student_id="A1", objective_id=objective_id).all()
+    assert [a.level_assigned for a in current] == [4]
+    events = db.query(models.AssessmentEvent).filter_by(student_id="A1").order_by(models.AssessmentEvent.id)
+    assert [e.level_assigned for e in events] == [2, 4]
+
+    history = get_assessment_history("A1", objective_id=objective_id, bimester=1, db=db)
+    assert [h["level_assigned"] for h in history] == [2, 4]
+    assert get_assessment_history("A1", objective_id=None, bimester=2, db=db) == []
+
+
+def test_concurrent_batches_on_a_new_key_count_once_in_the_rollup(tmp_path):
+    """Duas sessões lançam a mesma nota nova: a segunda espera o commit da primeira
+    e entra como atualização (-2 +4), não como uma segunda inserção no rollup."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'lotes.db'}",
+                           connect_args={"check_same_thread": False, "timeout": 10})
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+    objective_id = uuid4()
+    first, second = Session(), Session()
+    errors = []
+
+    def concurrent_batch():
+        try:
+            assessment_service.save_batch(second, _grades(["A1"], objective_id, level=4))
+            second.commit()
+        except Exception as exc:   # noqa: BLE001 - repassado ao teste
+            errors.append(exc)
+
+    assessment_service.save_batch(first, _grades(["A1"], objective_id, level=2))   # ainda sem commit
+    worker = threading.Thread(target=concurrent_batch)
+    worker.start()
+    worker.join(0.5)          # o segundo lote fica bloqueado na gravação
+    first.commit()
+    worker.join()
+    first.close()
+    second.close()
+
+    assert errors == []
+    with Session() as db:
+        assert [a.level_assigned for a in db.query(models.Assessment)] == [4]
+        assert _rollup(db) == {4: 1}
+        assert db.query(models.AssessmentEvent).count() == 2
+    engine.dispose()
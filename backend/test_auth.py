@@ -0,0 +1,183 @@
+"""
+Autenticação: hash de senhas, access token sem banco, refresh token rotativo e revogação.
+"""
+import asyncio
+import hashlib
+import uuid
+
+import jwt
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from backend import models
+from backend.routers import admin, auth
+from backend.services import passwords, rate_limit, session_revocations
+
+
+@pytest.fixture(autouse=True)
+def _clear_auth_state():
+    session_revocations.clear()
+    rate_limit.backend.clear()
+    yield
+    session_revocations.clear()
+    rate_limit.backend.clear()
+
+
+def _login_as(db, username="prof", password="senha", ip="10.0.0.1"):
+    request = Request({"type": "http", "headers": [(b"x-forwarded-for", ip.encode())], "client": ("127.0.0.1", 0)})
+    return asyncio.run(auth.login({"username": username, "password": password}, request=request, db=db))
+
+
+def _login(db):
+    user = models.User(id=uuid.uuid4(), username="prof", password=passwords.hash_password("senha"),
+                       role="teacher", is_active=True)
+    db.add(user)
+    db.commit()
+    return user, _login_as(db)
+
+
+def _refresh(db, session):
+    return auth.refresh({"refresh_token": session["refresh_token"]}, db=db)
+
+
+def _assert_unauthorized(fn, *args):
+    with pytest.raises(HTTPException) as exc:
+        fn(*args)
+    assert exc.value.status_code == 401
+
+
+@pytest.mark.parametrize("legacy", ["senha", hashlib.sha256(b"senha").hexdigest()], ids=["texto", "sha256"])
+def test_legacy_passwords_are_rehashed_on_login(db, legacy):
+    user = models.User(id=uuid.uuid4(), username="prof", password=legacy, is_active=True)
+    db.add(user)
+    db.commit()
+
+    assert _login_as(db)["user"]["username"] == "prof"
+    db.refresh(user)
+    assert user.password.startswith("$2b$")
+
+    _login_as(db)   # já em bcrypt: continua entrando
+    with pytest.raises(HTTPException) as exc:
+        _login_as(db, password="errada")
+    assert exc.value.status_code == 401
+
+
+def test_login_is_rejected_when_the_hashing_queue_is_full(db, monkeypatch):
+    _login(db)
+
+    def busy(*args):
+        raise passwords.HashingBusy()
+    monkeypatch.setattr(passwords, "_submit", busy)
+    with pytest.raises(HTTPException) as exc:
+        _login_as(db)
+    assert exc.value.status_code == 503
+
+
+def test_admin_password_changes_are_rejected_when_the_hashing_queue_is_full(db, monkeypatch):
+    user, _ = _login(db)
+    stored = user.password
+
+    def busy(*args):
+        raise passwords.HashingBusy()
+    monkeypatch.setattr(passwords, "_submit", busy)
+    for call in (lambda: admin.create_user(admin.UserCreate(username="nova", password="x"), db=db),
+                 lambda: admin.update_user(str(user.id), admin.UserUpdate(password="outra"), db=db)):
+        with pytest.raises(HTTPException) as exc:
+            call()
+        assert (exc.value.status_code, exc.value.headers) == (503, {"Retry-After": "2"})
+
+    db.rollback()
+    assert db.query(models.User).count() == 1
+    assert db.get(models.User, user.id).password == stored
+
+
+def test_access_token_is_verified_without_queries(db, query_counter):
+    user, session = _login(db)
+
+    query_counter.clear()
+    principal = auth.get_current_user(token=session["access_token"])
+    assert principal.id == user.id and principal.role == "teacher"
+    assert query_counter == []
+
+    # Token de 7 dias do formato antigo (sem "typ") não vale mais
+    legacy = jwt.encode({"sub": str(user.id), "username": "prof"}, auth.SECRET_KEY, algorithm=auth.ALGORITHM)
+    assert auth.get_current_user(token=legacy) is None
+
+
+def test_refresh_rotates_and_detects_reuse(db, monkeypatch):
+    _, session = _login(db)
+
+    renewed = _refresh(db, session)
+    assert renewed["refresh_token"] != session["refresh_token"]
+    assert auth.get_current_user(token=renewed["access_token"])
+
+    # Outra aba renovando com o mesmo token logo em seguida: aceito dentro da tolerância
+    other_tab = _refresh(db, session)
+    assert auth.get_current_user(token=other_tab["access_token"])
+
+    # Fora da tolerância, o token antigo reapresentado derruba a sessão inteira
+    monkeypatch.setattr(auth, "REFRESH_REUSE_GRACE_SECONDS", -1)
+    _assert_unauthorized(_refresh, db, session)
+    _assert_unauthorized(_refresh, db, renewed)
+    _assert_unauthorized(_refresh, db, other_tab)
+
+    other = _login_as(db)   # outro login (outra família) segue válido
+    assert _refresh(db, other)["user"]["username"] == "prof"
+
+
+def test_logged_out_token_is_not_covered_by_the_reuse_grace(db):
+    _, session = _login(db)
+    renewed = _refresh(db, session)
+
+    auth.logout({"refresh_token": renewed["refresh_token"]}, db=db)
+
+    _assert_unauthorized(_refresh, db, session)
+    _assert_unauthorized(_refresh, db, renewed)
+
+
+def test_deactivating_a_user_revokes_their_tokens(db):
+    user, session = _login(db)
+
+    admin.toggle_user_active(str(user.id), db=db)
+    assert auth.get_current_user(token=session["access_token"]) is None
+    _assert_unauthorized(_refresh, db, session)
+
+    # Reativado, a sessão antiga continua inválida (versão mudou); um novo login funciona
+    admin.toggle_user_active(str(user.id), db=db)
+    assert auth.get_current_user(token=session["access_token"]) is None
+    assert auth.get_current_user(token=_login_as(db)["access_token"]).id == user.id
+
+
+def test_version_bumped_elsewhere_applies_on_refresh(db):
+    user, session = _login(db)
+
+    # Troca de senha feita por outra instância: só o banco muda
+    user.auth_version += 1
+    db.commit()
+    assert auth.get_current_user(token=session["access_token"])   # vale até expirar (ACCESS_TOKEN_MINUTES)
+    _assert_unauthorized(_refresh, db, session)
+
+
+def test_login_attempts_are_limited_before_touching_the_db(db, query_counter, monkeypatch):
+    _login(db)
+    for _ in range(rate_limit.LOGIN_LIMIT_USER.capacity - 1):
+        with pytest.raises(HTTPException):
+            _login_as(db, password="errada")
+
+    hashed = []
+    monkeypatch.setattr(passwords, "verify_and_update", lambda *a: hashed.append(a))
+    query_counter.clear()
+    for ip in ["10.0.0.1", "10.0.0.2"]:   # trocar de IP não libera o usuário
+        with pytest.raises(HTTPException) as exc:
+            _login_as(db, ip=ip)
+        assert exc.value.status_code == 429 and int(exc.value.headers["Retry-After"]) >= 1
+    assert query_counter == [] and hashed == []
+
+
+def test_token_bucket_refills_over_time():
+    buckets, limit = rate_limit.MemoryBuckets(), rate_limit.Limit(2, 10)
+    assert [buckets.take("k", limit, now=0) for _ in range(3)] == [0, 0, 5.0]
+    assert buckets.take("k", limit, now=5) == 0        # uma ficha a cada 5 s
+    assert buckets.take("k", limit, now=5) > 0
+    assert buckets.take("outra", limit, now=5) == 0    # baldes independentes
@@ -0,0 +1,80 @@
+"""
+Exportação de avaliações (/api/assessments/export): CSV com BOM, NDJSON, filtros e formato inválido.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+from backend import main, models
+from backend.database import get_db
+
+
+@pytest.fixture
+def client(db, engine, monkeypatch):
+    # O streaming abre a própria sessão (SessionLocal): aponta para o banco do teste
+    monkeypatch.setattr(main, "SessionLocal", sessionmaker(bind=engine, autoflush=False))
+    main.app.dependency_overrides[get_db] = lambda: db
+    yield TestClient(main.app)
+    main.app.dependency_overrides.pop(get_db, None)
+
+
+@pytest.fixture
+def seeded(db):
+    db.add_all([
+        models.Student(student_id="A1", student_name="Aluno 1", class_name="6º Ano A"),
+        models.Student(student_id="B1", student_name="Aluno 2", class_name="6º Ano B"),
+    ])
+    for student_id, bimester, discipline_id in (("A1", 1, 1), ("A1", 2, 1), ("A1", 1, 2), ("B1", 1, 1)):
+        db.add(models.Assessment(
+            student_id=student_id, rubric_id="R1", bncc_code=f"EF06MA0{discipline_id}", level_assigned=3,
+            bimester=bimester, discipline_id=discipline_id, date=datetime(2026, 3, 10)
+        ))
+    db.commit()
+
+
+def _csv_rows(response):
+    body = response.content.decode("utf-8")
+    assert body.startswith("\ufeff")
+    return list(csv.DictReader(io.StringIO(body[1:])))
+
+
+def test_csv_has_bom_and_header(client, seeded):
+    response = client.get("/api/assessments/export")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.content.decode("utf-8")[1:].splitlines()[0] == ",".join(main.EXPORT_FIELDS)
+    assert len(_csv_rows(response)) == 4
+
+
+@pytest.mark.parametrize("params, expected", [
+    ({"class_name": "6º Ano A"}, {("A1", "1", "EF06MA01"), ("A1", "2", "EF06MA01"), ("A1", "1", "EF06MA02")}),
+    ({"bimester": 2}, {("A1", "2", "EF06MA01")}),
+    ({"discipline_id": 2}, {("A1", "1", "EF06MA02")}),
+    ({"class_name": "6º Ano A", "bimester": 1, "discipline_id": 1}, {("A1", "1", "EF06MA01")}),
+])
+def test_filters_apply(client, seeded, params, expected):
+    rows = _csv_rows(client.get("/api/assessments/export", params=params))
+
+    assert {(r["student_id"], r["bimester"], r["bncc_code"]) for r in rows} == expected
+
+
+def test_ndjson_is_one_object_per_line(client, seeded):
+    response = client.get("/api/assessments/export", params={"format": "ndjson"})
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.text.endswith("\n")
+    lines = response.text.splitlines()
+    assert len(lines) == 4
+    records = [json.loads(line) for line in lines]
+    assert all(set(r) == set(main.EXPORT_FIELDS) for r in records)
+    assert {r["student_id"] for r in records} == {"A1", "B1"}
+
+
+def test_unknown_format_is_rejected(client):
+    assert client.get("/api/assessments/export", params={"format": "xlsx"}).status_code == 400
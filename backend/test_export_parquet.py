@@ -0,0 +1,59 @@
+"""
+Exportação Parquet (export_parquet): partições Hive, schema tipado e colunas unidas de aluno/turma/disciplina.
+"""
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from backend import export_parquet, models
+
+pa = pytest.importorskip("pyarrow")
+ds = pytest.importorskip("pyarrow.dataset")
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+@pytest.fixture
+def seeded(db, engine, monkeypatch):
+    monkeypatch.setattr(export_parquet, "SessionLocal", sessionmaker(bind=engine, autoflush=False))
+    disc = models.SetupDiscipline(discipline_name="Matemática")
+    db.add(disc)
+    db.add(models.SetupClass(class_name="6º Ano A", year_level=6, shift="morning"))
+    db.add(models.Student(student_id="A1", student_name="Aluno 1", class_name="6º Ano A"))
+    db.flush()
+    for year, bimester, level in ((2025, 4, 2), (2026, 1, 3), (2026, 2, 4)):
+        db.add(models.Assessment(
+            student_id="A1", rubric_id="R1", bncc_code="EF06MA01", level_assigned=level, bimester=bimester,
+            class_name="6º Ano A", discipline_id=disc.id, objective_id=uuid.uuid4(), date=datetime(year, 3, 10)
+        ))
+    db.commit()
+    return disc
+
+
+def _partitioning():
+    return ds.partitioning(pa.schema([("school_year", pa.int16()), ("bimester", pa.int8())]), flavor="hive")
+
+
+def test_writes_hive_partitions_with_typed_schema(tmp_path, seeded):
+    assert export_parquet.export_parquet(str(tmp_path)) == 3
+
+    partitions = sorted(str(p.parent.relative_to(tmp_path)) for p in tmp_path.rglob("*.parquet"))
+    assert partitions == ["school_year=2025/bimester=4", "school_year=2026/bimester=1", "school_year=2026/bimester=2"]
+
+    file_schema = pq.read_schema(next(tmp_path.rglob("*.parquet")))
+    assert file_schema.field("year_level").type == pa.int16()
+    assert file_schema.field("discipline_id").type == pa.int32()
+    assert file_schema.field("level_assigned").type == pa.int8()
+    assert file_schema.field("date").type == pa.timestamp("us", tz="UTC")
+
+    table = ds.dataset(str(tmp_path), format="parquet", partitioning=_partitioning()).to_table()
+    rows = sorted(table.to_pylist(), key=lambda r: (r["school_year"], r["bimester"]))
+    assert [(r["school_year"], r["bimester"], r["level_assigned"]) for r in rows] == [(2025, 4, 2), (2026, 1, 3), (2026, 2, 4)]
+    assert {(r["student_name"], r["class_name"], r["year_level"], r["shift"], r["discipline_id"], r["discipline_name"])
+            for r in rows} == {("Aluno 1", "6º Ano A", 6, "morning", seeded.id, "Matemática")}
+
+
+def test_school_year_filter(tmp_path, seeded):
+    assert export_parquet.export_parquet(str(tmp_path), school_year=2025) == 1
+    assert [p.parent.parent.name for p in tmp_path.rglob("*.parquet")] == ["school_year=2025"]
@@ -0,0 +1,190 @@
+"""
+Importação CSV do admin: resultado e número de comandos constantes (independente do tamanho da planilha).
+"""
+from datetime import date
+
+from backend import models
+from backend.services import import_service
+
+
+def _roster(n, start=0, turma="6º Ano A"):
+    return [{
+        "nome": f"Aluno {i}", "id_aluno": f"A{i}", "turma": turma, "ano": "6º ano", "turno": "Tarde",
+    } for i in range(start, start + n)]
+
+
+def test_import_students_inserts_updates_and_reports_errors(db):
+    db.add(models.SetupClass(class_name="6º Ano A", year_level=None, shift="morning"))
+    db.add(models.Student(student_id="A0", student_name="Antigo", class_name="6º Ano A"))
+    db.commit()
+
+    rows = _roster(3) + [
+        {"nome": "Aluno 9", "id_aluno": "A9", "turma": "7º Ano B", "ano": "7", "turno": "noite",
+         "data_nascimento": "2013-05-02", "nr_matricula": " 123 "},
+        {"nome": "Sem ano", "id_aluno": "X1", "turma": "7º Ano B", "ano": "sétimo", "turno": "noite"},
+        {"nome": "", "id_aluno": "X2", "turma": "7º Ano B", "ano": "7", "turno": "noite"},
+        {"nome": "Aluno 1 (corrigido)", "id_aluno": "A1", "turma": "6º Ano A", "ano": "6", "turno": "tarde"},
+    ]
+    result = import_service.import_students(db, rows)
+    db.commit()
+
+    assert (result["inserted"], result["updated"], result["total_processed"]) == (3, 2, 5)
+    assert [e.split(":")[0] for e in result["errors"]] == ["Linha 6", "Linha 7"]
+
+    students = {s.student_id: s for s in db.query(models.Student)}
+    assert students["A0"].student_name == "Aluno 0"
+    assert students["A1"].student_name == "Aluno 1 (corrigido)"
+    assert (students["A9"].birth_date, students["A9"].enrollment_number) == (date(2013, 5, 2), "123")
+
+    classes = {c.class_name: c for c in db.query(models.SetupClass)}
+    assert (classes["6º Ano A"].year_level, classes["6º Ano A"].shift) == (6, "afternoon")
+    assert (classes["7º Ano B"].year_level, classes["7º Ano B"].shift) == (7, "evening")
+
+
+def test_import_students_statement_count_is_independent_of_roster_size(db, query_counter):
+    db.add(models.Student(student_id="A0", student_name="Antigo"))
+    db.commit()
+    query_counter.clear()
+
+    import_service.import_students(db, _roster(20))
+    small = len(query_counter)
+    db.rollback()
+    query_counter.clear()
+
+    import_service.import_students(db, _roster(1500) + _roster(500, turma="6º Ano B"))
+    assert len(query_counter) == small <= 6
+
+
+def _bncc(n, disciplina="Matemática"):
+    return [{
+        "codigo": f"EF06MA{i:03d}", "descricao": f"Habilidade {i}", "disciplina": disciplina, "ano": "6º",
+    } for i in range(n)]
+
+
+def test_import_bncc_upserts_and_keeps_blank_optional_fields(db):
+    db.add(models.SetupDiscipline(id=1, discipline_name="Matemática"))
+    db.add(models.BnccLibrary(bncc_code="EF06MA000", skill_description="Antiga", discipline_id=1,
+                              bimester="1", area="Números"))
+    db.commit()
+
+    rows = _bncc(2) + [
+        {"codigo": "EF06CI001", "descricao": "Ciências", "disciplina": "Ciências", "ano": "6", "bimestre": "2"},
+        {"codigo": "EF06CI001", "descricao": "Ciências (rev.)", "disciplina": "Ciências", "ano": "6"},
+        {"codigo": "EF06CI002", "descricao": "Sem ano", "disciplina": "Ciências", "ano": "sexto"},
+    ]
+    result = import_service.import_bncc(db, rows)
+    db.commit()
+
+    assert (result["inserted"], result["updated"], result["total_processed"]) == (2, 2, 4)
+    assert result["errors"] == ["Linha 6: ano 'sexto' inválido. Não contém um número inteiro identificável."]
+
+    skills = {s.bncc_code: s for s in db.query(models.BnccLibrary)}
+    assert (skills["EF06MA000"].skill_description, skills["EF06MA000"].bimester, skills["EF06MA000"].area) \
+        == ("Habilidade 0", "1", "Números")
+    assert (skills["EF06CI001"].skill_description, skills["EF06CI001"].bimester, skills["EF06CI001"].grade) \
+        == ("Ciências (rev.)", "2", "6º Ano")
+    assert skills["EF06CI001"].discipline.discipline_name == "Ciências"
+
+
+def test_import_bncc_statements_grow_per_chunk_not_per_row(db, query_counter, monkeypatch):
+    monkeypatch.setattr(import_service, "BNCC_CHUNK_SIZE", 500)
+
+    import_service.import_bncc(db, _bncc(1500))
+
+    # disciplinas (IN + INSERT) + 3 blocos × (IN + upsert)
+    assert len(query_counter) == 2 + 3 * 2
+
+
+def test_import_job_runs_in_chunks_and_reports_progress(engine, db, monkeypatch, tmp_path):
+    import io
+    from fastapi import UploadFile
+    from sqlalchemy.orm import sessionmaker
+    from backend.services import import_jobs
+
+    monkeypatch.setattr(import_jobs, "SessionLocal", sessionmaker(bind=engine, autoflush=False))
+    monkeypatch.setattr(import_jobs, "IMPORT_SPOOL_DIR", str(tmp_path))
+    monkeypatch.setattr(import_jobs, "JOB_CHUNK_ROWS", 4)
+
+    lines = ["nome;id_aluno;turma;ano;turno"] + [f"Aluno {i};A{i};6º Ano A;6;manhã" for i in range(9)]
+    lines[6] = "Sem turma;X1;;6;manhã"   # linha 7 do arquivo, no 2º bloco
+    upload = UploadFile(file=io.BytesIO("\n".join(lines).encode("latin-1")), filename="alunos.csv")
+
+    job = import_jobs.create_job(db, "students", upload)
+    assert (job.status, job.total_rows) == ("queued", 9)
+
+    import_jobs.run_job(job.id)
+    db.expire_all()
+    status = import_jobs.job_status(db.get(models.ImportJob, job.id))
+
+    assert (status["status"], status["rows_processed"], status["inserted"]) == ("done", 9, 8)
+    assert [e.split(":")[0] for e in status["errors"]] == ["Linha 7"]
+    assert status["eta_seconds"] is None
+    assert db.query(models.Student).count() == 8
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_open_csv_decodes_incrementally_across_tiny_chunks():
+    import io
+    from backend.services import import_jobs
+
+    utf8 = "﻿nome;turma\r\nJoão;\"6º Ano\nA\"\r\nAné;7º\r\n".encode("utf-8")
+    rows = list(import_jobs.open_csv(io.BytesIO(utf8), chunk_size=3))
+    assert rows == [{"nome": "João", "turma": "6º Ano\nA"}, {"nome": "Ané", "turma": "7º"}]
+
+    # Primeiro bloco é ASCII (parece UTF-8); o acento em latin-1 só aparece depois
+    mixed = "nome,turma\nAna,6A\nJoão,7B".encode("latin-1")
+    rows = list(import_jobs.open_csv(io.BytesIO(mixed), chunk_size=16))
+    assert [r["nome"] for r in rows] == ["Ana", "João"]
+
+
+def test_dry_run_reports_same_errors_as_import_without_writing(db):
+    import io
+    from backend.services import import_jobs, import_validation
+
+    db.add(models.Student(student_id="A0", student_name="Antigo", enrollment_number="M1"))
+    db.commit()
+    csv_text = "\n".join([
+        "nome;id_aluno;turma;ano;turno;data_nascimento;nr_matricula",
+        "Aluno 1;A1;6º Ano A;6º;manhã;2013-05-02;",
+        "Aluno 2;A2;6º Ano A;;manhã;;",
+        "Aluno 3;A3;6º Ano A;sexto;tarde;;",
+        "Aluno 0;A0;6º Ano A;6;integral;02/05/2013;M1",
+        "Aluno 4;A4;6º Ano A;6;manhã;;M1",
+        "Aluno 1 bis;A1;6º Ano A;6;noite;2013-05;",   # aceito pelo pandas (ISO8601), não pelo import
+    ]).encode("utf-8")
+
+    report = import_validation.validate_students(db, import_validation.read_csv_frame(io.BytesIO(csv_text)))
+
+    assert (report["total_rows"], report["valid_rows"], report["would_insert"], report["would_update"]) == (6, 4, 2, 2)
+    assert report["errors"] == [
+        "Linha 3: campos obrigatórios incompletos (nome, id_aluno, turma, ano, turno).",
+        "Linha 4: ano 'sexto' inválido. Não contém um número inteiro identificável.",
+        "Linha 5: nr_matricula 'M1' usada por mais de um aluno na planilha.",
+        "Linha 6: nr_matricula 'M1' já pertence ao aluno A0.",
+        "Linha 6: nr_matricula 'M1' usada por mais de um aluno na planilha.",
+    ]
+    assert [w.split(":")[0] for w in report["warnings"]] == ["Linha 2", "Linha 5", "Linha 5", "Linha 7"]
+    assert "Linha 7: data_nascimento '2013-05' inválida (use AAAA-MM-DD); será ignorada." in report["warnings"]
+    assert db.query(models.Student).count() == 1
+
+    parsed, import_errors = import_service.parse_student_rows(import_jobs.open_csv(io.BytesIO(csv_text)))
+    assert set(import_errors) <= set(report["errors"])
+    assert parsed[-1]["birth_date"] is None   # a importação descarta a mesma data
+
+
+def test_job_without_heartbeat_is_reported_as_failed(db):
+    from datetime import datetime, timedelta, timezone
+    from backend.routers import admin
+    from backend.services import import_jobs
+
+    now = datetime.now(timezone.utc)
+    stale = models.ImportJob(kind="students", status="running", errors=[], rows_processed=500,
+                             updated_at=now - timedelta(seconds=import_jobs.IMPORT_STALE_SECONDS + 1))
+    alive = models.ImportJob(kind="students", status="running", errors=[], rows_processed=500, updated_at=now)
+    db.add_all([stale, alive])
+    db.commit()
+
+    status = admin.get_import_job(str(stale.id), db=db)
+    assert status["status"] == "failed"
+    assert status["errors"][-1].startswith("Importação interrompida")
+    assert admin.get_import_job(str(alive.id), db=db)["status"] == "running"
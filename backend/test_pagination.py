@@ -0,0 +1,37 @@
+"""
+Listagens paginadas por cursor (/api/students, /api/bncc-skills, /api/assessments): tamanho de página limitado.
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import models
+from backend.database import get_db
+from backend.main import app
+
+
+@pytest.fixture
+def client(db):
+    app.dependency_overrides[get_db] = lambda: db
+    yield TestClient(app)
+    app.dependency_overrides.pop(get_db, None)
+
+
+@pytest.mark.parametrize("path, max_limit", [
+    ("/api/students", 500), ("/api/bncc-skills", 500), ("/api/assessments", 1000),
+])
+def test_limit_is_bounded(client, path, max_limit):
+    assert client.get(path, params={"limit": max_limit}).status_code == 200
+    assert client.get(path, params={"limit": max_limit + 1}).status_code == 422
+    assert client.get(path, params={"limit": 0}).status_code == 422
+
+
+def test_pages_follow_the_cursor(client, db):
+    db.add_all([models.Student(student_id=f"A{i}", student_name=f"Aluno {i}") for i in range(5)])
+    db.commit()
+
+    first = client.get("/api/students", params={"limit": 3})
+    rest = client.get("/api/students", params={"limit": 3, "cursor": first.headers["X-Next-Cursor"]})
+
+    assert [s["id"] for s in first.json()] == ["A0", "A1", "A2"]
+    assert [s["id"] for s in rest.json()] == ["A3", "A4"]
+    assert "X-Next-Cursor" not in rest.headers
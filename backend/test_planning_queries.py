@@ -0,0 +1,49 @@
+"""
+Listagem de objetivos: número de consultas fixo, independente da quantidade de objetivos.
+"""
+import uuid
+
+import pytest
+
+from backend import models
+from backend.routers import planning
+
+
+def _seed(db, n_objectives):
+    teachers = [models.User(id=uuid.uuid4(), username=f"prof{i}", password="x", full_name=f"Prof {i}")
+                for i in range(2)]
+    db.add_all(teachers)
+    db.add(models.SetupDiscipline(id=1, discipline_name="Matemática"))
+    db.add_all([models.SetupClass(id=1, class_name="6º Ano A", year_level=6),
+                models.SetupClass(id=2, class_name="6º Ano B", year_level=6)])
+    for class_id, teacher in [(1, teachers[0]), (2, teachers[0]), (2, teachers[1])]:
+        db.add(models.TeacherClassDiscipline(teacher_id=teacher.id, class_id=class_id,
+                                             discipline_id=1, school_year=2026))
+    db.add(models.BnccLibrary(bncc_code="EF06MA01", skill_description="Comparar números naturais", discipline_id=1))
+
+    for i in range(n_objectives):
+        obj = models.LearningObjective(bncc_code="EF06MA01", discipline_id=1, year_level=6, bimester=1,
+                                       description=f"Objetivo {i}", order_index=i, status="pending")
+        obj.approvals = [models.ObjectiveApproval(teacher_id=t.id, action="approved") for t in teachers]
+        obj.rubric_levels = [models.RubricLevel(level=lv, description=f"Nível {lv}", status="approved")
+                             for lv in range(1, 5)]
+        db.add(obj)
+    db.commit()
+    db.expunge_all()   # nada em cache na sessão: as relações precisam ser carregadas
+
+
+@pytest.mark.parametrize("n_objectives", [3, 40])
+def test_list_objectives_query_count_is_constant(db, query_counter, n_objectives):
+    _seed(db, n_objectives)
+
+    query_counter.clear()
+    result = planning.list_objectives(discipline_id=1, year_level=6, bimester=1, db=db)
+
+    # objetivos + approvals + professores + rubric_levels + bncc_skill + quórum
+    assert len(query_counter) == 6
+    assert len(result) == n_objectives
+    first = result[0]
+    assert first["bncc_description"] == "Comparar números naturais"
+    assert first["rubrics_status"] == "approved"
+    assert sorted(a["teacher_name"] for a in first["approvals"]) == ["Prof 0", "Prof 1"]
+    assert sorted(t["name"] for t in first["required_teachers"]) == ["Prof 0", "Prof 1"]
@@ -54,6 +54,7 @@ gcloud run deploy $SERVICE_NAME `
     --memory 512Mi `
     --min-instances 0 `
     --max-instances 3 `
+    --no-cpu-throttling `
     --set-env-vars "DATABASE_URL=$DB_URL" `
     --quiet
 
@@ -13,7 +13,7 @@ import {
     getUsers, createUser, toggleUserActive,
     getCompetencies, createCompetency, deleteCompetency,
     getTeacherClass, createTeacherClass, deleteTeacherClass,
-    uploadStudentsCSV, uploadBnccCSV, updateUser
+    uploadStudentsCSV, uploadBnccCSV, getImportJob, updateUser
 } from "@/lib/api";
 import { useAuth } from "@/lib/useAuth";
 import { useRouter } from "next/navigation";
@@ -365,11 +365,15 @@ function UsersTab() {
 // ─────────────────────────────────────────
 // ABA: UPLOAD CSV
 // ─────────────────────────────────────────
+// Sem avanço de linhas por mais que isso, parar de acompanhar (acima do IMPORT_STALE_SECONDS do backend)
+const IMPORT_POLL_TIMEOUT_MS = 6 * 60 * 1000;
+
 function CSVUploadTab() {
     const [uploadType, setUploadType] = useState<"students" | "bncc">("students");
     const [file, setFile] = useState<File | null>(null);
     const [result, setResult] = useState<any>(null);
     const [loading, setLoading] = useState(false);
+    const [progress, setProgress] = useState<any>(null);
     const [dragOver, setDragOver] = useState(false);
     const inputRef = useRef<HTMLInputElement>(null);
 
@@ -386,17 +390,48 @@ function CSVUploadTab() {
         else alert("Selecione um arquivo .csv");
     };
 
-    const handleUpload = async () => {
+    // Validação prévia (dry_run): relatório completo de erros sem gravar nada
+    const handleValidate = async () => {
         if (!file) return;
         setLoading(true); setResult(null);
+        try {
+            const r = uploadType === "students"
+                ? await uploadStudentsCSV(file, true)
+                : await uploadBnccCSV(file, true);
+            setResult(r.data);
+        } catch (e: any) {
+            setResult({ error: e?.response?.data?.detail || "Erro na validação." });
+        } finally { setLoading(false); }
+    };
+
+    const handleUpload = async () => {
+        if (!file) return;
+        setLoading(true); setResult(null); setProgress(null);
         try {
             const r = uploadType === "students"
                 ? await uploadStudentsCSV(file)
                 : await uploadBnccCSV(file);
-            setResult(r.data);
+            // Importação em segundo plano: acompanhar o job até terminar (ou falhar).
+            // O backend marca como 'failed' o job sem sinal de vida; o prazo local cobre
+            // o caso de nem essa resposta chegar.
+            let job = r.data;
+            let lastRows = -1, lastChange = Date.now();
+            while (job.status === "queued" || job.status === "running") {
+                if (Date.now() - lastChange > IMPORT_POLL_TIMEOUT_MS) {
+                    job = { ...job, status: "failed", errors: [...(job.errors || []), "A importação parou de responder. Envie o arquivo novamente."] };
+                    break;
+                }
+                await new Promise(res => setTimeout(res, 1000));
+                job = (await getImportJob(r.data.job_id)).data;
+                if (job.rows_processed !== lastRows) { lastRows = job.rows_processed; lastChange = Date.now(); }
+                setProgress(job);
+            }
+            setResult(job.status === "failed"
+                ? { ...job, error: job.errors?.[job.errors.length - 1] || "A importação falhou." }
+                : job);
         } catch (e: any) {
             setResult({ error: e?.response?.data?.detail || "Erro no upload." });
-        } finally { setLoading(false); }
+        } finally { setLoading(false); setProgress(null); }
     };
 
     return (
@@ -475,11 +510,21 @@ function CSVUploadTab() {
             </div>
 
             {file && (
-                <button onClick={handleUpload} disabled={loading}
-                    className="btn-primary w-full flex items-center justify-center gap-2 py-3">
-                    {loading ? <Loader2 className="h-4 w-4 animate-spin" /> : <Upload className="h-4 w-4" />}
-                    {loading ? "Importando..." : `Importar ${uploadType === "students" ? "Alunos" : "Habilidades"}`}
-                </button>
+                <div className="flex gap-2">
+                    <button onClick={handleValidate} disabled={loading}
+                        className="rounded-xl border border-border bg-card px-4 py-3 text-sm font-medium hover:bg-muted">
+                        Validar
+                    </button>
+                    <button onClick={handleUpload} disabled={loading}
+                        className="btn-primary flex-1 flex items-center justify-center gap-2 py-3">
+                        {loading ? <Loader2 className="h-4 w-4 animate-spin" /> : <Upload className="h-4 w-4" />}
+                        {loading
+                            ? progress?.total_rows
+                                ? `Importando... ${progress.rows_processed} de ${progress.total_rows} linhas${progress.eta_seconds != null ? ` (~${Math.ceil(progress.eta_seconds)}s)` : ""}`
+                                : "Importando..."
+                            : `Importar ${uploadType === "students" ? "Alunos" : "Habilidades"}`}
+                    </button>
+                </div>
             )}
 
             {/* Resultado */}
@@ -494,12 +539,14 @@ function CSVUploadTab() {
                         <div className="space-y-2">
                             <div className="flex items-center gap-2 text-emerald-400">
                                 <CheckCircle2 className="h-4 w-4" />
-                                <p className="text-sm font-medium">Importação concluída!</p>
+                                <p className="text-sm font-medium">
+                                    {result.dry_run ? "Validação concluída (nada foi gravado)" : "Importação concluída!"}
+                                </p>
                             </div>
                             <div className="grid grid-cols-3 gap-2">
                                 {[
-                                    { label: "Inseridos", v: result.inserted, color: "emerald" },
-                                    { label: "Atualizados", v: result.updated, color: "blue" },
+                                    { label: result.dry_run ? "Seriam inseridos" : "Inseridos", v: result.dry_run ? result.would_insert : result.inserted, color: "emerald" },
+                                    { label: result.dry_run ? "Seriam atualizados" : "Atualizados", v: result.dry_run ? result.would_update : result.updated, color: "blue" },
                                     { label: "Erros", v: result.errors?.length || 0, color: "red" },
                                 ].map(s => (
                                     <div key={s.label} className={`rounded-xl border border-${s.color}-500/20 bg-${s.color}-500/10 p-3 text-center`}>
@@ -518,6 +565,16 @@ function CSVUploadTab() {
                                     </ul>
                                 </div>
                             )}
+                            {result.warnings?.length > 0 && (
+                                <div className="mt-2 rounded-xl border border-amber-500/20 bg-amber-500/5 p-3">
+                                    <p className="text-xs text-amber-400 font-medium mb-1">Avisos:</p>
+                                    <ul className="space-y-1">
+                                        {result.warnings.map((w: string, i: number) => (
+                                            <li key={i} className="text-xs text-muted-foreground">• {w}</li>
+                                        ))}
+                                    </ul>
+                                </div>
+                            )}
                         </div>
                     )}
                 </motion.div>
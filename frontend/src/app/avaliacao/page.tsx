@@ -1,6 +1,6 @@
 "use client";
 
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useRef } from "react";
 import { motion, AnimatePresence } from "framer-motion";
 import {
     ClipboardCheck, ChevronDown, Save, Users, CheckCircle2,
@@ -88,6 +88,10 @@ export default function AvaliacaoPage() {
     const [saving, setSaving] = useState(false);
     const [saved, setSaved] = useState(false);
 
+    // Chave de idempotência do lote: reenvios das mesmas notas (ex.: Wi-Fi instável) não regravam
+    const batchKeyRef = useRef<string | null>(null);
+    useEffect(() => { batchKeyRef.current = null; }, [grades]);
+
     // Carregar listas base e auto-selecionar turma/disciplina do professor
     useEffect(() => {
         Promise.all([
@@ -269,10 +273,23 @@ export default function AvaliacaoPage() {
                 });
             });
 
-            await api.post("/api/assessments/batch", payload);
+            if (!batchKeyRef.current) batchKeyRef.current = crypto.randomUUID();
+            const res = await api.post("/api/assessments/batch", payload, {
+                headers: { "Idempotency-Key": batchKeyRef.current },
+            });
+            if (res.data?.failed) {
+                batchKeyRef.current = null; // permite tentar de novo só com um novo lote
+                alert(`${res.data.failed} de ${payload.length} avaliações não foram salvas. Tente novamente.`);
+                return;
+            }
             setSaved(true);
             setTimeout(() => setSaved(false), 4000);
         } catch (e: any) {
+            if (e?.response?.status === 409) {
+                // Envio anterior com a mesma chave ainda em gravação: salvar de novo devolve o resultado dele
+                alert("O envio anterior ainda está sendo gravado. Aguarde alguns segundos e salve novamente.");
+                return;
+            }
             alert("Erro ao salvar avaliações.");
         } finally { setSaving(false); }
     };
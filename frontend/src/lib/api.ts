@@ -7,25 +7,113 @@ export const api = axios.create({
     headers: { "Content-Type": "application/json" },
 });
 
-// Interceptor para adicionar o token JWT automaticamente
-api.interceptors.request.use((config) => {
-    if (typeof window !== "undefined") {
-        const token = localStorage.getItem("sga_token");
+// ─────────────────────────────────────────
+// SESSÃO (access token de 15 min + refresh token rotativo)
+// ─────────────────────────────────────────
+const SESSION_MAX_AGE = 60 * 60 * 24 * 7;   // mesmo prazo do refresh token
+
+export function storeSession(accessToken: string, refreshToken: string) {
+    localStorage.setItem("sga_token", accessToken);
+    localStorage.setItem("sga_refresh", refreshToken);
+    // Salvar no cookie para que o middleware Edge consiga ler
+    document.cookie = `sga_token=${accessToken}; path=/; max-age=${SESSION_MAX_AGE}; SameSite=Strict`;
+}
+
+export function clearSession() {
+    localStorage.removeItem("sga_token");
+    localStorage.removeItem("sga_refresh");
+    localStorage.removeItem("sga_user");
+    document.cookie = "sga_token=; path=/; expires=Thu, 01 Jan 1970 00:00:00 GMT; SameSite=Strict";
+}
+
+function expiresSoon(token: string): boolean {
+    try {
+        const payload = JSON.parse(atob(token.split(".")[1].replace(/-/g, "+").replace(/_/g, "/")));
+        return payload.exp * 1000 - Date.now() < 60_000;
+    } catch {
+        return false;
+    }
+}
+
+let refreshing: Promise<string | null> | null = null;
+
+// Troca o refresh token por um novo par. Todas as abas usam o mesmo token (localStorage):
+// a troca roda sob um lock entre abas e, se outra aba já trocou enquanto esta esperava,
+// aproveita o resultado dela em vez de reapresentar o token usado (o servidor trataria
+// como vazamento e encerraria a sessão em todas as abas).
+// Retorna null se a sessão acabou (401); em erro de rede mantém o token atual.
+function refreshSession(): Promise<string | null> {
+    if (!refreshing) {
+        const seen = localStorage.getItem("sga_refresh");
+        const exchange = async (): Promise<string | null> => {
+            const refreshToken = localStorage.getItem("sga_refresh");
+            if (!refreshToken) return null;
+            if (refreshToken !== seen) return localStorage.getItem("sga_token");   // outra aba renovou
+            try {
+                const res = await axios.post(`${API_BASE}/api/auth/refresh`, { refresh_token: refreshToken });
+                storeSession(res.data.access_token, res.data.refresh_token);
+                localStorage.setItem("sga_user", JSON.stringify(res.data.user));
+                return res.data.access_token as string;
+            } catch (err: any) {
+                return err.response?.status === 401 ? null : localStorage.getItem("sga_token");
+            }
+        };
+        refreshing = (navigator.locks
+            ? navigator.locks.request("sga-refresh", exchange)
+            : exchange()
+        ).finally(() => { refreshing = null; });
+    }
+    return refreshing;
+}
+
+function endSession() {
+    clearSession();
+    if (!window.location.pathname.startsWith("/login")) {
+        window.location.href = `/login?next=${encodeURIComponent(window.location.pathname)}`;
+    }
+}
+
+// Interceptor para adicionar o token JWT automaticamente (renovado antes de expirar:
+// várias rotas aceitam chamadas anônimas e não responderiam 401)
+api.interceptors.request.use(async (config) => {
+    if (typeof window !== "undefined" && !config.url?.startsWith("/api/auth/")) {
+        let token = localStorage.getItem("sga_token");
+        if (token && expiresSoon(token)) {
+            token = await refreshSession();
+            if (!token) endSession();
+        }
         if (token) config.headers.Authorization = `Bearer ${token}`;
     }
     return config;
 });
 
+// 401 com token vencido ou revogado: renova uma vez e repete a chamada
+api.interceptors.response.use(undefined, async (error) => {
+    const config = error.config;
+    if (error.response?.status === 401 && config && !config._retried && !config.url?.startsWith("/api/auth/")) {
+        config._retried = true;
+        const token = await refreshSession();
+        if (token) {
+            config.headers.Authorization = `Bearer ${token}`;
+            return api(config);
+        }
+        endSession();
+    }
+    return Promise.reject(error);
+});
+
 // ─────────────────────────────────────────
 // AUTH
 // ─────────────────────────────────────────
 export const login = (username: string, password: string) =>
     api.post("/api/auth/login", { username, password });
+export const logoutSession = (refreshToken: string) =>
+    api.post("/api/auth/logout", { refresh_token: refreshToken });
 
 // ─────────────────────────────────────────
 // STUDENTS
 // ─────────────────────────────────────────
-export const getStudents = (params?: { class_name?: string; limit?: number }) =>
+export const getStudents = (params?: { class_name?: string; limit?: number; cursor?: string }) =>
     api.get("/api/students", { params });
 
 // ─────────────────────────────────────────
@@ -56,22 +144,27 @@ export const getTeacherClass = () => api.get("/api/admin/teacher-class");
 export const createTeacherClass = (data: object) => api.post("/api/admin/teacher-class", data);
 export const deleteTeacherClass = (id: number) => api.delete(`/api/admin/teacher-class/${id}`);
 
-export const uploadStudentsCSV = (file: File) => {
+export const uploadStudentsCSV = (file: File, dryRun = false) => {
     const form = new FormData();
     form.append("file", file);
     return api.post("/api/admin/students/upload-csv", form, {
         headers: { "Content-Type": "multipart/form-data" },
+        params: dryRun ? { dry_run: true } : undefined,
     });
 };
 
-export const uploadBnccCSV = (file: File) => {
+export const uploadBnccCSV = (file: File, dryRun = false) => {
     const form = new FormData();
     form.append("file", file);
     return api.post("/api/admin/bncc/upload-csv", form, {
         headers: { "Content-Type": "multipart/form-data" },
+        params: dryRun ? { dry_run: true } : undefined,
     });
 };
 
+// Uploads CSV são processados em segundo plano: consultar o job até status "done" | "failed"
+export const getImportJob = (jobId: string) => api.get(`/api/admin/import-jobs/${jobId}`);
+
 // ─────────────────────────────────────────
 // PLANEJAMENTO
 // ─────────────────────────────────────────
@@ -99,6 +192,10 @@ export const approveRubricLevel = (rubricLevelId: string, data: object) =>
 // ─────────────────────────────────────────
 export const getBnccSkills = (params?: object) => api.get("/api/bncc-skills", { params });
 export const getAssessments = (params?: object) => api.get("/api/assessments", { params });
+export const exportAssessments = (params?: { format?: "csv" | "ndjson"; class_name?: string; bimester?: number; discipline_id?: number }) =>
+    api.get("/api/assessments/export", { params, responseType: "blob" });
+export const getAssessmentHistory = (params: { student_id: string; objective_id?: string; bimester?: number }) =>
+    api.get("/api/assessments/history", { params });
 
 // ─────────────────────────────────────────
 // ANALYTICS
@@ -110,6 +207,8 @@ export const getClassRadar = (className: string, params?: object) =>
     api.get(`/api/analytics/class-radar/${className}`, { params });
 export const getHeatmapData = (assessments: object[]) =>
     api.post("/api/analytics/heatmap", { assessments });
+export const getHeatmap = (params?: { class_name?: string; discipline_id?: number; bimester?: number }) =>
+    api.get("/api/analytics/heatmap", { params });
 
 // AI legado
 export const generateRubric = (data: { skill_code: string; objective: string }) =>
@@ -7,7 +7,7 @@
 
 import { useState, useEffect, useCallback } from "react";
 import { useRouter } from "next/navigation";
-import { api } from "./api";
+import { api, clearSession, logoutSession, storeSession } from "./api";
 
 export interface SgaUser {
     id: string;
@@ -25,17 +25,9 @@ interface AuthState {
 }
 
 // ── Helpers de storage ──────────────────────────────────────
-function saveAuth(token: string, user: SgaUser) {
-    localStorage.setItem("sga_token", token);
+function saveAuth(token: string, refreshToken: string, user: SgaUser) {
+    storeSession(token, refreshToken);
     localStorage.setItem("sga_user", JSON.stringify(user));
-    // Salvar no cookie para que o middleware Edge consiga ler
-    document.cookie = `sga_token=${token}; path=/; max-age=${60 * 60 * 24 * 7}; SameSite=Strict`;
-}
-
-function clearAuth() {
-    localStorage.removeItem("sga_token");
-    localStorage.removeItem("sga_user");
-    document.cookie = "sga_token=; path=/; expires=Thu, 01 Jan 1970 00:00:00 GMT; SameSite=Strict";
 }
 
 function readAuth(): { token: string | null; user: SgaUser | null } {
@@ -63,11 +55,11 @@ export function useAuth() {
     const login = useCallback(async (username: string, password: string): Promise<void> => {
         setState(s => ({ ...s, isLoading: true }));
         try {
-            const res = await api.post<{ access_token: string; user: SgaUser }>(
+            const res = await api.post<{ access_token: string; refresh_token: string; user: SgaUser }>(
                 "/api/auth/login", { username, password }
             );
-            const { access_token, user } = res.data;
-            saveAuth(access_token, user);
+            const { access_token, refresh_token, user } = res.data;
+            saveAuth(access_token, refresh_token, user);
             setState({ token: access_token, user, isLoading: false });
 
             // Redirecionar para a URL original ou raiz
@@ -81,7 +73,9 @@ export function useAuth() {
 
     // logout()
     const logout = useCallback(() => {
-        clearAuth();
+        const refreshToken = localStorage.getItem("sga_refresh");
+        if (refreshToken) logoutSession(refreshToken).catch(() => {});
+        clearSession();
         setState({ token: null, user: null, isLoading: false });
         router.push("/login"); // Forçar o reload local
     }, [router]);
@@ -0,0 +1,247 @@
+-- ================================================================
+-- SGA-H v3 — MIGRATION DE PERFORMANCE
+-- Execute este arquivo no SQL Editor do Supabase APÓS o v2.
+-- Cada parte é idempotente (IF NOT EXISTS / ON CONFLICT).
+-- ================================================================
+
+-- ================================================================
+-- PARTE 1: ROLLUP DE AVALIAÇÕES (dashboard do coordenador)
+-- ================================================================
+
+-- 1a. Contagens pré-agregadas por ano letivo/turma/disciplina/bimestre/habilidade/nível.
+--     Mantida incrementalmente pelo backend (services/rollup_service.py).
+--     NULLS NOT DISTINCT exige Postgres 15+ (padrão no Supabase).
+CREATE TABLE IF NOT EXISTS public.assessment_rollup (
+    id            SERIAL PRIMARY KEY,
+    school_year   INTEGER,                 -- EXTRACT(YEAR FROM assessments.date)
+    class_name    TEXT,
+    discipline_id INTEGER REFERENCES public.setup_disciplines(id),
+    bimester      INTEGER,
+    bncc_code     TEXT NOT NULL,
+    level         INTEGER NOT NULL,
+    count         INTEGER NOT NULL DEFAULT 0,
+    CONSTRAINT uq_assessment_rollup_key UNIQUE NULLS NOT DISTINCT
+        (school_year, class_name, discipline_id, bimester, bncc_code, level)
+);
+
+-- 1b. Backfill a partir do histórico existente
+INSERT INTO public.assessment_rollup
+    (school_year, class_name, discipline_id, bimester, bncc_code, level, count)
+SELECT EXTRACT(YEAR FROM date)::INT, class_name, discipline_id, bimester, bncc_code, level_assigned, COUNT(*)
+FROM public.assessments
+WHERE level_assigned IS NOT NULL
+GROUP BY 1, 2, 3, 4, 5, 6
+ON CONFLICT ON CONSTRAINT uq_assessment_rollup_key DO UPDATE SET count = EXCLUDED.count;
+
+
+-- ================================================================
+-- PARTE 2: RISCO POR ALUNO (alunos em risco)
+-- ================================================================
+
+-- 2a. Situação por aluno/disciplina/bimestre (média < 2.0 = em risco).
+--     Recalculada pelo backend só para os alunos de cada lote (services/risk_service.py).
+CREATE TABLE IF NOT EXISTS public.student_risk (
+    id                SERIAL PRIMARY KEY,
+    student_id        TEXT NOT NULL REFERENCES public.students(student_id) ON DELETE CASCADE,
+    discipline_id     INTEGER REFERENCES public.setup_disciplines(id),
+    bimester          INTEGER,
+    total_assessments INTEGER NOT NULL DEFAULT 0,
+    low_level_count   INTEGER NOT NULL DEFAULT 0,      -- N1 + N2
+    average_level     DOUBLE PRECISION,
+    is_at_risk        BOOLEAN NOT NULL DEFAULT false,
+    updated_at        TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    CONSTRAINT uq_student_risk_key UNIQUE NULLS NOT DISTINCT (student_id, discipline_id, bimester)
+);
+CREATE INDEX IF NOT EXISTS idx_student_risk_ranking ON public.student_risk(is_at_risk, average_level);
+
+-- 2b. Backfill
+INSERT INTO public.student_risk
+    (student_id, discipline_id, bimester, total_assessments, low_level_count, average_level, is_at_risk)
+SELECT student_id, discipline_id, bimester,
+       COUNT(level_assigned),
+       COUNT(*) FILTER (WHERE level_assigned <= 2),
+       AVG(level_assigned::DOUBLE PRECISION),
+       AVG(level_assigned::DOUBLE PRECISION) < 2.0
+FROM public.assessments
+WHERE level_assigned IS NOT NULL AND student_id IS NOT NULL
+GROUP BY student_id, discipline_id, bimester
+ON CONFLICT ON CONSTRAINT uq_student_risk_key DO NOTHING;
+
+
+-- ================================================================
+-- PARTE 3: UPSERT EM LOTE DE AVALIAÇÕES
+-- ================================================================
+
+-- 3a. Log append-only de avaliações: um evento por lançamento de nota (nunca
+--     atualizado). Criado aqui, antes da remoção das duplicatas (3b), para que
+--     o histórico completo — inclusive as notas substituídas — entre no log.
+CREATE TABLE IF NOT EXISTS public.assessment_events (
+    id             BIGSERIAL PRIMARY KEY,
+    student_id     TEXT NOT NULL REFERENCES public.students(student_id) ON DELETE CASCADE,
+    objective_id   UUID REFERENCES public.learning_objectives(id),
+    bimester       INTEGER,
+    bncc_code      TEXT NOT NULL,
+    discipline_id  INTEGER REFERENCES public.setup_disciplines(id),
+    class_name     TEXT,
+    level_assigned INTEGER,
+    teacher_id     UUID REFERENCES public.users(id),
+    date           TIMESTAMP WITH TIME ZONE,
+    recorded_at    TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_assessment_events_key
+    ON public.assessment_events(student_id, objective_id, bimester, id);
+
+--     Backfill: TODAS as linhas de assessments, na ordem em que foram lançadas.
+--     Só roda com o log vazio: reexecutar o arquivo não duplica eventos.
+INSERT INTO public.assessment_events
+    (student_id, objective_id, bimester, bncc_code, discipline_id, class_name, level_assigned, teacher_id, date, recorded_at)
+SELECT student_id, objective_id, bimester, bncc_code, discipline_id, class_name, level_assigned, teacher_id, date,
+       COALESCE(created_at, date, NOW())
+FROM public.assessments
+WHERE student_id IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM public.assessment_events)
+ORDER BY date NULLS FIRST, created_at NULLS FIRST;
+
+-- 3b. Remove duplicatas (aluno, objetivo, bimestre), mantendo a nota mais recente
+--     (as substituídas já estão no log, 3a)
+DELETE FROM public.assessments a
+USING (
+    SELECT id,
+           ROW_NUMBER() OVER (
+               PARTITION BY student_id, objective_id, bimester
+               ORDER BY date DESC NULLS LAST, created_at DESC
+           ) AS rn
+    FROM public.assessments
+    WHERE objective_id IS NOT NULL
+) d
+WHERE a.id = d.id AND d.rn > 1;
+
+-- 3c. Chave do INSERT ... ON CONFLICT usado em POST /api/assessments/batch
+--     (linhas v1 sem objective_id continuam permitidas: NULLs são distintos)
+DO $$ BEGIN
+    ALTER TABLE public.assessments
+        ADD CONSTRAINT uq_assessment_student_objective_bimester UNIQUE (student_id, objective_id, bimester);
+EXCEPTION WHEN duplicate_object THEN NULL;
+END $$;
+
+-- 3d. Recalcula rollup e risco após a limpeza das duplicatas
+TRUNCATE public.assessment_rollup;
+INSERT INTO public.assessment_rollup
+    (school_year, class_name, discipline_id, bimester, bncc_code, level, count)
+SELECT EXTRACT(YEAR FROM date)::INT, class_name, discipline_id, bimester, bncc_code, level_assigned, COUNT(*)
+FROM public.assessments
+WHERE level_assigned IS NOT NULL
+GROUP BY 1, 2, 3, 4, 5, 6;
+
+TRUNCATE public.student_risk;
+INSERT INTO public.student_risk
+    (student_id, discipline_id, bimester, total_assessments, low_level_count, average_level, is_at_risk)
+SELECT student_id, discipline_id, bimester,
+       COUNT(level_assigned),
+       COUNT(*) FILTER (WHERE level_assigned <= 2),
+       AVG(level_assigned::DOUBLE PRECISION),
+       AVG(level_assigned::DOUBLE PRECISION) < 2.0
+FROM public.assessments
+WHERE level_assigned IS NOT NULL AND student_id IS NOT NULL
+GROUP BY student_id, discipline_id, bimester;
+
+
+-- ================================================================
+-- PARTE 4: IDEMPOTÊNCIA DOS LOTES DE NOTAS
+-- ================================================================
+
+-- 4a. Resposta de cada POST /api/assessments/batch por header Idempotency-Key.
+--     Linhas antigas podem ser apagadas livremente (ex.: > 30 dias).
+CREATE TABLE IF NOT EXISTS public.assessment_batch_requests (
+    idempotency_key TEXT PRIMARY KEY,
+    response        JSONB NOT NULL,
+    created_at      TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+
+-- ================================================================
+-- PARTE 5: LOG APPEND-ONLY DE AVALIAÇÕES
+-- ================================================================
+
+-- 5a. O log `assessment_events` é criado e preenchido com todo o histórico na
+--     PARTE 3a, antes da remoção das notas duplicadas. O estado atual por
+--     (aluno, objetivo, bimestre) continua em public.assessments.
+
+
+-- ================================================================
+-- PARTE 6: JOBS DE IMPORTAÇÃO CSV (admin)
+-- ================================================================
+
+-- 6a. Progresso das importações processadas em segundo plano (services/import_jobs.py)
+CREATE TABLE IF NOT EXISTS public.import_jobs (
+    id             UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    kind           TEXT NOT NULL,                  -- students | bncc
+    filename       TEXT,
+    status         TEXT DEFAULT 'queued',          -- queued | running | done | failed
+    total_rows     INTEGER,
+    rows_processed INTEGER DEFAULT 0,
+    inserted       INTEGER DEFAULT 0,
+    updated        INTEGER DEFAULT 0,
+    errors         JSONB DEFAULT '[]'::jsonb,
+    created_at     TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    started_at     TIMESTAMP WITH TIME ZONE,
+    finished_at    TIMESTAMP WITH TIME ZONE
+);
+
+
+-- ================================================================
+-- PARTE 7: REVOGAÇÃO DE SESSÕES (auth_version)
+-- ================================================================
+
+-- 7a. Versão das credenciais do usuário: vai no token ("ver") e é incrementada ao
+--     desativar, trocar a senha ou o papel; tokens com versão antiga deixam de valer
+ALTER TABLE public.users ADD COLUMN IF NOT EXISTS auth_version INTEGER NOT NULL DEFAULT 0;
+
+
+-- ================================================================
+-- PARTE 8: REFRESH TOKENS (access token de 15 min sem consulta ao banco)
+-- ================================================================
+
+-- 8a. Só o sha256 do token é guardado; cada uso marca used_at e emite outro da mesma família
+CREATE TABLE IF NOT EXISTS public.refresh_tokens (
+    token_hash   VARCHAR(64) PRIMARY KEY,
+    user_id      UUID NOT NULL REFERENCES public.users(id) ON DELETE CASCADE,
+    family_id    UUID NOT NULL,
+    auth_version INTEGER NOT NULL,
+    expires_at   TIMESTAMP WITH TIME ZONE NOT NULL,
+    used_at      TIMESTAMP WITH TIME ZONE,
+    created_at   TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS ix_refresh_tokens_user_id   ON public.refresh_tokens(user_id);
+CREATE INDEX IF NOT EXISTS ix_refresh_tokens_family_id ON public.refresh_tokens(family_id);
+
+-- 8b. Limpeza periódica (opcional): tokens vencidos não servem para nada
+-- DELETE FROM public.refresh_tokens WHERE expires_at < NOW() - INTERVAL '1 day';
+
+
+-- ================================================================
+-- PARTE 9: RESERVA DA CHAVE DE IDEMPOTÊNCIA DOS LOTES DE NOTAS
+-- ================================================================
+
+-- 9a. A chave é gravada como 'in_progress' antes do lote; reenvios simultâneos
+--     recebem 409 em vez de regravar (e contar duas vezes no rollup)
+ALTER TABLE public.assessment_batch_requests ADD COLUMN IF NOT EXISTS status TEXT NOT NULL DEFAULT 'done';
+ALTER TABLE public.assessment_batch_requests ALTER COLUMN response DROP NOT NULL;
+
+
+-- ================================================================
+-- PARTE 10: HEARTBEAT DOS JOBS DE IMPORTAÇÃO
+-- ================================================================
+
+-- 10a. Atualizado a cada bloco commitado; job 'queued'/'running' sem heartbeat
+--      recente (instância encerrada no meio) é exibido como 'failed'
+ALTER TABLE public.import_jobs ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW();
+
+
+-- ================================================================
+-- PARTE 11: REVOGAÇÃO EXPLÍCITA DOS REFRESH TOKENS
+-- ================================================================
+
+-- 11a. used_at = trocado por outro (reuso aceito por alguns segundos: abas simultâneas);
+--      revoked_at = logout ou reuso suspeito (família inteira, sem tolerância)
+ALTER TABLE public.refresh_tokens ADD COLUMN IF NOT EXISTS revoked_at TIMESTAMP WITH TIME ZONE;